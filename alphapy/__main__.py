@@ -29,6 +29,7 @@
 from alphapy.data import get_data
 from alphapy.data import sample_data
 from alphapy.data import shuffle_data
+from alphapy.estimators import dense_input
 from alphapy.estimators import get_estimators
 from alphapy.estimators import scorers
 from alphapy.features import apply_treatments
@@ -44,15 +45,19 @@ from alphapy.globals import CSEP, PSEP, SSEP, USEP
 from alphapy.globals import ModelType
 from alphapy.globals import Partition, datasets
 from alphapy.globals import WILDCARD
+from alphapy.model import evict_feature_cache
+from alphapy.model import feature_cache_key
 from alphapy.model import first_fit
 from alphapy.model import generate_metrics
 from alphapy.model import get_model_config
+from alphapy.model import load_feature_cache
 from alphapy.model import load_feature_map
 from alphapy.model import load_predictor
 from alphapy.model import make_predictions
 from alphapy.model import Model
 from alphapy.model import predict_best
 from alphapy.model import predict_blend
+from alphapy.model import save_feature_cache
 from alphapy.model import save_model
 from alphapy.model import save_predictions
 from alphapy.optimize import hyper_grid_search
@@ -80,11 +85,11 @@ logger = logging.getLogger(__name__)
 
 
 #
-# Function training_pipeline
+# Function feature_pipeline
 #
 
-def training_pipeline(model):
-    r"""AlphaPy Training Pipeline
+def feature_pipeline(model):
+    r"""AlphaPy Feature Pipeline
 
     Parameters
     ----------
@@ -94,31 +99,24 @@ def training_pipeline(model):
     Returns
     -------
     model : alphapy.Model
-        The final results are stored in the model object.
+        The model object with the final training and testing features.
 
     Raises
     ------
-    KeyError
+    IndexError
         If the number of columns of the train and test data do not match,
         then this exception is raised.
 
     """
 
-    logger.info("Training Pipeline")
+    logger.info("Feature Pipeline")
 
     # Unpack the model specifications
 
-    calibration = model.specs['calibration']
     directory = model.specs['directory']
     drop = model.specs['drop']
     extension = model.specs['extension']
-    feature_selection = model.specs['feature_selection']
-    grid_search = model.specs['grid_search']
     model_type = model.specs['model_type']
-    predict_mode = model.specs['predict_mode']
-    rfe = model.specs['rfe']
-    sampling = model.specs['sampling']
-    scorer = model.specs['scorer']
     separator = model.specs['separator']
     target = model.specs['target']
 
@@ -187,21 +185,90 @@ def training_pipeline(model):
     # Create initial features
 
     all_features = create_features(model, all_features)
-    X_train, X_test = np.array_split(all_features, [split_point])
+    X_train, X_test = all_features[:split_point], all_features[split_point:]
     model = save_features(model, X_train, X_test)
 
     # Generate interactions
 
     all_features = create_interactions(model, all_features)
-    X_train, X_test = np.array_split(all_features, [split_point])
+    X_train, X_test = all_features[:split_point], all_features[split_point:]
     model = save_features(model, X_train, X_test)
 
     # Remove low-variance features
 
     all_features = remove_lv_features(model, all_features)
-    X_train, X_test = np.array_split(all_features, [split_point])
+    X_train, X_test = all_features[:split_point], all_features[split_point:]
     model = save_features(model, X_train, X_test)
 
+    # Return the model with the new features
+    return model
+
+
+#
+# Function training_pipeline
+#
+
+def training_pipeline(model):
+    r"""AlphaPy Training Pipeline
+
+    Parameters
+    ----------
+    model : alphapy.Model
+        The model object for controlling the pipeline.
+
+    Returns
+    -------
+    model : alphapy.Model
+        The final results are stored in the model object.
+
+    Raises
+    ------
+    KeyError
+        If the scoring function is not found, then this exception
+        is raised.
+
+    Notes
+    -----
+    If ``cache_features`` is set, then the final training and testing
+    features are loaded from the feature cache when neither the input
+    files nor the feature specifications have changed, and the
+    pipeline skips straight to model fitting. Because the feature
+    pipeline does not run, the datestamped train and test files with
+    the treatments applied are not written to the input directory.
+    The least recently used entries are removed when the cache
+    exceeds ``cache_size`` megabytes.
+
+    """
+
+    logger.info("Training Pipeline")
+
+    # Unpack the model specifications
+
+    cache_features = model.specs['cache_features']
+    calibration = model.specs['calibration']
+    feature_selection = model.specs['feature_selection']
+    grid_search = model.specs['grid_search']
+    model_type = model.specs['model_type']
+    predict_mode = model.specs['predict_mode']
+    rfe = model.specs['rfe']
+    sampling = model.specs['sampling']
+    scorer = model.specs['scorer']
+
+    # Create the features, or load them from the cache
+
+    cached = False
+    if cache_features:
+        cache_key = feature_cache_key(model)
+        model, cached = load_feature_cache(model, cache_key)
+        if cached:
+            logger.info("Skipping the treated train and test input files")
+    if not cached:
+        model = feature_pipeline(model)
+        if cache_features:
+            save_feature_cache(model, cache_key)
+    if cache_features:
+        evict_feature_cache(model, cache_key)
+
     # Shuffle the data [if specified]
     model = shuffle_data(model)
 
@@ -317,14 +384,14 @@ def prediction_pipeline(model):
     rfe = model.specs['rfe']
     separator = model.specs['separator']
 
+    # Load feature_map
+    model = load_feature_map(model, directory)
+
     # Get all data. We need original train and test for interactions.
 
     partition = Partition.predict
     X_predict, _ = get_data(model, partition)
 
-    # Load feature_map
-    model = load_feature_map(model, directory)
-
     # Log feature statistics
 
     logger.info("Feature Statistics")
@@ -375,6 +442,7 @@ def prediction_pipeline(model):
     
     logger.info("Making Predictions")
     tag = 'BEST'
+    all_features = dense_input(predictor, all_features)
     model.preds[(tag, partition)] = predictor.predict(all_features)
     if model_type == ModelType.classification:
         model.probas[(tag, partition)]  = predictor.predict_proba(all_features)[:, 1]
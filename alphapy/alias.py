@@ -60,6 +60,8 @@ class Alias(object):
     ----------
     Alias.aliases : dict
         Class variable for storing all known aliases
+    Alias.version : int
+        Class variable counting the changes to the aliases
 
     Examples
     --------
@@ -72,6 +74,7 @@ class Alias(object):
     # class variable to track all aliases
 
     aliases = {}
+    version = 0
 
     # function __new__
 
@@ -111,6 +114,7 @@ class Alias(object):
         self.expr = expr;
         # add key with expression
         Alias.aliases[name] = expr
+        Alias.version += 1
             
     # function __str__
 
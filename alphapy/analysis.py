@@ -27,6 +27,7 @@
 #
 
 from alphapy.__main__ import main_pipeline
+from alphapy.frame import file_format
 from alphapy.frame import load_frames
 from alphapy.frame import sequence_frame
 from alphapy.frame import write_frame
@@ -135,7 +136,8 @@ class Analysis(object):
 #
 
 def run_analysis(analysis, lag_period, forecast_period, leaders,
-                 predict_history, splits=True):
+                 predict_history, splits=True, lookback=None,
+                 streaming=False):
     r"""Run an analysis for a given model and group.
 
     First, the data are loaded for each member of the analysis group.
@@ -159,6 +161,14 @@ def run_analysis(analysis, lag_period, forecast_period, leaders,
     splits : bool, optional
         If ``True``, then the data for each member of the analysis
         group are in separate files.
+    lookback : int, optional
+        The number of bars required for valid features. In prediction
+        mode, only the bars after the ``lookback`` and ``lag_period``
+        are sequenced and predicted.
+    streaming : bool, optional
+        If ``True``, then append the rows of each member to the
+        train, test, or predict file as soon as the member has been
+        split, instead of concatenating the rows of all the members.
 
     Returns
     -------
@@ -199,15 +209,18 @@ def run_analysis(analysis, lag_period, forecast_period, leaders,
     # Load the data frames
     data_frames = load_frames(group, directory, extension, separator, splits)
 
-    # Create dataframes
+    # Create the lists of subsets for each output file
 
     if predict_mode:
-        # create predict frame
-        predict_frame = pd.DataFrame()
+        partitions = [predict_file]
     else:
-        # create train and test frames
-        train_frame = pd.DataFrame()
-        test_frame = pd.DataFrame()
+        partitions = [train_file, test_file]
+    subsets = {fname : [] for fname in partitions}
+    columns = {}
+    input_dir = SSEP.join([directory, 'input'])
+    if streaming and file_format(extension) != 'text':
+        logger.info("Rows can only be streamed to text files")
+        streaming = False
 
     # Subset each individual frame and add to the master frame
 
@@ -220,13 +233,21 @@ def run_analysis(analysis, lag_period, forecast_period, leaders,
         first_date = df.index[0]
         last_date = df.index[-1]
         logger.info("Analyzing %s from %s to %s", tag, first_date, last_date)
+        # in prediction mode, drop the bars without valid features
+        if predict_mode and lookback is not None:
+            first_bar = max(df.index.searchsorted(split_date),
+                            lookback + lag_period)
+            start_bar = max(first_bar - lag_period, 0)
+            df = df.iloc[start_bar:]
         # sequence leaders, laggards, and target(s)
         df = sequence_frame(df, target, forecast_period, leaders, lag_period)
+        if predict_mode and lookback is not None:
+            df = df.iloc[first_bar - start_bar:]
         # get frame subsets
         if predict_mode:
             new_predict = df.loc[(df.index >= split_date) & (df.index <= last_date)]
             if len(new_predict) > 0:
-                predict_frame = predict_frame.append(new_predict)
+                subsets[predict_file].append(new_predict)
             else:
                 logger.info("Prediction frame %s has zero rows. Check prediction date.",
                             tag)
@@ -235,7 +256,7 @@ def run_analysis(analysis, lag_period, forecast_period, leaders,
             new_train = df.loc[(df.index >= train_date) & (df.index < split_date)]
             if len(new_train) > 0:
                 new_train = new_train.dropna()
-                train_frame = train_frame.append(new_train)
+                subsets[train_file].append(new_train)
                 new_test = df.loc[(df.index >= split_date) & (df.index <= last_date)]
                 if len(new_test) > 0:
                     # check if target column has NaN values
@@ -246,26 +267,37 @@ def run_analysis(analysis, lag_period, forecast_period, leaders,
                     # drop records with NaN values in target column
                     new_test = new_test.dropna(subset=[target])
                     # append selected records to the test frame
-                    test_frame = test_frame.append(new_test)
+                    subsets[test_file].append(new_test)
                 else:
                     logger.info("Testing frame %s has zero rows. Check prediction date.",
                                 tag)
             else:
                 logger.info("Training frame %s has zero rows. Check data source.", tag)
+        # append the subsets to the output files
+        if streaming:
+            for fname in partitions:
+                for sf in subsets[fname]:
+                    append = fname in columns
+                    if append:
+                        if list(sf.columns) != columns[fname]:
+                            logger.info("Aligning columns of %s with %s", tag, fname)
+                            sf = sf.reindex(columns=columns[fname])
+                    else:
+                        columns[fname] = list(sf.columns)
+                    write_frame(sf, input_dir, fname, extension, separator,
+                                index=True, index_label='date', append=append)
+                subsets[fname] = []
 
     # Write out the frames for input into the AlphaPy pipeline
 
-    directory = SSEP.join([directory, 'input'])
-    if predict_mode:
-        # write out the predict frame
-        write_frame(predict_frame, directory, predict_file, extension, separator,
-                    index=True, index_label='date')
-    else:
-        # write out the train and test frames
-        write_frame(train_frame, directory, train_file, extension, separator,
-                    index=True, index_label='date')
-        write_frame(test_frame, directory, test_file, extension, separator,
-                    index=True, index_label='date')
+    for fname in partitions:
+        if fname not in columns:
+            if subsets[fname]:
+                pf = pd.concat(subsets[fname])
+            else:
+                pf = pd.DataFrame()
+            write_frame(pf, input_dir, fname, extension, separator,
+                        index=True, index_label='date')
 
     # Run the AlphaPy pipeline
     analysis.model = main_pipeline(model)
@@ -27,16 +27,27 @@
 #
 
 from alphapy.frame import Frame
+from alphapy.frame import file_format
+from alphapy.frame import frame_columns
 from alphapy.frame import frame_name
 from alphapy.frame import read_frame
+from alphapy.frame import write_frame
+from alphapy.globals import CALENDAR_DAYS_YEAR, TRADING_DAYS_YEAR
+from alphapy.globals import DATE_FORMATS, TIME_FORMATS
+from alphapy.globals import DTYPE_SAMPLE_ROWS
+from alphapy.globals import FEED_BACKOFF
+from alphapy.globals import LOOKBACK_MARGIN, LOOKBACK_SESSIONS
 from alphapy.globals import ModelType
 from alphapy.globals import Partition, datasets
 from alphapy.globals import PD_WEB_DATA_FEEDS
 from alphapy.globals import PSEP, SSEP, USEP
+from alphapy.globals import PYRAMID_FRACTALS
 from alphapy.globals import SamplingMethod
+from alphapy.globals import SESSION_MINUTES
 from alphapy.globals import WILDCARD
 from alphapy.space import Space
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from datetime import timedelta
 from imblearn.combine import SMOTEENN
@@ -55,14 +66,22 @@ from imblearn.under_sampling import OneSidedSelection
 from imblearn.under_sampling import RandomUnderSampler
 from imblearn.under_sampling import RepeatedEditedNearestNeighbours
 from imblearn.under_sampling import TomekLinks
+import inspect
+import json
 import logging
+import math
 import numpy as np
+import os
 import pandas as pd
 pd.core.common.is_list_like = pd.api.types.is_list_like
+from pandas.api.types import is_datetime64_any_dtype
+from pandas.api.types import is_timedelta64_dtype
 import pandas_datareader.data as web
 import re
 import requests
 from scipy import sparse
+import threading
+import time
 from sklearn.preprocessing import LabelEncoder
 
 
@@ -73,6 +92,43 @@ from sklearn.preprocessing import LabelEncoder
 logger = logging.getLogger(__name__)
 
 
+#
+# Function infer_dtypes
+#
+
+def infer_dtypes(model, df):
+    r"""Infer the data types of the input columns.
+
+    Parameters
+    ----------
+    model : alphapy.Model
+        The model object with the data specifications.
+    df : pandas.DataFrame
+        A sample of the input data.
+
+    Returns
+    -------
+    dtypes : dict
+        The data type of each column whose type is fixed, starting
+        with the types declared in ``model.yml``.
+
+    Notes
+    -----
+    If ``float32`` is set, the floating point columns other than the
+    target are stored in single precision. All other undeclared
+    columns are inferred when the data are read.
+
+    """
+    dtypes = {}
+    if model.specs['float32']:
+        target = model.specs['target']
+        for c in df.columns:
+            if c != target and df[c].dtype == 'float64':
+                dtypes[c] = 'float32'
+    dtypes.update(model.specs['dtypes'])
+    return dtypes
+
+
 #
 # Function get_data
 #
@@ -94,12 +150,20 @@ def get_data(model, partition):
     y : pandas.Series
         The array of target values, if available.
 
+    Notes
+    -----
+    Only the ``features`` and the target are read from the file. The
+    data types are inferred from the first partition that is read, and
+    they are stored in the feature map under the key ``dtypes``, so
+    that every partition is read with the same types.
+
     """
 
     logger.info("Loading Data")
 
     # Extract the model data
 
+    chunksize = model.specs['chunksize']
     directory = model.specs['directory']
     extension = model.specs['extension']
     features = model.specs['features']
@@ -109,11 +173,36 @@ def get_data(model, partition):
     test_file = model.test_file
     train_file = model.train_file
 
-    # Read in the file
+    # Select the columns to read
 
     filename = datasets[partition]
     input_dir = SSEP.join([directory, 'input'])
-    df = read_frame(input_dir, filename, extension, separator)
+    columns = None
+    if features != WILDCARD:
+        columns = list(features)
+        file_cols = frame_columns(input_dir, filename, extension, separator)
+        if file_cols is not None and target in file_cols and target not in columns:
+            columns.append(target)
+
+    # Infer the data types from a sample of a text file
+
+    dtypes = model.feature_map.get('dtypes')
+    file_all = SSEP.join([input_dir, PSEP.join([filename, extension])])
+    text_file = file_format(extension, file_all) == 'text'
+    if dtypes is None and text_file:
+        sample = read_frame(input_dir, filename, extension, separator,
+                            columns=columns, nrows=DTYPE_SAMPLE_ROWS)
+        if sample is not None:
+            dtypes = infer_dtypes(model, sample)
+
+    # Read in the file
+
+    df = read_frame(input_dir, filename, extension, separator,
+                    columns=columns, dtype=dtypes, chunksize=chunksize)
+    if dtypes is None:
+        dtypes = infer_dtypes(model, df)
+        df = df.astype({c : t for c, t in dtypes.items() if c in df.columns})
+    model.feature_map['dtypes'] = dtypes
 
     # Assign target and drop it if necessary
 
@@ -285,6 +374,48 @@ def sample_data(model):
     return model
 
 
+#
+# Function parse_dates
+#
+
+def parse_dates(values, formats):
+    r"""Parse date or time strings with an explicit format.
+
+    The format is the first of the ``formats`` that matches the first
+    value, and each unique value is parsed only once, which is much
+    faster than inferring the format of every value.
+
+    Parameters
+    ----------
+    values : pandas.Series
+        The date or time strings.
+    formats : list
+        The candidate ``strptime`` formats.
+
+    Returns
+    -------
+    parsed : numpy.ndarray
+        The array of ``datetime64`` values, or ``None`` if none of the
+        formats matches the values.
+
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = uniques.astype(str)
+    parsed = None
+    if len(uniques) > 0:
+        for fmt in formats:
+            try:
+                datetime.strptime(uniques[0], fmt)
+                parsed = pd.to_datetime(uniques, format=fmt).values
+                break
+            except ValueError:
+                pass
+    if parsed is not None:
+        parsed = parsed[codes]
+        parsed[codes < 0] = np.datetime64('NaT')
+    return parsed
+
+
 #
 # Function convert_data
 #
@@ -306,20 +437,44 @@ def convert_data(df, index_column, intraday_data):
     df : pandas.DataFrame
         The canonical dataframe with date/time index.
 
+    Notes
+    -----
+    The ``date`` and ``time`` columns are used as is if they are
+    already typed, and otherwise they are parsed with one of the
+    ``DATE_FORMATS`` and ``TIME_FORMATS``. If no format matches,
+    then the format is inferred from the combined strings.
+
     """
 
     # Standardize column names
-    df = df.rename(columns = lambda x: x.lower().replace(' ',''))
+    df = df.rename(columns = lambda x: x.lower().replace(' ',''), copy=False)
 
     # Create the time/date index if not already done 
 
     if not isinstance(df.index, pd.DatetimeIndex):
         df.reset_index(inplace=True)
-        if intraday_data:
-            dt_column = df['date'] + ' ' + df['time']
+        if is_datetime64_any_dtype(df['date']):
+            dt_values = df['date'].values
         else:
-            dt_column = df['date']
-        df[index_column] = pd.to_datetime(dt_column)
+            dt_values = parse_dates(df['date'], DATE_FORMATS)
+        if dt_values is not None and intraday_data:
+            if is_timedelta64_dtype(df['time']):
+                time_values = df['time'].values
+            else:
+                time_values = parse_dates(df['time'], TIME_FORMATS)
+                if time_values is not None:
+                    time_values = time_values - np.datetime64('1900-01-01')
+            if time_values is not None:
+                dt_values = dt_values + time_values
+            else:
+                dt_values = None
+        if dt_values is None:
+            if intraday_data:
+                dt_column = df['date'] + ' ' + df['time']
+            else:
+                dt_column = df['date']
+            dt_values = pd.to_datetime(dt_column)
+        df[index_column] = dt_values
         df.set_index(pd.DatetimeIndex(df[index_column]),
                      drop=True, inplace=True)
         del df['date']
@@ -332,7 +487,8 @@ def convert_data(df, index_column, intraday_data):
     df[cols_float] = df[cols_float].astype(float)
 
     # Order the frame by increasing date if necessary
-    df = df.sort_index()
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
 
     return df
 
@@ -354,24 +510,35 @@ def enhance_intraday_data(df):
     df : pandas.DataFrame
         The dataframe with bar number and end-of-day columns.
 
+    Notes
+    -----
+    The frame is sorted by its index if necessary, so that the days
+    are found from the boundaries between consecutive bars instead
+    of grouping by a date string.
+
     """
 
-    # Group by date first
+    # Find the first bar of each day
 
-    df['date'] = df.index.strftime('%Y-%m-%d')
-    date_group = df.groupby('date')
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    days = df.index.normalize().values
+    nbars = len(days)
+    new_day = np.ones(nbars, dtype=bool)
+    new_day[1:] = days[1:] != days[:-1]
+    starts = np.flatnonzero(new_day)
 
     # Number the intraday bars
-    df['bar_number'] = date_group.cumcount()
+    first_bar = np.repeat(starts, np.diff(np.append(starts, nbars)))
+    df['bar_number'] = np.arange(nbars) - first_bar
 
     # Mark the end of the trading day
 
-    df['end_of_day'] = False
-    df.loc[date_group.tail(1).index, 'end_of_day'] = True
+    end_of_day = np.ones(nbars, dtype=bool)
+    end_of_day[:-1] = new_day[1:]
+    df['end_of_day'] = end_of_day
 
     # Return the enhanced frame
-
-    del df['date']
     return df
 
 
@@ -379,7 +546,7 @@ def enhance_intraday_data(df):
 # Function get_google_data
 #
 
-def get_google_data(symbol, lookback_period, fractal):
+def get_google_data(symbol, lookback_period, fractal, timeout=None):
     r"""Get Google Finance intraday data.
 
     We get intraday data from the Google Finance API, even though
@@ -395,6 +562,9 @@ def get_google_data(symbol, lookback_period, fractal):
         The number of days of intraday data to retrieve, capped at 50.
     fractal : str
         The intraday frequency, e.g., "5m" for 5-minute data.
+    timeout : float, optional
+        The maximum number of seconds for the request. If ``None``,
+        then there is no limit.
 
     Returns
     -------
@@ -417,7 +587,7 @@ def get_google_data(symbol, lookback_period, fractal):
     # make the request to Google
     base_url = 'https://finance.google.com/finance/getprices?q={}&i={}&p={}d&f=d,o,h,l,c,v'
     url = base_url.format(symbol, interval, lookback_period)
-    response = requests.get(url)
+    response = FeedSession(timeout).get(url)
     # process the response
     text = response.text.split('\n')
     records = []
@@ -452,7 +622,7 @@ def get_google_data(symbol, lookback_period, fractal):
 # Function get_pandas_data
 #
 
-def get_pandas_data(schema, symbol, lookback_period):
+def get_pandas_data(schema, symbol, lookback_period, timeout=None):
     r"""Get Pandas Web Reader data.
 
     Parameters
@@ -463,6 +633,10 @@ def get_pandas_data(schema, symbol, lookback_period):
         A valid stock symbol.
     lookback_period : int
         The number of days of daily data to retrieve.
+    timeout : float, optional
+        The maximum number of seconds for all of the requests of the
+        data reader, including its own retries. If ``None``, then
+        there is no limit.
 
     Returns
     -------
@@ -489,19 +663,713 @@ def get_pandas_data(schema, symbol, lookback_period):
 
     df = None
     try:
-        df = web.DataReader(symbol.upper(), schema, start, end)
+        df = web.DataReader(symbol.upper(), schema, start, end,
+                            session=FeedSession(timeout))
     except:
         logger.info("Could not retrieve data for: %s", symbol)
 
     return df
 
 
+#
+# Function get_local_data
+#
+
+def get_local_data(directory, symbol, lookback_period, fractal,
+                   extension='csv', separator=','):
+    r"""Get data from local files in the format of a feed.
+
+    This is a stand-in for a network feed, e.g., for testing the
+    local bar store offline. Each symbol has one file with a ``date``
+    column, and the rows of the last ``lookback_period`` days are
+    returned, just as a feed would return them.
+
+    Parameters
+    ----------
+    directory : str
+        Full directory specification of the files.
+    symbol : str
+        A valid stock symbol, the name of the file in lower case.
+    lookback_period : int
+        The number of days of data to retrieve.
+    fractal : str
+        Pandas offset alias, which is not used.
+    extension : str, optional
+        File name extension, e.g., ``csv``.
+    separator : str, optional
+        The delimiter between fields in the file.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The rows of the last ``lookback_period`` days, or ``None`` if
+        the file is not found.
+
+    Examples
+    --------
+
+    >>> Feed('local', functools.partial(get_local_data, '/data/bars'))
+
+    """
+    df = read_frame(directory, symbol.lower(), extension, separator)
+    if df is not None:
+        to_date = pd.to_datetime('today')
+        from_date = to_date - pd.to_timedelta(lookback_period, unit='d')
+        dates = pd.to_datetime(df['date'])
+        df = df[(dates >= from_date.normalize()) & (dates <= to_date)]
+    return df
+
+
+#
+# Function get_lookback_days
+#
+
+def get_lookback_days(nbars, fractal):
+    r"""Convert a number of bars into the calendar days to retrieve.
+
+    Parameters
+    ----------
+    nbars : int
+        The number of bars, e.g., from ``vlookback``.
+    fractal : str
+        Pandas offset alias for the bars.
+
+    Returns
+    -------
+    ndays : int
+        The number of calendar days spanning ``nbars``, or ``None``
+        if the ``fractal`` is not a valid pandas offset.
+
+    Notes
+    -----
+    Intraday bars are counted in sessions of ``SESSION_MINUTES``,
+    and trading days are converted to calendar days with the ratio
+    of ``CALENDAR_DAYS_YEAR`` to ``TRADING_DAYS_YEAR``, so weekends
+    and holidays are included on average.
+
+    A margin of trading days is added for the holidays and half
+    sessions that fall within the period. The margin is a fraction
+    ``LOOKBACK_MARGIN`` of the trading days, but at least
+    ``LOOKBACK_SESSIONS`` sessions, and at least one bar for bars
+    longer than a day.
+
+    Examples
+    --------
+
+    >>> get_lookback_days(49, '1d')
+    # 79
+    >>> get_lookback_days(390, '5min')
+    # 15
+    >>> get_lookback_days(52, '7d')
+    # 372
+
+    """
+    try:
+        bar_interval = pd.to_timedelta(fractal)
+    except:
+        logger.info("fractal [%s] is an invalid pandas offset", fractal)
+        return None
+    day_interval = pd.to_timedelta('1d')
+    bar_days = 0
+    if bar_interval < day_interval:
+        # intraday bars are converted to trading sessions
+        session_bars = pd.to_timedelta(SESSION_MINUTES, unit='m') / bar_interval
+        trading_days = math.ceil(nbars / session_bars)
+    elif bar_interval == day_interval:
+        trading_days = nbars
+    else:
+        bar_days = bar_interval.days * TRADING_DAYS_YEAR / CALENDAR_DAYS_YEAR
+        trading_days = nbars * bar_days
+    margin = max(trading_days * LOOKBACK_MARGIN, LOOKBACK_SESSIONS, bar_days)
+    trading_days += margin
+    ndays = int(math.ceil(trading_days * CALENDAR_DAYS_YEAR / TRADING_DAYS_YEAR))
+    return ndays
+
+
+#
+# Class Feed
+#
+
+class Feed(object):
+    """Create a new data feed. All feeds are stored in ``Feed.feeds``,
+    and a feed is selected by using its name as the ``schema`` of
+    the market data. Registered feeds take precedence over the
+    built-in feeds.
+
+    Parameters
+    ----------
+    name : str
+        Feed key, e.g., a file-based stand-in for a network source.
+    function : function
+        The function that gets the data, with the parameters
+        ``(symbol, lookback_period, fractal)``. If the function has a
+        ``timeout`` parameter, then it receives the number of seconds
+        left for the symbol, e.g., for ``requests.get``. The function returns
+        a dataframe with ``date`` (and ``time`` for intraday data)
+        and the ``open``, ``high``, ``low``, ``close``, and ``volume``
+        columns, or a dataframe with a datetime index.
+
+    Attributes
+    ----------
+    feeds : dict
+        Class variable for storing all known feeds
+
+    Examples
+    --------
+
+    >>> Feed('local', functools.partial(get_local_data, '/data/bars'))
+
+    """
+
+    # class variable to track all feeds
+
+    feeds = {}
+
+    # __init__
+
+    def __init__(self,
+                 name,
+                 function):
+        # code
+        self.name = name
+        self.function = function
+        # add feed to feeds list
+        Feed.feeds[name] = self
+
+    # __str__
+
+    def __str__(self):
+        return self.name
+
+
+#
+# Class RateLimiter
+#
+
+class RateLimiter(object):
+    """Limit the rate of requests to a data source, shared by all of
+    the threads fetching from that source.
+
+    Parameters
+    ----------
+    rate : float
+        The maximum number of requests per second. If the ``rate``
+        is zero, then the requests are not limited.
+
+    Attributes
+    ----------
+    interval : float
+        The minimum number of seconds between requests.
+    next_time : float
+        The earliest time of the next request.
+
+    """
+
+    # __init__
+
+    def __init__(self,
+                 rate):
+        # code
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    # function wait
+
+    def wait(self):
+        r"""Wait until the next request is allowed.
+
+        Returns
+        -------
+        None : None
+
+        """
+        with self.lock:
+            now = time.time()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+#
+# Class FeedSession
+#
+
+class FeedSession(requests.Session):
+    """Create a session whose requests must finish by a deadline.
+
+    Each request is sent with the time remaining until the deadline
+    as its ``timeout``, so a stalled feed raises an exception in the
+    thread making the request instead of blocking it indefinitely.
+
+    Parameters
+    ----------
+    timeout : float, optional
+        The number of seconds from now until the deadline. If ``None``,
+        then the requests are not limited.
+
+    Attributes
+    ----------
+    deadline : float
+        The time by which all requests must finish, or ``None``.
+
+    """
+
+    # __init__
+
+    def __init__(self,
+                 timeout=None):
+        # code
+        super(FeedSession, self).__init__()
+        self.deadline = time.time() + timeout if timeout else None
+
+    # function request
+
+    def request(self, method, url, **kwargs):
+        r"""Send a request with the time remaining until the deadline.
+
+        Raises
+        ------
+        requests.exceptions.Timeout
+            The deadline has already passed.
+
+        """
+        if self.deadline is not None:
+            remaining = self.deadline - time.time()
+            if remaining <= 0:
+                raise requests.exceptions.Timeout("Deadline passed for %s" % url)
+            kwargs['timeout'] = remaining
+        return super(FeedSession, self).request(method, url, **kwargs)
+
+
+#
+# Function get_feed_data
+#
+
+def get_feed_data(schema, symbol, lookback_period, fractal, intraday_data,
+                  limiter=None, retries=0, timeout=None):
+    r"""Get data from a registered feed or a built-in feed.
+
+    Parameters
+    ----------
+    schema : str
+        The name of the feed.
+    symbol : str
+        A valid stock symbol.
+    lookback_period : int
+        The number of days of data to retrieve.
+    fractal : str
+        Pandas offset alias.
+    intraday_data : bool
+        If True, then get intraday data.
+    limiter : alphapy.RateLimiter, optional
+        The rate limit of the feed.
+    retries : int, optional
+        The number of times to retry a failed request, with an
+        exponential backoff starting at ``FEED_BACKOFF`` seconds.
+    timeout : float, optional
+        The maximum number of seconds for all of the requests and
+        retries. If ``None``, then there is no limit.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The dataframe containing the data, or ``None`` if the feed
+        is not supported or all requests failed.
+
+    Notes
+    -----
+    The time remaining is passed to the feed as its own ``timeout``,
+    so a request that stalls fails in this thread and no more retries
+    are made once the time has run out.
+
+    """
+    pandas_data = any(substring in schema for substring in PD_WEB_DATA_FEEDS)
+    if not (schema in Feed.feeds or pandas_data or
+            (schema == 'google' and intraday_data)):
+        logger.error("Unsupported Data Source: %s", schema)
+        return None
+    deadline = time.time() + timeout if timeout else None
+    df = None
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            delay = FEED_BACKOFF * 2 ** (attempt - 1)
+            if deadline and time.time() + delay >= deadline:
+                logger.info("Timed out getting data for %s", symbol)
+                break
+            logger.info("Retrying %s in %.1f seconds", symbol, delay)
+            time.sleep(delay)
+        if limiter:
+            limiter.wait()
+        remaining = None
+        if deadline:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                logger.info("Timed out getting data for %s", symbol)
+                break
+        try:
+            if schema in Feed.feeds:
+                func = Feed.feeds[schema].function
+                kwargs = {}
+                if 'timeout' in inspect.signature(func).parameters:
+                    kwargs['timeout'] = remaining
+                df = func(symbol, lookback_period, fractal, **kwargs)
+            elif schema == 'google':
+                # intraday only
+                df = get_google_data(symbol, lookback_period, fractal, remaining)
+            else:
+                # daily only
+                df = get_pandas_data(schema, symbol, lookback_period, remaining)
+        except:
+            df = None
+            logger.info("Could not get data for %s from %s", symbol, schema)
+        if df is not None and not df.empty:
+            break
+    return df
+
+
+#
+# Function get_store_data
+#
+
+def get_store_data(directory, space, symbol, lookback_period,
+                   index_column, intraday_data, extension, separator,
+                   limiter=None, retries=0, timeout=None):
+    r"""Get data from the local bar store, fetching only the missing bars.
+
+    The store keeps the canonical data for each symbol in the
+    ``directory``, along with the date range already requested from
+    the feed. If the requested range starts before the stored range,
+    then the full ``lookback_period`` is fetched. Otherwise, only the
+    days since the end of the stored range are fetched, including the
+    last stored day to complete any partial bars.
+
+    Parameters
+    ----------
+    directory : str
+        Full directory specification of the store.
+    space : alphapy.Space
+        Namespace of the feed, where the ``schema`` is the feed name
+        and the ``fractal`` is the data fractal.
+    symbol : str
+        A valid stock symbol.
+    lookback_period : int
+        The number of days of data to retrieve.
+    index_column : str
+        The name of the index column.
+    intraday_data : bool
+        If True, then get intraday data.
+    extension : str
+        File name extension, e.g., ``csv``.
+    separator : str
+        The delimiter between fields in the file.
+    limiter : alphapy.RateLimiter, optional
+        The rate limit of the feed.
+    retries : int, optional
+        The number of times to retry a failed request.
+    timeout : float, optional
+        The maximum number of seconds to fetch the data from the feed.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The canonical dataframe for the requested range, or ``None``
+        if no data are available.
+
+    Notes
+    -----
+    New bars are merged with the stored bars, where a fetched bar
+    replaces a stored bar with the same timestamp. The data file and
+    then the range file are replaced atomically, so an interrupted
+    update is fetched again on the next run.
+
+    """
+    fname = frame_name(symbol.lower(), space)
+    range_file = SSEP.join([directory, PSEP.join([fname, 'json'])])
+    to_date = pd.to_datetime('today')
+    from_date = to_date - pd.to_timedelta(lookback_period, unit='d')
+    # read the stored range and data
+    df = None
+    start = end = None
+    if os.path.isfile(range_file):
+        with open(range_file, 'r') as f:
+            srange = json.load(f)
+        df = read_frame(directory, fname, extension, separator,
+                        index_col=index_column)
+        if df is not None:
+            df.index = pd.to_datetime(df.index)
+            start = pd.to_datetime(srange['start'])
+            end = pd.to_datetime(srange['end'])
+    # determine the number of days to fetch
+    if df is None or from_date < start:
+        nfetch = lookback_period
+    else:
+        nfetch = (to_date - end).days + 1
+    logger.info("Fetching %d of %d days for %s", nfetch, lookback_period, symbol)
+    fdf = get_feed_data(space.schema, symbol, nfetch, space.fractal,
+                        intraday_data, limiter, retries, timeout)
+    # merge any new bars and update the store
+    if fdf is not None and not fdf.empty:
+        fdf = convert_data(fdf, index_column, intraday_data)
+        if df is not None:
+            df = pd.concat([df, fdf])
+            df = df[~df.index.duplicated(keep='last')].sort_index()
+            start = min(start, from_date)
+        else:
+            df = fdf
+            start = from_date
+        tname = PSEP.join([fname, 'tmp'])
+        write_frame(df, directory, tname, extension, separator,
+                    index=True, index_label=index_column)
+        tfile = SSEP.join([directory, PSEP.join([tname, extension])])
+        if os.path.isfile(tfile):
+            os.replace(tfile, SSEP.join([directory, PSEP.join([fname, extension])]))
+            srange = {'start' : str(start), 'end' : str(to_date)}
+            tfile = PSEP.join([range_file, 'tmp'])
+            with open(tfile, 'w') as f:
+                json.dump(srange, f)
+            os.replace(tfile, range_file)
+    # return the requested range
+    if df is not None:
+        df = df[df.index >= from_date]
+    return df
+
+
+#
+# Function resample_bars
+#
+
+def resample_bars(df, fractal):
+    r"""Resample price bars to a coarser fractal.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The canonical dataframe with a datetime index.
+    fractal : str
+        Pandas offset alias.
+
+    Returns
+    -------
+    rdf : pandas.DataFrame
+        The resampled dataframe without any empty bars.
+
+    """
+    rdf = df.resample(fractal).agg({'open'   : 'first',
+                                    'high'   : 'max',
+                                    'low'    : 'min',
+                                    'close'  : 'last',
+                                    'volume' : 'sum'})
+    rdf.dropna(axis=0, how='any', inplace=True)
+    return rdf
+
+
+#
+# Function get_pyramid_levels
+#
+
+def get_pyramid_levels(data_fractal, fractal):
+    r"""Get the levels of a resampling pyramid.
+
+    Each level is one of the ``PYRAMID_FRACTALS`` between the two
+    fractals, where every level is a multiple of the previous level
+    and evenly divides the target ``fractal``, so that its bars nest
+    exactly within the bars of the next level.
+
+    Parameters
+    ----------
+    data_fractal : str
+        Pandas offset alias of the base data.
+    fractal : str
+        Pandas offset alias of the target data.
+
+    Returns
+    -------
+    levels : list
+        The fractals of the pyramid, ending with the target ``fractal``.
+
+    Examples
+    --------
+
+    >>> get_pyramid_levels('1min', '1H')   # ['5min', '15min', '30min', '1H']
+
+    """
+    levels = []
+    try:
+        previous = pd.to_timedelta(data_fractal)
+        target = pd.to_timedelta(fractal)
+    except:
+        return [fractal]
+    for level in PYRAMID_FRACTALS:
+        interval = pd.to_timedelta(level)
+        if previous < interval < target and \
+           interval % previous == pd.Timedelta(0) and \
+           target % interval == pd.Timedelta(0):
+            levels.append(level)
+            previous = interval
+    levels.append(fractal)
+    return levels
+
+
+#
+# Function get_pyramid_data
+#
+
+def get_pyramid_data(df, directory, space, symbol, levels, index_column,
+                     extension, separator):
+    r"""Resample the base data through a pyramid of stored levels.
+
+    The coarsest stored level that covers the start of the base data
+    is updated by resampling only the base bars from its last
+    (possibly partial) bar onward. Any coarser levels are then built
+    from the next-finer level, and all of the new or updated levels
+    are stored in the ``directory``. If no level is stored, then the
+    whole pyramid is built from the base data.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The canonical base dataframe.
+    directory : str
+        Full directory specification of the pyramid.
+    space : alphapy.Space
+        Namespace of the base data.
+    symbol : str
+        A valid stock symbol.
+    levels : list
+        The fractals of the pyramid from ``get_pyramid_levels``.
+    index_column : str
+        The name of the index column.
+    extension : str
+        File name extension, e.g., ``csv``.
+    separator : str
+        The delimiter between fields in the file.
+
+    Returns
+    -------
+    rdf : pandas.DataFrame
+        The dataframe resampled to the last level, starting with the
+        bar that contains the first base bar.
+
+    Notes
+    -----
+    Because the bars of each level nest within the bars of the next
+    level, resampling the base bars directly to a stored level gives
+    the same bars as resampling through all of the finer levels.
+
+    """
+    fnames = [frame_name(symbol.lower(), Space(space.subject, space.schema, level))
+              for level in levels]
+    # find the coarsest stored level that covers the base data
+    ldf = df
+    start = 0
+    for i in reversed(range(len(levels))):
+        file_all = SSEP.join([directory, PSEP.join([fnames[i], extension])])
+        if os.path.isfile(file_all):
+            sdf = read_frame(directory, fnames[i], extension, separator,
+                             index_col=index_column)
+            if sdf is not None and not sdf.empty:
+                sdf.index = pd.to_datetime(sdf.index)
+                if sdf.index[0] <= df.index[0] <= sdf.index[-1]:
+                    last_bar = sdf.index[-1]
+                    new_bars = resample_bars(df[df.index >= last_bar], levels[i])
+                    ldf = pd.concat([sdf[sdf.index < last_bar], new_bars])
+                    logger.info("Updated %d bars of %s at %s", len(new_bars),
+                                symbol, levels[i])
+                    start = i
+                    break
+    else:
+        ldf = resample_bars(df, levels[0])
+    # build the coarser levels from the next-finer level
+    new_levels = [(start, ldf)]
+    for i in range(start + 1, len(levels)):
+        ldf = resample_bars(ldf, levels[i])
+        logger.info("Created %d bars of %s at %s", len(ldf), symbol, levels[i])
+        new_levels.append((i, ldf))
+    # replace the stored levels atomically
+    for i, sdf in new_levels:
+        tname = PSEP.join([fnames[i], 'tmp'])
+        write_frame(sdf, directory, tname, extension, separator,
+                    index=True, index_label=index_column)
+        tfile = SSEP.join([directory, PSEP.join([tname, extension])])
+        if os.path.isfile(tfile):
+            os.replace(tfile, SSEP.join([directory, PSEP.join([fnames[i], extension])]))
+    # start with the bar containing the first base bar
+    first_bar = max(ldf.index.searchsorted(df.index[0], side='right') - 1, 0)
+    rdf = ldf.iloc[first_bar:]
+    return rdf
+
+
+#
+# Function get_symbol_data
+#
+
+def get_symbol_data(symbol, space, lookback_period, directory,
+                    extension, separator, intraday_data=False,
+                    data_store=False, limiter=None, retries=0,
+                    timeout=None):
+    r"""Get the data for one symbol from its source.
+
+    Parameters
+    ----------
+    symbol : str
+        A valid stock symbol.
+    space : alphapy.Space
+        Namespace of the source, where the ``schema`` is the feed name
+        and the ``fractal`` is the data fractal.
+    lookback_period : int
+        The number of days of data to retrieve.
+    directory : str
+        Full directory specification of the local data.
+    extension : str
+        File name extension, e.g., ``csv``.
+    separator : str
+        The delimiter between fields in the file.
+    intraday_data : bool, optional
+        If True, then get intraday data.
+    data_store : bool, optional
+        If True, then use the local store with ``get_store_data``.
+    limiter : alphapy.RateLimiter, optional
+        The rate limit of the feed.
+    retries : int, optional
+        The number of times to retry a failed request.
+    timeout : float, optional
+        The maximum number of seconds to fetch the data from the feed.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The dataframe containing the data, or ``None`` if no data
+        are available.
+
+    """
+    index_column = 'datetime' if intraday_data else 'date'
+    if space.schema == 'data':
+        # local intraday or daily
+        fname = frame_name(symbol.lower(), space)
+        df = read_frame(directory, fname, extension, separator)
+    elif data_store:
+        # feed data with a local store
+        df = get_store_data(directory, space, symbol, lookback_period,
+                            index_column, intraday_data,
+                            extension, separator, limiter, retries,
+                            timeout)
+    else:
+        df = get_feed_data(space.schema, symbol, lookback_period,
+                           space.fractal, intraday_data, limiter, retries,
+                           timeout)
+    return df
+
+
 #
 # Function get_market_data
 #
 
 def get_market_data(model, group, lookback_period,
-                    data_fractal, intraday_data=False):
+                    data_fractal, intraday_data=False, data_store=False,
+                    workers=1, rate=0, retries=0, timeout=None,
+                    pyramid=False):
     r"""Get data from an external feed.
 
     Parameters
@@ -516,12 +1384,38 @@ def get_market_data(model, group, lookback_period,
         Pandas offset alias.
     intraday_data : bool
         If True, then get intraday data.
+    data_store : bool, optional
+        If True, then keep the feed data in a local store and fetch
+        only the missing bars with ``get_store_data``.
+    workers : int, optional
+        The maximum number of symbols to fetch concurrently.
+    rate : float, optional
+        The maximum number of requests per second to the feed, or
+        zero for no limit.
+    retries : int, optional
+        The number of times to retry a failed request.
+    timeout : float, optional
+        The maximum number of seconds to fetch one symbol, including
+        any retries. If ``None``, then there is no limit.
+    pyramid : bool, optional
+        If True, then resample the data through the stored levels
+        of a resampling pyramid with ``get_pyramid_data``.
 
     Returns
     -------
     n_periods : int
         The maximum number of periods actually retrieved.
 
+    Notes
+    -----
+    The symbols are fetched by a pool of ``workers`` threads, while
+    this thread converts each symbol in sorted order as soon as its
+    data arrive, so the conversion overlaps with the outstanding
+    requests, and the frames and the log do not depend on which
+    request finishes first. The ``timeout`` is passed down to each
+    request of the feed, so a symbol that exceeds it fails in its
+    own thread, and no thread outlives this function.
+
     """
 
     # Unpack model specifications
@@ -550,57 +1444,65 @@ def get_market_data(model, group, lookback_period,
     # Get the data from the relevant feed
 
     data_dir = SSEP.join([directory, 'data'])
-    pandas_data = any(substring in schema for substring in PD_WEB_DATA_FEEDS)
     n_periods = 0
     resample_data = True if fractal != data_fractal else False
+    if resample_data and pyramid:
+        levels = get_pyramid_levels(data_fractal, fractal)
+        logger.info("Resampling Pyramid: %s", levels)
+        pyramid_dir = SSEP.join([data_dir, 'pyramid'])
+        if not os.path.exists(pyramid_dir):
+            os.makedirs(pyramid_dir)
     df = None
     to_date = pd.to_datetime('today')
     from_date = to_date - pd.to_timedelta(lookback_period, unit='d')
 
-    for item in group.members:
-        logger.info("Getting %s data for last %d days", item, lookback_period)
-        # Locate the data source
-        if schema == 'data':
-            # local intraday or daily
-            dspace = Space(gspace.subject, gspace.schema, data_fractal)
-            fname = frame_name(item.lower(), dspace)
-            df = read_frame(data_dir, fname, extension, separator)
-        elif schema == 'google' and intraday_data:
-            # intraday only
-            df = get_google_data(item, lookback_period, data_fractal)
-        elif pandas_data:
-            # daily only
-            df = get_pandas_data(schema, item, lookback_period)
-        else:
-            logger.error("Unsupported Data Source: %s", schema)
-        # Now that we have content, standardize the data
-        if df is not None and not df.empty:
-            logger.info("%d data points from %s to %s", len(df), from_date, to_date)
-            # convert data to canonical form
-            df = convert_data(df, index_column, intraday_data)
-            # resample data and forward fill any NA values
-            if resample_data:
-                df = df.resample(fractal).agg({'open'   : 'first',
-                                               'high'   : 'max',
-                                               'low'    : 'min',
-                                               'close'  : 'last',
-                                               'volume' : 'sum'})
-                df.dropna(axis=0, how='any', inplace=True)
-                logger.info("Rows after Resampling at %s: %d",
-                            fractal, len(df))
-            # add intraday columns if necessary
-            if intraday_data:
-                df = enhance_intraday_data(df)
-            # allocate global Frame
-            newf = Frame(item.lower(), gspace, df)
-            if newf is None:
-                logger.error("Could not allocate Frame for: %s", item)
-            # calculate maximum number of periods
-            df_len = len(df)
-            if df_len > n_periods:
-                n_periods = df_len
-        else:
-            logger.info("No DataFrame for %s", item)
+    dspace = Space(gspace.subject, schema, data_fractal)
+    limiter = RateLimiter(rate)
+    symbols = sorted(group.members)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = {}
+        for item in symbols:
+            logger.info("Getting %s data for last %d days", item, lookback_period)
+            futures[item] = executor.submit(get_symbol_data, item, dspace,
+                                            lookback_period, data_dir,
+                                            extension, separator,
+                                            intraday_data, data_store,
+                                            limiter, retries, timeout)
+        # standardize the data of each symbol as they arrive
+        for item in symbols:
+            try:
+                df = futures[item].result()
+            except:
+                df = None
+                logger.info("Could not get data for %s", item)
+            # Now that we have content, standardize the data
+            if df is not None and not df.empty:
+                logger.info("%d data points from %s to %s", len(df), from_date, to_date)
+                # convert data to canonical form
+                df = convert_data(df, index_column, intraday_data)
+                # resample data and forward fill any NA values
+                if resample_data and pyramid:
+                    df = get_pyramid_data(df, pyramid_dir, dspace, item, levels,
+                                          index_column, extension, separator)
+                    logger.info("Rows after Resampling at %s: %d",
+                                fractal, len(df))
+                elif resample_data:
+                    df = resample_bars(df, fractal)
+                    logger.info("Rows after Resampling at %s: %d",
+                                fractal, len(df))
+                # add intraday columns if necessary
+                if intraday_data:
+                    df = enhance_intraday_data(df)
+                # allocate global Frame
+                newf = Frame(item.lower(), gspace, df)
+                if newf is None:
+                    logger.error("Could not allocate Frame for: %s", item)
+                # calculate maximum number of periods
+                df_len = len(df)
+                if df_len > n_periods:
+                    n_periods = df_len
+            else:
+                logger.info("No DataFrame for %s", item)
 
     # The number of periods actually retrieved
     return n_periods
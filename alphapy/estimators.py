@@ -36,6 +36,7 @@ from keras.wrappers.scikit_learn import KerasClassifier
 from keras.wrappers.scikit_learn import KerasRegressor
 import logging
 import numpy as np
+from scipy import sparse
 from scipy.stats import randint as sp_randint
 from sklearn.ensemble import AdaBoostClassifier
 from sklearn.ensemble import ExtraTreesClassifier
@@ -174,6 +175,51 @@ estimator_map = {'AB'     : AdaBoostClassifier,
                 }
 
 
+#
+# Define estimators that require dense input
+#
+
+dense_estimators = (KerasClassifier, KerasRegressor)
+
+
+#
+# Function dense_input
+#
+
+def dense_input(est, X):
+    r"""Densify a sparse feature matrix for an estimator that
+    requires dense input.
+
+    Parameters
+    ----------
+    est : estimator
+        The estimator, which may be wrapped in a pipeline, a grid
+        search, feature elimination, or calibration.
+    X : numpy array or sparse matrix
+        The feature matrix.
+
+    Returns
+    -------
+    X : numpy array or sparse matrix
+        The dense copy of a sparse ``X`` if ``est`` requires it;
+        otherwise, the original ``X``.
+
+    """
+    if sparse.issparse(X):
+        inner = est
+        while inner is not None and not isinstance(inner, dense_estimators):
+            if hasattr(inner, 'steps'):
+                inner = inner.steps[-1][1]
+            elif getattr(inner, 'base_estimator', None) is not None:
+                inner = inner.base_estimator
+            else:
+                inner = getattr(inner, 'estimator', None)
+        if inner is not None:
+            logger.info("Densifying features for %s", inner.__class__.__name__)
+            X = X.toarray()
+    return X
+
+
 #
 # Function get_algos_config
 #
@@ -0,0 +1,328 @@
+################################################################################
+#
+# Package   : AlphaPy
+# Module    : bar_store_check
+# Created   : October 16, 2026
+#
+# Copyright 2017 ScottFree Analytics LLC
+# Mark Conway & Robert D. Scott II
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+################################################################################
+
+
+#
+# Check the local bar store with a file-based stand-in feed
+# ---------------------------------------------------------
+#
+# The history of a symbol is written to a source directory, and the
+# get_local_data feed serves it to get_store_data, recording the days
+# requested by each call. The store is aged between runs by moving the
+# end of its JSON range back and dropping the later bars, as if the
+# last run had been some days ago. The checks are:
+#
+# 1. The first run fetches the whole lookback period.
+# 2. A second run fetches only the missing days.
+# 3. A run interrupted while writing the new data file leaves the CSV
+#    and the JSON range untouched.
+# 4. A run interrupted after replacing the data file but before the
+#    range file leaves a CSV that covers the stored range, and the
+#    next run fetches the gap again without duplicating any bars.
+#
+# After every run, each source bar within the JSON range must be in
+# the CSV with the same values, and the CSV has no duplicate dates.
+#
+# Example
+# -------
+#
+# python bar_store_check.py --days 400 --lookback 300 --age 10
+#
+
+
+#
+# Imports
+#
+
+import alphapy.data as data
+from alphapy.data import Feed
+from alphapy.data import get_local_data
+from alphapy.data import get_store_data
+from alphapy.frame import frame_name
+from alphapy.globals import PSEP, SSEP
+from alphapy.space import Space
+
+import argparse
+from contextlib import contextmanager
+import json
+import numpy as np
+import os
+import pandas as pd
+import shutil
+import sys
+import tempfile
+
+
+#
+# Class Interrupt
+#
+
+class Interrupt(Exception):
+    """Simulate a crash in the middle of a store update."""
+    pass
+
+
+#
+# Function interrupt_write
+#
+
+@contextmanager
+def interrupt_write():
+    r"""Write half of the new data file, then crash."""
+    write_frame = data.write_frame
+    def write_half(df, *args, **kwargs):
+        write_frame(df.iloc[:len(df) // 2], *args, **kwargs)
+        raise Interrupt("interrupted writing the data file")
+    data.write_frame = write_half
+    try:
+        yield
+    finally:
+        data.write_frame = write_frame
+
+
+#
+# Function interrupt_range
+#
+
+@contextmanager
+def interrupt_range():
+    r"""Replace the data file, then crash before the range file."""
+    replace = os.replace
+    def replace_data(src, dst):
+        if dst.endswith('.json'):
+            raise Interrupt("interrupted replacing the range file")
+        replace(src, dst)
+    os.replace = replace_data
+    try:
+        yield
+    finally:
+        os.replace = replace
+
+
+#
+# Class BarStore
+#
+
+class BarStore(object):
+    """The files of one symbol in the store.
+
+    Parameters
+    ----------
+    directory : str
+        Full directory specification of the store.
+    fname : str
+        The frame name of the symbol.
+
+    """
+
+    # __init__
+
+    def __init__(self,
+                 directory,
+                 fname):
+        # code
+        self.data_file = SSEP.join([directory, PSEP.join([fname, 'csv'])])
+        self.range_file = SSEP.join([directory, PSEP.join([fname, 'json'])])
+
+    # function read
+
+    def read(self):
+        r"""Read the stored bars and the stored range."""
+        df = pd.read_csv(self.data_file, index_col='date', parse_dates=True)
+        with open(self.range_file, 'r') as f:
+            srange = json.load(f)
+        return df, pd.to_datetime(srange['start']), pd.to_datetime(srange['end'])
+
+    # function snapshot
+
+    def snapshot(self):
+        r"""Get the contents of both files."""
+        with open(self.data_file, 'rb') as f1, open(self.range_file, 'rb') as f2:
+            return f1.read(), f2.read()
+
+    # function age
+
+    def age(self, ndays):
+        r"""Move the end of the range back, as if the last run was earlier."""
+        df, start, end = self.read()
+        end = end - pd.to_timedelta(ndays, unit='D')
+        df = df[df.index <= end]
+        df.to_csv(self.data_file, index_label='date')
+        with open(self.range_file, 'w') as f:
+            json.dump({'start' : str(start), 'end' : str(end)}, f)
+
+
+#
+# Function make_source
+#
+
+def make_source(directory, symbol, ndays, seed):
+    r"""Write the daily history of a symbol to a source file.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The history indexed by date.
+
+    """
+    rng = np.random.RandomState(seed)
+    dates = pd.bdate_range(end=pd.Timestamp('today').normalize(), periods=ndays,
+                           name='date')
+    close = np.round(100.0 + np.cumsum(rng.normal(0.0, 1.0, ndays)), 2)
+    df = pd.DataFrame({'open'   : close,
+                       'high'   : close + 1.0,
+                       'low'    : close - 1.0,
+                       'close'  : close,
+                       'volume' : rng.randint(1000, 5000, ndays).astype(float)},
+                      index=dates)
+    df.to_csv(SSEP.join([directory, PSEP.join([symbol.lower(), 'csv'])]),
+              date_format='%Y-%m-%d')
+    return df
+
+
+#
+# Function check_store
+#
+
+def check_store(store, source):
+    r"""Check that the CSV covers the JSON range without duplicates."""
+    df, start, end = store.read()
+    expected = source[(source.index >= start.normalize()) & (source.index <= end)]
+    if df.index.has_duplicates or not df.index.is_monotonic_increasing:
+        return False
+    if not expected.index.isin(df.index).all():
+        return False
+    stored = df.loc[expected.index, expected.columns]
+    return np.allclose(stored.values, expected.values)
+
+
+#
+# Function main
+#
+
+def main(args=None):
+    r"""Run the bar store checks.
+
+    Parameters
+    ----------
+    args : list, optional
+        The command line arguments.
+
+    Returns
+    -------
+    nfail : int
+        The number of failed checks.
+
+    """
+
+    # Argument Parsing
+
+    parser = argparse.ArgumentParser(description="local bar store check")
+    parser.add_argument('--days', type=int, default=400)
+    parser.add_argument('--lookback', type=int, default=300)
+    parser.add_argument('--age', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(args)
+
+    # Register the stand-in feed
+
+    base_dir = tempfile.mkdtemp(prefix='alphapy_store_')
+    source_dir = SSEP.join([base_dir, 'source'])
+    store_dir = SSEP.join([base_dir, 'store'])
+    os.makedirs(source_dir)
+    os.makedirs(store_dir)
+    symbol = 'AAA'
+    source = make_source(source_dir, symbol, args.days, args.seed)
+    requests = []
+
+    def get_recorded_data(symbol, lookback_period, fractal):
+        requests.append(lookback_period)
+        return get_local_data(source_dir, symbol, lookback_period, fractal)
+
+    Feed('local', get_recorded_data)
+    space = Space('stock', 'local', '1d')
+    store = BarStore(store_dir, frame_name(symbol.lower(), space))
+
+    def fetch():
+        return get_store_data(store_dir, space, symbol, args.lookback,
+                              'date', False, 'csv', ',')
+
+    # Run the checks
+
+    checks = []
+    try:
+        # 1. first run
+        df = fetch()
+        checks.append(("first run fetches %d of %d days" % (requests[-1], args.lookback),
+                       requests[-1] == args.lookback and check_store(store, source)))
+        expected = len(df)
+        # 2. gap fetch
+        store.age(args.age)
+        df = fetch()
+        checks.append(("second run fetches %d days after %d days" % (requests[-1], args.age),
+                       requests[-1] == args.age + 1 and len(df) == expected
+                       and check_store(store, source)))
+        # 3. interrupted data file
+        store.age(args.age)
+        before = store.snapshot()
+        try:
+            with interrupt_write():
+                fetch()
+        except Interrupt:
+            pass
+        checks.append(("interrupted data file leaves the store unchanged",
+                       store.snapshot() == before and check_store(store, source)))
+        df = fetch()
+        checks.append(("next run fetches %d days" % requests[-1],
+                       requests[-1] == args.age + 1 and len(df) == expected
+                       and check_store(store, source)))
+        # 4. interrupted range file
+        store.age(args.age)
+        nbefore = len(store.read()[0])
+        try:
+            with interrupt_range():
+                fetch()
+        except Interrupt:
+            pass
+        checks.append(("interrupted range file leaves a consistent store",
+                       len(store.read()[0]) > nbefore and check_store(store, source)))
+        df = fetch()
+        checks.append(("next run fetches %d days without duplicates" % requests[-1],
+                       requests[-1] == args.age + 1 and len(df) == expected
+                       and check_store(store, source)))
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+    nfail = 0
+    for message, ok in checks:
+        nfail += not ok
+        print("%-6s %s" % ('ok' if ok else 'FAIL', message))
+    return nfail
+
+
+#
+# MAIN PROGRAM
+#
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
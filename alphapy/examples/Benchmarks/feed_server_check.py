@@ -0,0 +1,301 @@
+################################################################################
+#
+# Package   : AlphaPy
+# Module    : feed_server_check
+# Created   : October 16, 2026
+#
+# Copyright 2017 ScottFree Analytics LLC
+# Mark Conway & Robert D. Scott II
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+################################################################################
+
+
+#
+# Check the concurrent market data fetch against a fake feed server
+# -----------------------------------------------------------------
+#
+# A threaded HTTP server on localhost serves daily bars for any symbol
+# after an injected latency. The first request for every third symbol
+# fails with a 503, and the symbols starting with "slow" stall for much
+# longer than the timeout. The server is registered as a Feed, and
+# get_market_data fetches the whole group, checking that:
+#
+# 1. No more than feed_workers requests are in flight at once.
+# 2. The requests do not arrive faster than the feed_rate.
+# 3. The failed requests are retried, and those symbols get their data.
+# 4. The stalled symbols time out in their own threads, the fetch ends
+#    soon after the timeout, and no worker threads are left behind.
+#
+# Example
+# -------
+#
+# python feed_server_check.py --symbols 24 --workers 4 --rate 20
+#
+
+
+#
+# Imports
+#
+
+from alphapy.data import Feed
+from alphapy.data import FeedSession
+from alphapy.data import get_market_data
+from alphapy.frame import Frame
+from alphapy.frame import frame_name
+from alphapy.group import Group
+from alphapy.model import Model
+from alphapy.space import Space
+
+import argparse
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+import io
+import pandas as pd
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+
+#
+# Class FakeFeedServer
+#
+
+class FakeFeedServer(socketserver.ThreadingMixIn, HTTPServer):
+    """Serve daily bars after a latency, with injected failures.
+
+    Parameters
+    ----------
+    latency : float
+        The number of seconds to wait before each response.
+    stall : float
+        The number of seconds to wait for the ``slow`` symbols.
+
+    Attributes
+    ----------
+    requests : list
+        The ``(arrival_time, symbol, status)`` of each request.
+    in_flight : int
+        The number of requests being served.
+    max_in_flight : int
+        The maximum number of requests served at once.
+
+    """
+
+    daemon_threads = True
+
+    # __init__
+
+    def __init__(self,
+                 latency,
+                 stall):
+        # code
+        HTTPServer.__init__(self, ('127.0.0.1', 0), FakeFeedHandler)
+        self.latency = latency
+        self.stall = stall
+        self.lock = threading.Lock()
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    # function url
+
+    def url(self, symbol, lookback_period):
+        r"""Get the request URL for a symbol."""
+        host, port = self.server_address
+        return 'http://%s:%d/%s?days=%d' % (host, port, symbol, lookback_period)
+
+
+#
+# Class FakeFeedHandler
+#
+
+class FakeFeedHandler(BaseHTTPRequestHandler):
+    """Handle one request of the fake feed server."""
+
+    # function do_GET
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        symbol = url.path.strip('/')
+        days = int(parse_qs(url.query)['days'][0])
+        with server.lock:
+            arrival = time.time()
+            attempts = sum(1 for r in server.requests if r[1] == symbol)
+            flaky = not symbol.startswith('slow') and int(symbol[1:]) % 3 == 0
+            fail = flaky and attempts == 0
+            server.requests.append((arrival, symbol, 503 if fail else 200))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.stall if symbol.startswith('slow') else server.latency)
+            if fail:
+                self.send_error(503)
+                return
+            dates = pd.bdate_range(end=pd.Timestamp('today').normalize(),
+                                   periods=days)
+            close = 100.0 + pd.Series(range(days), dtype=float)
+            df = pd.DataFrame({'date'   : dates.strftime('%Y-%m-%d'),
+                               'open'   : close.values,
+                               'high'   : close.values + 1.0,
+                               'low'    : close.values - 1.0,
+                               'close'  : close.values,
+                               'volume' : 1000.0})
+            body = df.to_csv(index=False).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/csv')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    # function log_message
+
+    def log_message(self, format, *args):
+        pass
+
+
+#
+# Function worker_threads
+#
+
+def worker_threads():
+    r"""Count the live threads of the fetch executors."""
+    return sum(1 for t in threading.enumerate()
+               if t.name.startswith('ThreadPoolExecutor'))
+
+
+#
+# Function main
+#
+
+def main(args=None):
+    r"""Fetch a group from the fake feed server and check the results.
+
+    Parameters
+    ----------
+    args : list, optional
+        The command line arguments.
+
+    Returns
+    -------
+    nfail : int
+        The number of failed checks.
+
+    """
+
+    # Argument Parsing
+
+    parser = argparse.ArgumentParser(description="fake feed server check")
+    parser.add_argument('--symbols', type=int, default=24)
+    parser.add_argument('--slow', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=20.0)
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--timeout', type=float, default=1.5)
+    args = parser.parse_args(args)
+
+    # Start the server and register it as a feed
+
+    server = FakeFeedServer(args.latency, args.timeout * 10)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def get_fake_data(symbol, lookback_period, fractal, timeout=None):
+        response = FeedSession(timeout).get(server.url(symbol, lookback_period))
+        response.raise_for_status()
+        return pd.read_csv(io.StringIO(response.text))
+
+    Feed('fake', get_fake_data)
+
+    # Fetch the group
+
+    symbols = ['s%d' % i for i in range(args.symbols)]
+    slow = ['slow%d' % i for i in range(args.slow)]
+    space = Space('stock', 'fake', '1d')
+    group = Group('fake', space)
+    group.members = set(symbols + slow)
+    directory = tempfile.mkdtemp(prefix='alphapy_feed_')
+    model = Model({'algorithms' : [],
+                   'directory'  : directory,
+                   'extension'  : 'csv',
+                   'separator'  : ','})
+    Frame.frames.clear()
+    threads_before = worker_threads()
+    start = time.time()
+    try:
+        npoints = get_market_data(model, group, 30, '1d', workers=args.workers,
+                                  rate=args.rate, retries=args.retries,
+                                  timeout=args.timeout)
+    finally:
+        elapsed = time.time() - start
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(directory, ignore_errors=True)
+    threads_after = worker_threads()
+
+    # Check the results
+
+    checks = []
+    checks.append(("in flight <= feed_workers (%d <= %d)" %
+                   (server.max_in_flight, args.workers),
+                   server.max_in_flight <= args.workers))
+    arrivals = sorted(r[0] for r in server.requests)
+    span = arrivals[-1] - arrivals[0]
+    min_span = (len(arrivals) - 1) / args.rate if args.rate > 0 else 0.0
+    checks.append(("%d requests over %.2f s >= %.2f s at the feed_rate" %
+                   (len(arrivals), span, min_span),
+                   span >= 0.95 * min_span))
+    failed = {r[1] for r in server.requests if r[2] == 503}
+    retried = [s for s in failed
+               if sum(1 for r in server.requests if r[1] == s) > 1]
+    loaded = [s for s in failed if frame_name(s, space) in Frame.frames]
+    checks.append(("%d failed symbols retried, %d loaded" %
+                   (len(retried), len(loaded)),
+                   len(failed) > 0 and len(retried) == len(failed) == len(loaded)))
+    missing = [s for s in slow if frame_name(s, space) in Frame.frames]
+    checks.append(("%d slow symbols timed out, fetch took %.2f s < %.2f s stall" %
+                   (len(slow) - len(missing), elapsed, server.stall),
+                   not missing and elapsed < server.stall))
+    checks.append(("worker threads left behind: %d" %
+                   (threads_after - threads_before),
+                   threads_after == threads_before))
+    checks.append(("%d of %d symbols loaded with %d bars" %
+                   (len(Frame.frames), len(symbols), npoints),
+                   len(Frame.frames) == len(symbols) and npoints == 30))
+
+    nfail = 0
+    for message, ok in checks:
+        nfail += not ok
+        print("%-6s %s" % ('ok' if ok else 'FAIL', message))
+    return nfail
+
+
+#
+# MAIN PROGRAM
+#
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
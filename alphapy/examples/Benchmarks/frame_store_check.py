@@ -0,0 +1,213 @@
+################################################################################
+#
+# Package   : AlphaPy
+# Module    : frame_store_check
+# Created   : October 16, 2026
+#
+# Copyright 2017 ScottFree Analytics LLC
+# Mark Conway & Robert D. Scott II
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+################################################################################
+
+
+#
+# Check which frame columns stay memory-mapped
+# --------------------------------------------
+#
+# With Frame.directory set, the floating point columns of a frame are
+# backed by a memory-mapped file, until pandas copies them. A group of
+# synthetic frames is stored, the variables are applied with vmapply,
+# and each frame is sequenced with sequence_frame. The checks are:
+#
+# 1. All floating point columns are mapped after the frame is stored.
+# 2. All floating point columns, including the new variables, are
+#    mapped after vmapply stores the frame with vstore.
+# 3. The leader columns are still mapped after sequence_frame, and
+#    the lagged columns are new arrays in memory.
+#
+# The values of the mapped frames must equal those of in-memory frames.
+#
+# Example
+# -------
+#
+# python frame_store_check.py --symbols 20 --rows 1000 --lag 3
+#
+
+
+#
+# Imports
+#
+
+from alphapy.alias import Alias
+from alphapy.frame import Frame
+from alphapy.frame import frame_name
+from alphapy.frame import mapped_columns
+from alphapy.frame import sequence_frame
+from alphapy.group import Group
+from alphapy.market_variables import Variable
+from alphapy.market_variables import vmapply
+from alphapy.space import Space
+
+import argparse
+import numpy as np
+import pandas as pd
+import shutil
+import sys
+import tempfile
+
+
+#
+# Check Variables
+#
+
+VARIABLES = ['cma_20', 'madelta', 'net_close_1', 'truerange']
+
+
+#
+# Function make_frames
+#
+
+def make_frames(group, nsymbols, nrows, seed):
+    r"""Create the synthetic frames of a group.
+
+    Returns
+    -------
+    frames : dict
+        The in-memory copy of each frame, keyed by frame name.
+
+    """
+    Frame.frames.clear()
+    rng = np.random.RandomState(seed)
+    index = pd.bdate_range('2010-01-01', periods=nrows, name='date')
+    symbols = ['s%d' % i for i in range(nsymbols)]
+    frames = {}
+    for symbol in symbols:
+        close = 100.0 + np.cumsum(rng.normal(0.0, 1.0, nrows))
+        df = pd.DataFrame({'open'   : close + rng.normal(0.0, 0.5, nrows),
+                           'high'   : close + 1.0 + rng.rand(nrows),
+                           'low'    : close - 1.0 - rng.rand(nrows),
+                           'close'  : close,
+                           'volume' : rng.randint(1000, 5000, nrows)},
+                          index=index)
+        frames[frame_name(symbol, group.space)] = df.copy()
+        Frame(symbol, group.space, df)
+    group.members = set(symbols)
+    return frames
+
+
+#
+# Function float_columns
+#
+
+def float_columns(df):
+    r"""Get the floating point columns of a dataframe."""
+    return [c for c, dt in zip(df.columns, df.dtypes) if dt == np.float64]
+
+
+#
+# Function main
+#
+
+def main(args=None):
+    r"""Store, extend, and sequence the frames, and check their maps.
+
+    Parameters
+    ----------
+    args : list, optional
+        The command line arguments.
+
+    Returns
+    -------
+    nfail : int
+        The number of failed checks.
+
+    """
+
+    # Argument Parsing
+
+    parser = argparse.ArgumentParser(description="frame store check")
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--lag', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(args)
+
+    # Define the aliases and variables
+
+    Alias('atr', 'ma_truerange')
+    Alias('cma', 'ma_close')
+    Variable('madelta', '(close - cma_20) / atr_10')
+    group = Group('check', Space('stock', 'prices', '1d'))
+
+    # Apply the variables to frames in memory for reference
+
+    make_frames(group, args.symbols, args.rows, args.seed)
+    vmapply(group, VARIABLES)
+    expected = {fn : f.df.copy() for fn, f in Frame.frames.items()}
+
+    # Store the frames in memory-mapped files
+
+    Frame.directory = tempfile.mkdtemp(prefix='alphapy_frames_')
+    checks = []
+    try:
+        frames = make_frames(group, args.symbols, args.rows, args.seed)
+        stored = [(fn, float_columns(f.df), mapped_columns(f.df))
+                  for fn, f in Frame.frames.items()]
+        same = all([Frame.frames[fn].df.equals(df) for fn, df in frames.items()])
+        checks.append(("stored frames map %d of %d float columns" %
+                       (sum([len(m) for _, _, m in stored]),
+                        sum([len(c) for _, c, _ in stored])),
+                       same and all([c == m for _, c, m in stored])))
+        # vstore maps the frame again with the new variables
+        vmapply(group, VARIABLES)
+        stored = [(fn, float_columns(f.df), mapped_columns(f.df))
+                  for fn, f in Frame.frames.items()]
+        same = all([Frame.frames[fn].df.equals(df) for fn, df in expected.items()])
+        checks.append(("vstore maps %d of %d float columns" %
+                       (sum([len(m) for _, _, m in stored]),
+                        sum([len(c) for _, c, _ in stored])),
+                       same and all([c == m for _, c, m in stored])))
+        # sequence_frame lags the columns into memory
+        leaders = ['open']
+        nleaders = nlagged = nmapped = 0
+        for fn, f in Frame.frames.items():
+            sf = sequence_frame(f.df, 'close', 1, leaders, args.lag)
+            mapped = set(mapped_columns(sf))
+            lagged = [c for c in sf.columns if c.endswith(']')]
+            nleaders += sum([c in mapped for c in leaders])
+            nlagged += len(lagged)
+            nmapped += sum([c in mapped for c in lagged])
+        nframes = len(Frame.frames)
+        checks.append(("sequence_frame keeps %d of %d leaders mapped, "
+                       "%d of %d lagged columns mapped" %
+                       (nleaders, nframes * len(leaders), nmapped, nlagged),
+                       nleaders == nframes * len(leaders) and nmapped == 0))
+    finally:
+        shutil.rmtree(Frame.directory, ignore_errors=True)
+        Frame.directory = None
+
+    nfail = 0
+    for message, ok in checks:
+        nfail += not ok
+        print("%-6s %s" % ('ok' if ok else 'FAIL', message))
+    return nfail
+
+
+#
+# MAIN PROGRAM
+#
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
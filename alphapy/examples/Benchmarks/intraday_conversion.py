@@ -0,0 +1,241 @@
+################################################################################
+#
+# Package   : AlphaPy
+# Module    : intraday_conversion
+# Created   : October 16, 2026
+#
+# Copyright 2017 ScottFree Analytics LLC
+# Mark Conway & Robert D. Scott II
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+################################################################################
+
+
+#
+# Parity and benchmark of the intraday conversion
+# -----------------------------------------------
+#
+# convert_data inferred the format of every date and time string, and
+# enhance_intraday_data grouped the bars by a formatted date string.
+# The original functions are kept here as the reference implementation.
+# A feed-like frame of one-minute bars with date and time strings is
+# created, both versions convert and enhance it, and the frames must
+# be identical, including the bar_number and end_of_day columns.
+#
+# Example
+# -------
+#
+# python intraday_conversion.py --bars 5000000
+#
+
+
+#
+# Imports
+#
+
+from alphapy.data import convert_data
+from alphapy.data import enhance_intraday_data
+
+import argparse
+import numpy as np
+import pandas as pd
+import sys
+import time
+
+
+#
+# Function convert_data_infer
+#
+
+def convert_data_infer(df, index_column, intraday_data):
+    r"""Reference ``convert_data`` that infers the date formats."""
+
+    # Standardize column names
+    df = df.rename(columns = lambda x: x.lower().replace(' ',''))
+
+    # Create the time/date index if not already done
+
+    if not isinstance(df.index, pd.DatetimeIndex):
+        df.reset_index(inplace=True)
+        if intraday_data:
+            dt_column = df['date'] + ' ' + df['time']
+        else:
+            dt_column = df['date']
+        df[index_column] = pd.to_datetime(dt_column)
+        df.set_index(pd.DatetimeIndex(df[index_column]),
+                     drop=True, inplace=True)
+        del df['date']
+        if intraday_data:
+            del df['time']
+
+    # Make the remaining columns floating point
+
+    cols_float = ['open', 'high', 'low', 'close', 'volume']
+    df[cols_float] = df[cols_float].astype(float)
+
+    # Order the frame by increasing date if necessary
+    df = df.sort_index()
+
+    return df
+
+
+#
+# Function enhance_intraday_groupby
+#
+
+def enhance_intraday_groupby(df):
+    r"""Reference ``enhance_intraday_data`` that groups by date strings."""
+
+    # Group by date first
+
+    df['date'] = df.index.strftime('%Y-%m-%d')
+    date_group = df.groupby('date')
+
+    # Number the intraday bars
+    df['bar_number'] = date_group.cumcount()
+
+    # Mark the end of the trading day
+
+    df['end_of_day'] = False
+    df.loc[date_group.tail(1).index, 'end_of_day'] = True
+
+    # Return the enhanced frame
+
+    del df['date']
+    return df
+
+
+#
+# Function make_bars
+#
+
+def make_bars(nbars, bars_per_day, seed):
+    r"""Create a feed-like frame of intraday bars.
+
+    Parameters
+    ----------
+    nbars : int
+        The total number of bars.
+    bars_per_day : int
+        The number of one-minute bars in a full session. Every tenth
+        day is a half session, as on the day before a holiday.
+    seed : int
+        The seed of the random number generator.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The frame with ``date`` and ``time`` strings and the prices.
+
+    """
+    rng = np.random.RandomState(seed)
+    ndays = nbars // bars_per_day + nbars // (bars_per_day * 10) + 2
+    days = pd.bdate_range('1990-01-02', periods=ndays)
+    day_bars = np.full(ndays, bars_per_day)
+    day_bars[::10] = bars_per_day // 2
+    ends = np.cumsum(day_bars)
+    ndays = np.searchsorted(ends, nbars) + 1
+    day_bars = day_bars[:ndays]
+    day_bars[-1] -= ends[ndays - 1] - nbars
+    dates = np.repeat(days[:ndays].strftime('%Y-%m-%d').values, day_bars)
+    minutes = pd.timedelta_range('09:30:00', periods=bars_per_day, freq='1min')
+    clock = (pd.Timestamp('1900-01-01') + minutes).strftime('%H:%M:%S').values
+    times = np.concatenate([clock[:n] for n in day_bars])
+    close = 100.0 + np.cumsum(rng.normal(0.0, 0.1, nbars))
+    return pd.DataFrame({'Date'   : dates,
+                         'Time'   : times,
+                         'Open'   : close + rng.normal(0.0, 0.05, nbars),
+                         'High'   : close + 0.1,
+                         'Low'    : close - 0.1,
+                         'Close'  : close,
+                         'Volume' : rng.randint(100, 1000, nbars)})
+
+
+#
+# Function time_call
+#
+
+def time_call(func, *args):
+    r"""Call a function and return its result and elapsed time."""
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
+#
+# Function main
+#
+
+def main(args=None):
+    r"""Compare and time both versions of the intraday conversion.
+
+    Parameters
+    ----------
+    args : list, optional
+        The command line arguments.
+
+    Returns
+    -------
+    same : bool
+        ``True`` if both versions create identical frames.
+
+    """
+
+    # Argument Parsing
+
+    parser = argparse.ArgumentParser(description="intraday conversion benchmark")
+    parser.add_argument('--bars', type=int, default=5000000)
+    parser.add_argument('--bars-per-day', type=int, default=390)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(args)
+
+    # Convert and enhance the bars with both versions
+
+    raw = make_bars(args.bars, args.bars_per_day, args.seed)
+    print("Bars: %d, Days: %d" % (len(raw), raw['Date'].nunique()))
+    old, t_convert_old = time_call(convert_data_infer, raw.copy(), 'datetime', True)
+    old, t_enhance_old = time_call(enhance_intraday_groupby, old)
+    new, t_convert_new = time_call(convert_data, raw.copy(), 'datetime', True)
+    new, t_enhance_new = time_call(enhance_intraday_data, new)
+
+    # Compare the frames
+
+    same_bars = (old['bar_number'].values == new['bar_number'].values).all()
+    same_ends = (old['end_of_day'].values == new['end_of_day'].values).all()
+    try:
+        pd.testing.assert_frame_equal(new, old, check_exact=True)
+        same = True
+    except AssertionError as e:
+        print(e)
+        same = False
+    same = same and same_bars and same_ends
+
+    # Print the comparison
+
+    print("%-22s %10s %10s %8s" % ('step', 'old (s)', 'new (s)', 'speedup'))
+    for step, t_old, t_new in [('convert_data', t_convert_old, t_convert_new),
+                               ('enhance_intraday_data', t_enhance_old, t_enhance_new)]:
+        print("%-22s %10.2f %10.2f %8.1f" % (step, t_old, t_new, t_old / max(t_new, 1e-9)))
+    print("bar_number identical: %s" % ('yes' if same_bars else 'NO'))
+    print("end_of_day identical: %s" % ('yes' if same_ends else 'NO'))
+    print("frames identical: %s" % ('yes' if same else 'NO'))
+    return same
+
+
+#
+# MAIN PROGRAM
+#
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,258 @@
+################################################################################
+#
+# Package   : AlphaPy
+# Module    : run_analysis_streaming
+# Created   : October 16, 2026
+#
+# Copyright 2017 ScottFree Analytics LLC
+# Mark Conway & Robert D. Scott II
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+################################################################################
+
+
+#
+# Benchmark the streaming mode of run_analysis
+# --------------------------------------------
+#
+# A synthetic universe of frames is created, and run_analysis writes
+# the train and test files once by concatenating the rows of all the
+# symbols, and once by streaming the rows of each symbol to the files.
+# Each mode runs in a fresh interpreter, so that the peak RSS of one
+# mode does not hide the peak of the other. The AlphaPy pipeline that
+# follows the analysis is replaced by a no-op, so only the assembly
+# of the files is measured. Both modes must write identical files.
+#
+# Only delimited text files can be streamed. For the binary formats,
+# e.g., --extension parquet, run_analysis falls back to concatenation
+# and both modes report the same peak.
+#
+# Example
+# -------
+#
+# python run_analysis_streaming.py --symbols 1000 --rows 2000
+#
+
+
+#
+# Imports
+#
+
+import argparse
+import hashlib
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+#
+# Benchmark Modes
+#
+
+MODES = ['concat', 'streaming']
+
+
+#
+# Function peak_rss
+#
+
+def peak_rss():
+    r"""Get the peak resident set size of this process in megabytes."""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return maxrss / scale
+
+
+#
+# Function file_digest
+#
+
+def file_digest(full_path):
+    r"""Calculate the digest of a file, or ``None`` if it is missing."""
+    if not os.path.isfile(full_path):
+        return None
+    digest = hashlib.sha256()
+    with open(full_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+#
+# Function run_mode
+#
+
+def run_mode(args):
+    r"""Run one mode of ``run_analysis`` and print its results as JSON.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The parsed command line arguments, including the ``mode``.
+
+    Returns
+    -------
+    None : None
+
+    """
+
+    import alphapy.analysis as an
+    from alphapy.analysis import Analysis
+    from alphapy.analysis import run_analysis
+    from alphapy.frame import Frame
+    from alphapy.globals import PSEP, SSEP
+    from alphapy.group import Group
+    from alphapy.model import Model
+    from alphapy.space import Space
+    import numpy as np
+    import pandas as pd
+
+    # Only the assembly of the train and test files is measured
+
+    an.main_pipeline = lambda model: model
+
+    # Create the synthetic frames
+
+    group = Group('benchmark', Space('stock', 'prices', '1d'))
+    rng = np.random.RandomState(args.seed)
+    index = pd.bdate_range('2010-01-01', periods=args.rows, name='date')
+    symbols = ['s%d' % i for i in range(args.symbols)]
+    for symbol in symbols:
+        close = 100.0 + np.cumsum(rng.normal(0.0, 1.0, args.rows))
+        data = {'close' : close, 'open' : close + rng.normal(0.0, 0.5, args.rows)}
+        for i in range(args.features):
+            data['f%d' % i] = rng.normal(0.0, 1.0, args.rows)
+        data['target'] = (rng.rand(args.rows) > 0.5).astype(float)
+        Frame(symbol, group.space, pd.DataFrame(data, index=index))
+    group.members = set(symbols)
+
+    # Set up the project and the model
+
+    directory = SSEP.join([args.directory, args.mode])
+    os.makedirs(SSEP.join([directory, 'input']))
+    predict_date = index[int(args.rows * 0.8)].strftime('%Y-%m-%d')
+    specs = {'algorithms'   : [],
+             'directory'    : directory,
+             'extension'    : args.extension,
+             'predict_date' : predict_date,
+             'predict_mode' : False,
+             'separator'    : ',',
+             'target'       : 'target',
+             'train_date'   : index[0].strftime('%Y-%m-%d')}
+    model = Model(specs)
+    analysis = Analysis(model, group)
+
+    # Run the analysis
+
+    rss_before = peak_rss()
+    start = time.time()
+    run_analysis(analysis, args.lag, 1, ['open'], 0,
+                 streaming=args.mode == 'streaming')
+    elapsed = time.time() - start
+    rss_after = peak_rss()
+
+    # Report the results
+
+    digests = {}
+    for fname in [model.train_file, model.test_file]:
+        file_name = PSEP.join([fname, args.extension])
+        digests[fname] = file_digest(SSEP.join([directory, 'input', file_name]))
+    print(json.dumps({'seconds' : elapsed,
+                      'rss_before' : rss_before,
+                      'rss_peak' : rss_after,
+                      'digests' : digests}))
+
+
+#
+# Function main
+#
+
+def main(args=None):
+    r"""Run both modes and print the comparison.
+
+    Parameters
+    ----------
+    args : list, optional
+        The command line arguments.
+
+    Returns
+    -------
+    same : bool
+        ``True`` if both modes wrote identical files.
+
+    """
+
+    # Argument Parsing
+
+    parser = argparse.ArgumentParser(description="run_analysis streaming benchmark")
+    parser.add_argument('--symbols', type=int, default=1000)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--features', type=int, default=10)
+    parser.add_argument('--lag', type=int, default=1)
+    parser.add_argument('--extension', default='csv')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--directory', help=argparse.SUPPRESS)
+    pargs = parser.parse_args(args)
+
+    # A child process runs a single mode
+
+    if pargs.mode:
+        run_mode(pargs)
+        return True
+
+    # Run each mode in a fresh interpreter
+
+    argv = sys.argv[1:] if args is None else list(args)
+    # the members of a group are a set, so fix the order of the symbols
+    env = dict(os.environ, PYTHONHASHSEED=str(pargs.seed))
+    base_dir = tempfile.mkdtemp(prefix='alphapy_streaming_')
+    results = {}
+    try:
+        for mode in MODES:
+            cmd = [sys.executable, os.path.abspath(__file__), '--mode', mode,
+                   '--directory', base_dir] + argv
+            output = subprocess.run(cmd, check=True, env=env,
+                                    stdout=subprocess.PIPE,
+                                    universal_newlines=True).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+    # Print the comparison
+
+    print("Symbols: %d, Rows: %d, Features: %d, Extension: %s" %
+          (pargs.symbols, pargs.rows, pargs.features, pargs.extension))
+    print("%-10s %10s %14s %14s" % ('mode', 'seconds', 'frames (MB)', 'peak (MB)'))
+    for mode in MODES:
+        r = results[mode]
+        print("%-10s %10.2f %14.1f %14.1f" % (mode, r['seconds'],
+              r['rss_before'], r['rss_peak']))
+    same = results['concat']['digests'] == results['streaming']['digests']
+    print("Identical files: %s" % ('yes' if same else 'NO'))
+    return same
+
+
+#
+# MAIN PROGRAM
+#
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
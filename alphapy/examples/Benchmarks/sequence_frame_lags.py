@@ -0,0 +1,194 @@
+################################################################################
+#
+# Package   : AlphaPy
+# Module    : sequence_frame_lags
+# Created   : October 16, 2026
+#
+# Copyright 2017 ScottFree Analytics LLC
+# Mark Conway & Robert D. Scott II
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+################################################################################
+
+
+#
+# Parity and benchmark of the lagged columns of sequence_frame
+# ------------------------------------------------------------
+#
+# The lagged columns of sequence_frame were built by shifting the frame
+# once per lag and concatenating the shifted frames. The original code
+# is kept here as the reference implementation. For each lag period,
+# both versions sequence the same synthetic frame, the frames must be
+# identical, including the name[i] columns, the dtypes and the NaN
+# padding of the first rows, and the time of each version is reported.
+#
+# Example
+# -------
+#
+# python sequence_frame_lags.py --rows 5000 --columns 20 --lags 50
+#
+
+
+#
+# Imports
+#
+
+from alphapy.frame import sequence_frame
+
+import argparse
+import numpy as np
+import pandas as pd
+import sys
+import time
+
+
+#
+# Function sequence_frame_shift
+#
+
+def sequence_frame_shift(df, target, forecast_period=1, leaders=[], lag_period=1):
+    r"""Reference ``sequence_frame`` with one shift per lag."""
+
+    # Set Leaders and Laggards
+    le_cols = sorted(leaders)
+    le_len = len(le_cols)
+    df_cols = sorted(list(set(df.columns) - set(le_cols)))
+    df_len = len(df_cols)
+
+    # Add lagged columns
+    new_cols, new_names = list(), list()
+    for i in range(lag_period, 0, -1):
+        new_cols.append(df[df_cols].shift(i))
+        new_names += ['%s[%d]' % (df_cols[j], i) for j in range(df_len)]
+
+    # Preserve leader columns
+    new_cols.append(df[le_cols])
+    new_names += [le_cols[j] for j in range(le_len)]
+
+    # Forecast Target(s)
+    new_cols.append(pd.DataFrame(df[target].shift(1-forecast_period)))
+    new_names.append(target)
+
+    # Collect all columns into new frame
+    new_frame = pd.concat(new_cols, axis=1)
+    new_frame.columns = new_names
+    return new_frame
+
+
+#
+# Function make_frame
+#
+
+def make_frame(nrows, ncols, seed):
+    r"""Create a synthetic frame of prices, volume and features.
+
+    Parameters
+    ----------
+    nrows : int
+        The number of bars.
+    ncols : int
+        The number of feature columns.
+    seed : int
+        The seed of the random number generator.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The frame with float and integer columns and missing values.
+
+    """
+    rng = np.random.RandomState(seed)
+    index = pd.bdate_range('2000-01-01', periods=nrows, name='date')
+    close = 100.0 + np.cumsum(rng.normal(0.0, 1.0, nrows))
+    data = {'open'   : close + rng.normal(0.0, 0.5, nrows),
+            'close'  : close,
+            'volume' : rng.randint(1000, 5000, nrows)}
+    for i in range(ncols):
+        values = rng.normal(0.0, 1.0, nrows)
+        values[rng.rand(nrows) < 0.01] = np.nan
+        data['f%d' % i] = values
+    data['target'] = (rng.rand(nrows) > 0.5).astype(float)
+    return pd.DataFrame(data, index=index)
+
+
+#
+# Function time_call
+#
+
+def time_call(func, *args, **kwargs):
+    r"""Call a function and return its result and elapsed time."""
+    start = time.time()
+    result = func(*args, **kwargs)
+    return result, time.time() - start
+
+
+#
+# Function main
+#
+
+def main(args=None):
+    r"""Compare and time both versions for each lag period.
+
+    Parameters
+    ----------
+    args : list, optional
+        The command line arguments.
+
+    Returns
+    -------
+    nfail : int
+        The number of lag periods whose frames differ.
+
+    """
+
+    # Argument Parsing
+
+    parser = argparse.ArgumentParser(description="sequence_frame lag benchmark")
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--columns', type=int, default=20)
+    parser.add_argument('--lags', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(args)
+
+    # Sequence the frame for each lag period
+
+    df = make_frame(args.rows, args.columns, args.seed)
+    leaders = ['open']
+    print("Rows: %d, Columns: %d" % (len(df), len(df.columns)))
+    print("%4s %6s %10s %11s %8s" % ('lag', 'parity', 'shift (s)',
+                                     'strided (s)', 'speedup'))
+    nfail = 0
+    for lag_period in range(1, args.lags + 1):
+        old, t_old = time_call(sequence_frame_shift, df, 'target', 1,
+                               leaders, lag_period)
+        new, t_new = time_call(sequence_frame, df, 'target', 1,
+                               leaders, lag_period)
+        try:
+            pd.testing.assert_frame_equal(new, old, check_exact=True)
+            padding = old.iloc[:lag_period].isnull().equals(new.iloc[:lag_period].isnull())
+            ok = padding and list(new.columns) == list(old.columns)
+        except AssertionError:
+            ok = False
+        nfail += not ok
+        print("%4d %6s %10.4f %11.4f %8.1f" % (lag_period, 'ok' if ok else 'FAIL',
+              t_old, t_new, t_old / max(t_new, 1e-9)))
+    return nfail
+
+
+#
+# MAIN PROGRAM
+#
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,342 @@
+################################################################################
+#
+# Package   : AlphaPy
+# Module    : variable_parity
+# Created   : October 16, 2026
+#
+# Copyright 2017 ScottFree Analytics LLC
+# Mark Conway & Robert D. Scott II
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+################################################################################
+
+
+#
+# Parity and benchmark of the vectorized market variable kernels
+# --------------------------------------------------------------
+#
+# The kernels behind truehigh, truelow, dpc, upc, dmplus and dminus
+# were applied row by row with DataFrame.apply(axis=1). The original
+# row-wise kernels are kept here as the reference implementation.
+#
+# 1. Each kernel is compared with its row-wise reference on a synthetic
+#    OHLCV frame with missing values, and the rows per second of both
+#    are reported.
+#
+# 2. Every feature of the Trading Model market.yml is evaluated with
+#    vexec along its plan of antecedents, once with the vectorized
+#    kernels and once with the row-wise kernels patched into
+#    alphapy.market_variables, and the results are compared.
+#
+# The variables hookdown, hookup, inside and outside are known to be
+# broken independently of the kernels. Their expressions use offsets,
+# e.g., 'open > high[1] & close < close[1]', but the plan does not
+# create the lagged columns, so pandas eval reads 'high[1]' as the
+# value at row label 1. Older versions of pandas raise an error, and
+# newer versions silently compare every bar with that single value.
+# They are listed as known issues and not as parity errors.
+#
+# Example
+# -------
+#
+# python variable_parity.py --rows 100000
+#
+
+
+#
+# Imports
+#
+
+from alphapy.alias import Alias
+import alphapy.market_variables as mv
+from alphapy.market_variables import Variable
+from alphapy.market_variables import net
+from alphapy.market_variables import vexec
+from alphapy.market_variables import vexec_plan
+from alphapy.market_variables import vplan
+
+import argparse
+from contextlib import contextmanager
+import numpy as np
+import os
+import pandas as pd
+import sys
+import time
+import yaml
+
+
+#
+# Row-wise Reference Kernels
+#
+
+def c2max_row(f, c1, c2):
+    return max(f[c1], f[c2])
+
+def c2min_row(f, c1, c2):
+    return min(f[c1], f[c2])
+
+def mval_row(f, c):
+    return -f[c] if f[c] < 0 else 0
+
+def pval_row(f, c):
+    return f[c] if f[c] > 0 else 0
+
+def gtval0_row(f, c1, c2):
+    if f[c1] > f[c2] and f[c1] > 0:
+        return f[c1]
+    return 0
+
+def truehigh_row(f):
+    vexec(f, 'low[1]')
+    return f.apply(c2max_row, axis=1, args=['low[1]', 'high'])
+
+def truelow_row(f):
+    vexec(f, 'high[1]')
+    return f.apply(c2min_row, axis=1, args=['high[1]', 'low'])
+
+def dpc_row(f, c):
+    return f.apply(mval_row, axis=1, args=[c])
+
+def upc_row(f, c):
+    return f.apply(pval_row, axis=1, args=[c])
+
+def dmplus_row(f):
+    f['upmove'] = net(f, 'high')
+    f['downmove'] = -net(f, 'low')
+    return f.apply(gtval0_row, axis=1, args=['upmove', 'downmove'])
+
+def dminus_row(f):
+    f['downmove'] = -net(f, 'low')
+    f['upmove'] = net(f, 'high')
+    return f.apply(gtval0_row, axis=1, args=['downmove', 'upmove'])
+
+ROW_KERNELS = {'truehigh' : truehigh_row,
+               'truelow'  : truelow_row,
+               'dpc'      : dpc_row,
+               'upc'      : upc_row,
+               'dmplus'   : dmplus_row,
+               'dminus'   : dminus_row}
+
+KERNEL_ARGS = {'dpc' : ['net'], 'upc' : ['net']}
+
+KNOWN_ISSUES = ['hookdown', 'hookup', 'inside', 'outside']
+
+
+#
+# Function rowwise_kernels
+#
+
+@contextmanager
+def rowwise_kernels():
+    r"""Patch the row-wise kernels into ``alphapy.market_variables``.
+
+    Both the direct calls, e.g., ``upc`` in ``rsi``, and the lookups
+    of ``vexec`` resolve to the module attributes, so every variable
+    built on these kernels uses the reference implementation.
+
+    """
+    saved = {k : getattr(mv, k) for k in ROW_KERNELS}
+    try:
+        for k, func in ROW_KERNELS.items():
+            setattr(mv, k, func)
+        yield
+    finally:
+        for k, func in saved.items():
+            setattr(mv, k, func)
+
+
+#
+# Function make_frame
+#
+
+def make_frame(nrows, seed):
+    r"""Create a synthetic OHLCV frame with some missing values.
+
+    Parameters
+    ----------
+    nrows : int
+        The number of bars.
+    seed : int
+        The seed of the random number generator.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The frame of random-walk prices.
+
+    """
+    rng = np.random.RandomState(seed)
+    close = 100.0 + np.cumsum(rng.normal(0.0, 1.0, nrows))
+    df = pd.DataFrame({'open'   : close + rng.normal(0.0, 0.5, nrows),
+                       'high'   : close + 1.0 + rng.rand(nrows),
+                       'low'    : close - 1.0 - rng.rand(nrows),
+                       'close'  : close,
+                       'volume' : rng.randint(1000, 5000, nrows).astype(float)})
+    missing = rng.rand(nrows, len(df.columns)) < 0.01
+    return df.mask(missing)
+
+
+#
+# Function same_values
+#
+
+def same_values(s1, s2):
+    r"""Compare two columns, treating missing values as equal."""
+    a1 = np.asarray(s1, dtype=float)
+    a2 = np.asarray(s2, dtype=float)
+    return a1.shape == a2.shape and np.allclose(a1, a2, equal_nan=True)
+
+
+#
+# Function check_kernels
+#
+
+def check_kernels(nrows, seed):
+    r"""Compare and time each kernel against its row-wise reference.
+
+    Returns
+    -------
+    nfail : int
+        The number of kernels whose results differ.
+
+    """
+    print("Kernel Parity and Throughput [%d rows]" % nrows)
+    print("%-10s %6s %14s %14s %9s" % ('kernel', 'parity', 'row-wise/s',
+                                       'vectorized/s', 'speedup'))
+    nfail = 0
+    base = make_frame(nrows, seed)
+    vexec(base, 'net')
+    for k, row_func in ROW_KERNELS.items():
+        args = KERNEL_ARGS.get(k, [])
+        f1 = base.copy()
+        start = time.time()
+        s1 = row_func(f1, *args)
+        t1 = time.time() - start
+        f2 = base.copy()
+        start = time.time()
+        s2 = getattr(mv, k)(f2, *args)
+        t2 = max(time.time() - start, 1e-9)
+        ok = same_values(s1, s2)
+        nfail += not ok
+        print("%-10s %6s %14.0f %14.0f %9.1f" % (k, 'ok' if ok else 'FAIL',
+              nrows / t1, nrows / t2, t1 / t2))
+    return nfail
+
+
+#
+# Function check_features
+#
+
+def check_features(cfg, nrows, seed):
+    r"""Compare the features of ``market.yml`` evaluated with ``vexec``.
+
+    Each feature is evaluated by executing its plan from ``vplan``,
+    so that its antecedents are calculated first.
+
+    Returns
+    -------
+    nfail : int
+        The number of features whose results differ.
+
+    """
+    for k, v in cfg['aliases'].items():
+        Alias(k, v)
+    for k, v in cfg['variables'].items():
+        Variable(k, v)
+    features = cfg['features']
+    print("Feature Parity with vexec [%d rows, %d features]" %
+          (nrows, len(features)))
+    base = make_frame(nrows, seed)
+    nfail = 0
+    for v in features:
+        results = []
+        for rowwise in [False, True]:
+            f = base.copy()
+            try:
+                plan, nshared = vplan([v])
+                if rowwise:
+                    with rowwise_kernels():
+                        vexec_plan(f, plan)
+                else:
+                    vexec_plan(f, plan)
+                results.append(f[v] if v in f.columns else None)
+            except Exception as e:
+                results.append(e)
+        vec, row = results
+        if v in KNOWN_ISSUES:
+            print("%-14s known issue: offsets in the expression are not lagged" % v)
+        elif isinstance(vec, Exception) and isinstance(row, Exception):
+            print("%-14s failed in both modes: %s" % (v, vec))
+        elif isinstance(vec, Exception) or isinstance(row, Exception):
+            nfail += 1
+            print("%-14s FAIL in one mode: %r / %r" % (v, vec, row))
+        elif vec is None or row is None:
+            if (vec is None) != (row is None):
+                nfail += 1
+                print("%-14s FAIL: missing in one mode" % v)
+        elif not same_values(vec, row):
+            nfail += 1
+            print("%-14s FAIL: values differ" % v)
+    print("Features checked: %d, differences: %d" % (len(features), nfail))
+    return nfail
+
+
+#
+# Function main
+#
+
+def main(args=None):
+    r"""Run the parity checks and the kernel benchmark.
+
+    Parameters
+    ----------
+    args : list, optional
+        The command line arguments.
+
+    Returns
+    -------
+    nfail : int
+        The number of parity errors.
+
+    """
+
+    # Argument Parsing
+
+    parser = argparse.ArgumentParser(description="market variable parity")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--feature-rows', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(args)
+
+    # Read the Trading Model configuration
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    config = os.path.join(here, os.pardir, 'Trading Model', 'config',
+                          'market.yml')
+    with open(config, 'r') as ymlfile:
+        cfg = yaml.safe_load(ymlfile)
+
+    # Run the checks
+
+    nfail = check_kernels(args.rows, args.seed)
+    nfail += check_features(cfg, args.feature_rows, args.seed)
+    return nfail
+
+
+#
+# MAIN PROGRAM
+#
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
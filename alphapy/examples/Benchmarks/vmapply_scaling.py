@@ -0,0 +1,165 @@
+################################################################################
+#
+# Package   : AlphaPy
+# Module    : vmapply_scaling
+# Created   : October 16, 2026
+#
+# Copyright 2017 ScottFree Analytics LLC
+# Mark Conway & Robert D. Scott II
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+################################################################################
+
+
+#
+# Benchmark the scaling of vmapply with the number of processes
+# -------------------------------------------------------------
+#
+# A synthetic universe of random-walk OHLCV frames is created, and the
+# same variables are applied with 1, 2, 4, ... up to N processes.
+#
+# Example
+# -------
+#
+# python vmapply_scaling.py --symbols 2000 --rows 1000 --jobs 8
+#
+
+
+#
+# Imports
+#
+
+from alphapy.alias import Alias
+from alphapy.frame import Frame
+from alphapy.group import Group
+from alphapy.market_variables import Variable
+from alphapy.market_variables import vmapply
+from alphapy.space import Space
+
+import argparse
+import multiprocessing
+import numpy as np
+import pandas as pd
+import time
+
+
+#
+# Benchmark Variables
+#
+
+VARIABLES = ['adx_14', 'cma_20', 'cma_50', 'madelta', 'net_close_1',
+             'rsi_close_14', 'truerange']
+
+
+#
+# Function make_universe
+#
+
+def make_universe(group, nsymbols, nrows, seed):
+    r"""Create the synthetic frames of a group.
+
+    Parameters
+    ----------
+    group : alphapy.Group
+        The group to contain the symbols.
+    nsymbols : int
+        The number of symbols.
+    nrows : int
+        The number of bars per symbol.
+    seed : int
+        The seed of the random number generator.
+
+    Returns
+    -------
+    None : None
+
+    """
+    Frame.frames.clear()
+    rng = np.random.RandomState(seed)
+    symbols = ['s%d' % i for i in range(nsymbols)]
+    for symbol in symbols:
+        close = 100.0 + np.cumsum(rng.normal(0.0, 1.0, nrows))
+        df = pd.DataFrame({'open'   : close + rng.normal(0.0, 0.5, nrows),
+                           'high'   : close + 1.0 + rng.rand(nrows),
+                           'low'    : close - 1.0 - rng.rand(nrows),
+                           'close'  : close,
+                           'volume' : rng.randint(1000, 5000, nrows).astype(float)})
+        Frame(symbol, group.space, df)
+    group.members = set(symbols)
+
+
+#
+# Function main
+#
+
+def main(args=None):
+    r"""Run the scaling benchmark and print the speedup table.
+
+    Parameters
+    ----------
+    args : list, optional
+        The command line arguments.
+
+    Returns
+    -------
+    None : None
+
+    """
+
+    # Argument Parsing
+
+    parser = argparse.ArgumentParser(description="vmapply scaling benchmark")
+    parser.add_argument('--symbols', type=int, default=2000)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--jobs', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--panel', action='store_true')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(args)
+
+    # Define the aliases and variables
+
+    Alias('atr', 'ma_truerange')
+    Alias('cma', 'ma_close')
+    Variable('madelta', '(close - cma_20) / atr_10')
+    group = Group('benchmark', Space('stock', 'prices', '1d'))
+
+    # Apply the variables with an increasing number of processes
+
+    jobs = [1]
+    while jobs[-1] * 2 < args.jobs:
+        jobs.append(jobs[-1] * 2)
+    if args.jobs > 1:
+        jobs.append(args.jobs)
+
+    print("Symbols: %d, Rows: %d, Variables: %d, Panel: %r, CPUs: %d" %
+          (args.symbols, args.rows, len(VARIABLES), args.panel,
+           multiprocessing.cpu_count()))
+    print("%6s %10s %12s %8s" % ('n_jobs', 'seconds', 'symbols/s', 'speedup'))
+    base = None
+    for n_jobs in jobs:
+        make_universe(group, args.symbols, args.rows, args.seed)
+        start = time.time()
+        vmapply(group, VARIABLES, panel=args.panel, n_jobs=n_jobs)
+        elapsed = time.time() - start
+        base = base or elapsed
+        print("%6d %10.2f %12.1f %8.2f" % (n_jobs, elapsed,
+              args.symbols / elapsed, base / elapsed))
+
+
+#
+# MAIN PROGRAM
+#
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,7 @@ from alphapy.globals import PSEP, SSEP, USEP
 from alphapy.globals import Encoders
 from alphapy.globals import ModelType
 from alphapy.globals import Scalers
+from alphapy.globals import WILDCARD
 from alphapy.market_variables import Variable
 from alphapy.market_variables import vparse
 
@@ -39,6 +40,7 @@ from importlib import import_module
 from itertools import groupby
 import logging
 import math
+import multiprocessing
 import numpy as np
 import os
 import pandas as pd
@@ -60,7 +62,9 @@ from sklearn.feature_selection import SelectPercentile
 from sklearn.feature_selection import VarianceThreshold
 from sklearn.manifold import Isomap
 from sklearn.manifold import TSNE
+from sklearn.neighbors import KNeighborsRegressor
 from sklearn.preprocessing import Imputer
+from sklearn.preprocessing import MaxAbsScaler
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.preprocessing import PolynomialFeatures
 from sklearn.preprocessing import StandardScaler
@@ -367,7 +371,7 @@ def texplode(f, c):
 # Function cvectorize
 #
 
-def cvectorize(f, c, n):
+def cvectorize(f, c, n, as_sparse=False):
     r"""Use the Count Vectorizer and TF-IDF Transformer.
 
     Parameters
@@ -378,6 +382,9 @@ def cvectorize(f, c, n):
         Name of the text column in the dataframe ``f``.
     n : int
         The number of n-grams.
+    as_sparse : bool, optional
+        If ``True``, then return a sparse CSR matrix instead of a
+        dense array.
 
     Returns
     -------
@@ -397,7 +404,11 @@ def cvectorize(f, c, n):
     cvect = CountVectorizer(ngram_range=[1, n], analyzer='char')
     cfeat = cvect.fit_transform(fc)
     tfidf_transformer = TfidfTransformer()
-    new_features = tfidf_transformer.fit_transform(cfeat).toarray()
+    new_features = tfidf_transformer.fit_transform(cfeat)
+    if as_sparse:
+        new_features = new_features.tocsr()
+    else:
+        new_features = new_features.toarray()
     return new_features
 
 
@@ -517,11 +528,143 @@ def apply_treatments(model, X):
     return all_features
 
 
+#
+# Function fitted_transformers
+#
+
+def fitted_transformers(model):
+    r"""Get the fitted feature transformers of the model.
+
+    Parameters
+    ----------
+    model : alphapy.Model
+        Model object with the feature map.
+
+    Returns
+    -------
+    transformers : dict
+        The fitted transformers, stored in the feature map under the
+        key ``transformers``.
+
+    """
+    return model.feature_map.setdefault('transformers', {})
+
+
+#
+# Function feature_transform
+#
+
+def feature_transform(model, key, transformer, X, method='transform'):
+    r"""Fit a transformer in training, or apply the fitted transformer
+    in prediction.
+
+    Parameters
+    ----------
+    model : alphapy.Model
+        Model object with the feature map.
+    key : str or tuple
+        The key of the transformer in the fitted transformers.
+    transformer : object
+        An unfitted scikit-learn style transformer.
+    X : numpy array, sparse matrix, or pandas.DataFrame
+        The data to transform.
+    method : str, optional
+        The method that produces the features, e.g., ``predict``
+        for a clustering estimator.
+
+    Returns
+    -------
+    features : numpy array or sparse matrix
+        The transformed data.
+
+    Raises
+    ------
+    KeyError
+        The transformer was not fitted in training.
+
+    """
+    transformers = fitted_transformers(model)
+    if model.specs['predict_mode']:
+        if key not in transformers:
+            raise KeyError("Fitted transformer %s not found in feature map" % (key,))
+        return getattr(transformers[key], method)(X)
+    if method == 'transform':
+        features = transformer.fit_transform(X)
+    else:
+        features = getattr(transformer.fit(X), method)(X)
+    transformers[key] = transformer
+    return features
+
+
+#
+# Function factor_categories
+#
+
+def factor_categories(model, fname, feature, sort=False):
+    r"""Get the categories of a factor from the training data.
+
+    Parameters
+    ----------
+    model : alphapy.Model
+        Model object with the feature map.
+    fname : str
+        Name of the factor.
+    feature : pandas.Series
+        The values of the factor.
+    sort : bool, optional
+        If ``True``, then sort the categories; otherwise, keep the
+        order of their first appearance.
+
+    Returns
+    -------
+    categories : pandas.Index
+        The categories found in training.
+
+    """
+    transformers = fitted_transformers(model)
+    key = ('categories', fname)
+    if model.specs['predict_mode']:
+        return transformers[key]
+    if sort:
+        categories = pd.Categorical(feature).categories
+    else:
+        categories = pd.factorize(feature)[1]
+    transformers[key] = categories
+    return categories
+
+
+#
+# Function factorize
+#
+
+def factorize(model, fname, feature):
+    r"""Encode a factor as integer codes of the training categories.
+
+    Parameters
+    ----------
+    model : alphapy.Model
+        Model object with the feature map.
+    fname : str
+        Name of the factor.
+    feature : pandas.Series
+        The values of the factor.
+
+    Returns
+    -------
+    codes : numpy array
+        The code of each value, or -1 for a missing or unknown value.
+
+    """
+    categories = factor_categories(model, fname, feature)
+    codes = pd.Categorical(feature, categories=categories).codes
+    return codes
+
+
 #
 # Function impute_values
 #
 
-def impute_values(features, dt, sentinel):
+def impute_values(features, dt, sentinel, model=None, key=None):
     r"""Impute values for a given data type. The *median* strategy
     is applied for floating point values, and the *most frequent*
     strategy is applied for integer or Boolean values.
@@ -531,9 +674,15 @@ def impute_values(features, dt, sentinel):
     features : pandas.DataFrame
         Dataframe containing the features for imputation.
     dt : str
-        The values ``'float64'``, ``'int64'``, or ``'bool'``.
+        The values ``'float64'``, ``'float32'``, ``'int64'``,
+        ``'int32'``, or ``'bool'``.
     sentinel : float
         The number to be imputed for NaN values.
+    model : alphapy.Model, optional
+        Model object with the fitted transformers. If given, then the
+        imputer is fitted in training and reused in prediction.
+    key : tuple, optional
+        The key of the imputer in the fitted transformers.
 
     Returns
     -------
@@ -556,13 +705,16 @@ def impute_values(features, dt, sentinel):
         nfeatures = features.shape[1]
     except:
         features = features.values.reshape(-1, 1)
-    if dt == 'float64':
+    if dt == 'float64' or dt == 'float32':
         imp = Imputer(missing_values='NaN', strategy='median', axis=0)
-    elif dt == 'int64' or dt == 'bool':
+    elif dt == 'int64' or dt == 'int32' or dt == 'bool':
         imp = Imputer(missing_values='NaN', strategy='most_frequent', axis=0)
     else:
         raise TypeError("Data Type %s is invalid for imputation" % dt)
-    imputed = imp.fit_transform(features)
+    if model is None:
+        imputed = imp.fit_transform(features)
+    else:
+        imputed = feature_transform(model, key, imp, features)
     if imputed.shape[1] == 0:
         nans = np.isnan(features)
         features[nans] = sentinel
@@ -576,13 +728,15 @@ def impute_values(features, dt, sentinel):
 # Function get_numerical_features
 #
 
-def get_numerical_features(fnum, fname, df, nvalues, dt,
+def get_numerical_features(model, fnum, fname, df, nvalues, dt,
                            sentinel, logt, plevel):
     r"""Transform numerical features with imputation and possibly
     log-transformation.
 
     Parameters
     ----------
+    model : alphapy.Model
+        Model object with the fitted transformers.
     fnum : int
         Feature number, strictly for logging purposes
     fname : str
@@ -592,7 +746,8 @@ def get_numerical_features(fnum, fname, df, nvalues, dt,
     nvalues : int
         The number of unique values.
     dt : str
-        The values ``'float64'``, ``'int64'``, or ``'bool'``.
+        The values ``'float64'``, ``'float32'``, ``'int64'``,
+        ``'int32'``, or ``'bool'``.
     sentinel : float
         The number to be imputed for NaN values.
     logt : bool
@@ -614,13 +769,20 @@ def get_numerical_features(fnum, fname, df, nvalues, dt,
         logger.info("Feature %d: %s is a numerical feature of type %s with %d unique values",
                     fnum, fname, dt, nvalues)
     # imputer for float, integer, or boolean data types
-    new_values = impute_values(feature, dt, sentinel)
+    new_values = impute_values(feature, dt, sentinel, model, ('impute', fname))
     # log-transform any values that do not fit a normal distribution
-    if logt and np.all(new_values > 0):
-        stat, pvalue = sps.normaltest(new_values)
-        if pvalue <= plevel:
-            logger.info("Feature %d: %s is not normally distributed [p-value: %f]",
-                        fnum, fname, pvalue)
+    if logt:
+        transformers = fitted_transformers(model)
+        key = ('log', fname)
+        if not model.specs['predict_mode']:
+            transformers[key] = False
+            if np.all(new_values > 0):
+                stat, pvalue = sps.normaltest(new_values)
+                if pvalue <= plevel:
+                    logger.info("Feature %d: %s is not normally distributed [p-value: %f]",
+                                fnum, fname, pvalue)
+                    transformers[key] = True
+        if transformers.get(key, False):
             new_values = np.log(new_values)
     return new_values
 
@@ -662,12 +824,15 @@ def get_polynomials(features, poly_degree):
 # Function get_text_features
 #
 
-def get_text_features(fnum, fname, df, nvalues, vectorize, ngrams_max):
+def get_text_features(model, fnum, fname, df, nvalues, vectorize, ngrams_max,
+                      as_sparse=False):
     r"""Transform text features with count vectorization and TF-IDF,
     or alternatively factorization.
 
     Parameters
     ----------
+    model : alphapy.Model
+        Model object with the fitted transformers.
     fnum : int
         Feature number, strictly for logging purposes
     fname : str
@@ -680,10 +845,13 @@ def get_text_features(fnum, fname, df, nvalues, vectorize, ngrams_max):
         If ``True``, then attempt count vectorization.
     ngrams_max : int
         The maximum number of n-grams for count vectorization.
+    as_sparse : bool, optional
+        If ``True``, then the vectorized features are returned as a
+        sparse CSR matrix.
 
     Returns
     -------
-    new_features : numpy array
+    new_features : numpy array or sparse matrix
         The vectorized or factorized text features.
 
     References
@@ -708,16 +876,22 @@ def get_text_features(fnum, fname, df, nvalues, vectorize, ngrams_max):
         logger.info("Feature %d: %s => Attempting Vectorization", fnum, fname)
         count_vect = CountVectorizer(ngram_range=[1, ngrams_max])
         try:
-            count_feature = count_vect.fit_transform(feature)
+            count_feature = feature_transform(model, ('count', fname),
+                                              count_vect, feature)
             tfidf_transformer = TfidfTransformer()
-            new_features = tfidf_transformer.fit_transform(count_feature).todense()
+            new_features = feature_transform(model, ('tfidf', fname),
+                                             tfidf_transformer, count_feature)
+            if as_sparse:
+                new_features = new_features.tocsr()
+            else:
+                new_features = new_features.todense()
             logger.info("Feature %d: %s => Vectorization Succeeded", fnum, fname)
         except:
             logger.info("Feature %d: %s => Vectorization Failed", fnum, fname)
-            new_features, uniques = pd.factorize(feature)
+            new_features = factorize(model, fname, feature)
     else:
         logger.info("Feature %d: %s => Factorization", fnum, fname)
-        new_features, uniques = pd.factorize(feature)
+        new_features = factorize(model, fname, feature)
     return new_features
 
 
@@ -792,12 +966,44 @@ def create_crosstabs(model):
     return model
 
 
+#
+# Function sparse_dummies
+#
+
+def sparse_dummies(feature, categories=None):
+    r"""Create one-hot indicators as a sparse matrix.
+
+    Parameters
+    ----------
+    feature : pandas.Series
+        The factor to encode.
+    categories : list, optional
+        The values to encode. By default, the distinct values of
+        ``feature`` are encoded.
+
+    Returns
+    -------
+    dummies : sparse matrix
+        A CSR matrix with one column for each distinct value, in the
+        same order as ``pandas.get_dummies``. Rows with a missing
+        or unknown value are all zeros.
+
+    """
+    factor = pd.Categorical(feature, categories=categories)
+    codes = factor.codes
+    rows = np.flatnonzero(codes >= 0)
+    data = np.ones(len(rows), dtype=np.uint8)
+    dummies = sparse.csr_matrix((data, (rows, codes[rows])),
+                                shape=(len(codes), len(factor.categories)))
+    return dummies
+
+
 #
 # Function get_factors
 #
 
 def get_factors(model, df, fnum, fname, nvalues, dtype,
-                encoder, rounding, sentinel):
+                encoder, rounding, sentinel, as_sparse=False):
     r"""Convert the original feature to a factor.
 
     Parameters
@@ -813,17 +1019,20 @@ def get_factors(model, df, fnum, fname, nvalues, dtype,
     nvalues : int
         The number of unique values.
     dtype : str
-        The values ``'float64'``, ``'int64'``, or ``'bool'``.
+        The values ``'float64'``, ``'float32'``, ``'int64'``,
+        ``'int32'``, ``'bool'``, or ``'category'``.
     encoder : alphapy.features.Encoders
         Type of encoder to apply.
     rounding : int
         Number of places to round.
     sentinel : float
         The number to be imputed for NaN values.
+    as_sparse : bool, optional
+        If ``True``, then one-hot encoding returns a sparse CSR matrix.
 
     Returns
     -------
-    all_features : numpy array
+    all_features : numpy array or sparse matrix
         The features that have been transformed to factors.
 
     """
@@ -841,17 +1050,23 @@ def get_factors(model, df, fnum, fname, nvalues, dtype,
     # get feature
     feature = df[fname]
     # convert float to factor
-    if dtype == 'float64':
+    if dtype == 'float64' or dtype == 'float32':
         logger.info("Rounding: %d", rounding)
         feature = feature.apply(float_factor, args=[rounding])
     # encoders
     enc = None
     ef = pd.DataFrame(feature)
+    pd_features = None
     if encoder == Encoders.factorize:
-        pd_factors = pd.factorize(feature)[0]
+        pd_factors = factorize(model, fname, feature)
         pd_features = pd.DataFrame(pd_factors)
     elif encoder == Encoders.onehot:
-        pd_features = pd.get_dummies(feature)
+        categories = factor_categories(model, fname, feature, sort=True)
+        if as_sparse:
+            pd_features = sparse_dummies(feature, categories)
+        else:
+            factor = pd.Categorical(feature, categories=categories)
+            pd_features = pd.get_dummies(factor)
     elif encoder == Encoders.ordinal:
         enc = ce.OrdinalEncoder(cols=[fname])
     elif encoder == Encoders.binary:
@@ -867,14 +1082,14 @@ def get_factors(model, df, fnum, fname, nvalues, dtype,
     else:
         raise ValueError("Unknown Encoder %s" % encoder)
     # If encoding worked, calculate target percentages for classifiers.
-    pd_exists = not pd_features.empty
+    pd_exists = pd_features is not None and 0 not in pd_features.shape
     enc_exists = enc is not None
     all_features = None
     if pd_exists or enc_exists:
         if pd_exists:
             all_features = pd_features
         elif enc_exists:
-            all_features = enc.fit_transform(ef, None)
+            all_features = feature_transform(model, ('encoder', fname), enc, ef)
         # Calculate target percentages for factors
         if (model_type == ModelType.classification and
            fname in feature_map['crosstabs']):
@@ -886,7 +1101,11 @@ def get_factors(model, df, fnum, fname, nvalues, dtype,
             # impute sentinel for any values that could not be mapped
             ct_feature.fillna(value=sentinel, inplace=True)
             # concatenate all generated features
-            all_features = np.column_stack((all_features, ct_feature))
+            if sparse.issparse(all_features):
+                all_features = sparse.hstack((all_features, ct_feature.values),
+                                             format='csr')
+            else:
+                all_features = np.column_stack((all_features, ct_feature))
             logger.info("Applied target percentages for %s", fname)
     else:
         raise RuntimeError("Encoding for feature %s failed" % fname)
@@ -897,7 +1116,7 @@ def get_factors(model, df, fnum, fname, nvalues, dtype,
 # Function create_numpy_features
 #
 
-def create_numpy_features(base_features, sentinel):
+def create_numpy_features(base_features, sentinel, model=None):
     r"""Calculate the sum, mean, standard deviation, and variance
     of each row.
 
@@ -931,8 +1150,13 @@ def create_numpy_features(base_features, sentinel):
     # Impute, scale, and stack all new features.
 
     np_features = np.column_stack((row_sum, row_mean, row_std, row_var))
-    np_features = impute_values(np_features, 'float64', sentinel)
-    np_features = StandardScaler().fit_transform(np_features)
+    np_features = impute_values(np_features, 'float64', sentinel,
+                                model, ('impute', 'numpy'))
+    if model is None:
+        np_features = StandardScaler().fit_transform(np_features)
+    else:
+        np_features = feature_transform(model, ('scaler', 'numpy'),
+                                        StandardScaler(), np_features)
 
     # Return new NumPy features
 
@@ -944,7 +1168,7 @@ def create_numpy_features(base_features, sentinel):
 # Function create_scipy_features
 #
 
-def create_scipy_features(base_features, sentinel):
+def create_scipy_features(base_features, sentinel, model=None):
     r"""Calculate the skew, kurtosis, and other statistical features
     for each row.
 
@@ -988,8 +1212,13 @@ def create_scipy_features(base_features, sentinel):
     sp_features = np.column_stack((row_gmean, row_kurtosis, row_ktest,
                                    row_normal, row_skew, row_stest,
                                    row_var, row_stn, row_sem))
-    sp_features = impute_values(sp_features, 'float64', sentinel)
-    sp_features = StandardScaler().fit_transform(sp_features)
+    sp_features = impute_values(sp_features, 'float64', sentinel,
+                                model, ('impute', 'scipy'))
+    if model is None:
+        sp_features = StandardScaler().fit_transform(sp_features)
+    else:
+        sp_features = feature_transform(model, ('scaler', 'scipy'),
+                                        StandardScaler(), sp_features)
 
     # Return new SciPy features
 
@@ -1046,8 +1275,8 @@ def create_clusters(features, model):
     for i in range(cluster_min, cluster_max+1, cluster_inc):
         logger.info("k = %d", i)
         km = MiniBatchKMeans(n_clusters=i, random_state=seed)
-        km.fit(features)
-        labels = km.predict(features)
+        labels = feature_transform(model, ('clusters', i), km, features,
+                                   method='predict')
         labels = labels.reshape(-1, 1)
         cfeatures = np.column_stack((cfeatures, labels))
     cfeatures = np.delete(cfeatures, 0, axis=1)
@@ -1106,7 +1335,8 @@ def create_pca_features(features, model):
     pfeatures = np.zeros((features.shape[0], 1))
     for i in range(pca_min, pca_max+1, pca_inc):
         logger.info("n_components = %d", i)
-        X_pca = PCA(n_components=i, whiten=pca_whiten).fit_transform(features)
+        pca = PCA(n_components=i, whiten=pca_whiten)
+        X_pca = feature_transform(model, ('pca', i), pca, features)
         pfeatures = np.column_stack((pfeatures, X_pca))
     pfeatures = np.delete(pfeatures, 0, axis=1)
 
@@ -1164,9 +1394,9 @@ def create_isomap_features(features, model):
 
     # Generate Isomap features
 
-    model = Isomap(n_neighbors=iso_neighbors, n_components=iso_components,
-                   n_jobs=n_jobs)
-    ifeatures = model.fit_transform(features)
+    iso = Isomap(n_neighbors=iso_neighbors, n_components=iso_components,
+                 n_jobs=n_jobs)
+    ifeatures = feature_transform(model, 'isomap', iso, features)
 
     # Return new Isomap features
 
@@ -1197,6 +1427,13 @@ def create_tsne_features(features, model):
     ----------
     You can find more information on the t-SNE technique here [TSNE]_.
 
+    Notes
+    -----
+    t-SNE cannot transform new data, so a nearest-neighbors regression
+    from the features to the embedding is fitted in training. In
+    prediction, the embedding of new rows is estimated by that
+    regression.
+
     .. [TSNE] http://scikit-learn.org/stable/modules/manifold.html#t-distributed-stochastic-neighbor-embedding-t-sne
 
     """
@@ -1218,9 +1455,15 @@ def create_tsne_features(features, model):
 
     # Generate T-SNE features
 
-    model = TSNE(n_components=tsne_components, perplexity=tsne_perplexity,
-                 learning_rate=tsne_learn_rate, random_state=seed)
-    tfeatures = model.fit_transform(features)
+    transformers = fitted_transformers(model)
+    if model.specs['predict_mode']:
+        tfeatures = transformers['tsne'].predict(features)
+    else:
+        tsne = TSNE(n_components=tsne_components, perplexity=tsne_perplexity,
+                    learning_rate=tsne_learn_rate, random_state=seed)
+        tfeatures = tsne.fit_transform(features)
+        knr = KNeighborsRegressor(weights='distance')
+        transformers['tsne'] = knr.fit(features, tfeatures)
 
     # Return new T-SNE features
 
@@ -1229,11 +1472,18 @@ def create_tsne_features(features, model):
 
 
 #
-# Function create_features
+# Model and data shared with the base feature workers
 #
 
-def create_features(model, X):
-    r"""Create features for the train and test set.
+base_state = {}
+
+
+#
+# Function get_base_features
+#
+
+def get_base_features(model, X, fnum, fc):
+    r"""Create the base features for one column.
 
     Parameters
     ----------
@@ -1241,10 +1491,17 @@ def create_features(model, X):
         Model object with the feature specifications.
     X : pandas.DataFrame
         Combined train and test data.
+    fnum : int
+        Feature number, strictly for logging purposes.
+    fc : str
+        Name of the column in the dataframe ``X``.
 
     Returns
     -------
-    all_features : numpy array
+    transform : str
+        The transform of the column: ``'factor'``, ``'numerical'``,
+        or ``'text'``.
+    features : numpy array
         The new features.
 
     Raises
@@ -1256,25 +1513,257 @@ def create_features(model, X):
 
     # Extract model parameters
 
-    clustering = model.specs['clustering']
-    counts_flag = model.specs['counts']
     encoder = model.specs['encoder']
     factors = model.specs['factors']
-    isomap = model.specs['isomap']
     logtransform = model.specs['logtransform']
-    model_type = model.specs['model_type']
     ngrams_max = model.specs['ngrams_max']
-    numpy_flag = model.specs['numpy']
-    pca = model.specs['pca']
     pvalue_level = model.specs['pvalue_level']
     rounding = model.specs['rounding']
+    sentinel = model.specs['sentinel']
+    sparse_flag = model.specs['sparse']
+    vectorize = model.specs['vectorize']
+
+    # standard processing of numerical, categorical, and text features
+
+    dtype = X[fc].dtypes
+    nunique = len(X[fc].unique())
+    if fc in factors or dtype == 'category':
+        transform = 'factor'
+        features = get_factors(model, X, fnum, fc, nunique, dtype,
+                               encoder, rounding, sentinel, sparse_flag)
+    elif dtype in ['float64', 'float32', 'int64', 'int32', 'bool']:
+        transform = 'numerical'
+        features = get_numerical_features(model, fnum, fc, X, nunique, dtype,
+                                          sentinel, logtransform, pvalue_level)
+    elif dtype == 'object':
+        transform = 'text'
+        features = get_text_features(model, fnum, fc, X, nunique, vectorize,
+                                     ngrams_max, sparse_flag)
+    else:
+        raise TypeError("Base Feature Error with unrecognized type %s" % dtype)
+    return transform, features
+
+
+#
+# Function base_feature_task
+#
+
+def base_feature_task(args):
+    r"""Create the base features for one column in a worker process.
+
+    This is the task for each worker of the process pool in
+    ``create_features``. The worker reads the model and the data that
+    it inherited from the parent process through ``base_state``, so
+    only the column name is sent. The transformers fitted for the
+    column are sent back, so that the parent can store them.
+
+    Parameters
+    ----------
+    args : tuple
+        The feature number and the column name.
+
+    Returns
+    -------
+    fc : str
+        The column name.
+    transform : str
+        The transform of the column.
+    features : numpy array or sparse matrix
+        The new features.
+    fitted : dict
+        The transformers fitted for the column.
+
+    """
+    fnum, fc = args
+    model = base_state['model']
+    transformers = fitted_transformers(model)
+    known = set(transformers.keys())
+    transform, features = get_base_features(model, base_state['X'], fnum, fc)
+    if not sparse.issparse(features):
+        features = np.asarray(features)
+    fitted = {k : v for k, v in transformers.items() if k not in known}
+    return fc, transform, features, fitted
+
+
+#
+# Function stack_blocks
+#
+
+def stack_blocks(blocks, nrows, dtype=np.float64, as_sparse=False, extra=0):
+    r"""Copy blocks of features into a single feature matrix.
+
+    Parameters
+    ----------
+    blocks : list
+        The tuples (source, transform, features) for each block. If the
+        transform is ``None``, then the source is the list of
+        (source, transform) pairs for each column of the block.
+    nrows : int
+        The number of rows in each block.
+    dtype : numpy.dtype, optional
+        The data type of the feature matrix.
+    as_sparse : bool, optional
+        If ``True`` and any block is sparse, then the blocks are stacked
+        into a sparse CSR matrix.
+    extra : int, optional
+        The number of empty columns to allocate after the blocks
+        of a dense matrix.
+
+    Returns
+    -------
+    all_features : numpy array or sparse matrix
+        The feature matrix.
+    provenance : list
+        The (source, transform) pair for each column of the blocks.
+
+    Notes
+    -----
+    The widths of the blocks are collected first, so the matrix is
+    allocated once and each block is copied into its own slice. The
+    blocks are removed from the list as they are copied, so each one
+    can be freed before the next one is densified. A sparse matrix is
+    stacked by ``scipy.sparse.hstack`` instead, and any sparse block
+    is densified if ``as_sparse`` is ``False``.
+
+    """
+    widths = []
+    for source, transform, features in blocks:
+        shape = np.shape(features)
+        widths.append(shape[1] if len(shape) > 1 else 1)
+    provenance = []
+    for (source, transform, _), width in zip(blocks, widths):
+        if transform is None:
+            provenance.extend(source)
+        else:
+            provenance.extend([(source, transform)] * width)
+    if as_sparse and any([sparse.issparse(b[2]) for b in blocks]):
+        arrays = []
+        while blocks:
+            features = blocks.pop(0)[2]
+            if not sparse.issparse(features):
+                features = np.asarray(features).reshape(nrows, -1)
+            arrays.append(features)
+        all_features = sparse.hstack(arrays, format='csr', dtype=dtype)
+    else:
+        all_features = np.empty((nrows, sum(widths) + extra), dtype=dtype)
+        start = 0
+        for width in widths:
+            features = blocks.pop(0)[2]
+            if sparse.issparse(features):
+                features = features.toarray()
+            all_features[:, start:start + width] = np.asarray(features).reshape(nrows, -1)
+            start += width
+    return all_features, provenance
+
+
+#
+# Function derived_widths
+#
+
+def derived_widths(model):
+    r"""Get the number of columns of each block of derived features.
+
+    Parameters
+    ----------
+    model : alphapy.Model
+        Model object with the feature specifications.
+
+    Returns
+    -------
+    widths : list
+        The (transform, width) pair for each block of derived features,
+        in the order that the blocks are created.
+
+    """
+    specs = model.specs
+    widths = []
+    if specs['numpy']:
+        widths.append(('numpy', 4))
+    if specs['scipy']:
+        widths.append(('scipy', 9))
+    if specs['clustering']:
+        ks = range(specs['cluster_min'], specs['cluster_max'] + 1, specs['cluster_inc'])
+        widths.append(('clusters', len(ks)))
+    if specs['pca']:
+        ns = range(specs['pca_min'], specs['pca_max'] + 1, specs['pca_inc'])
+        widths.append(('pca', sum(ns)))
+    if specs['isomap']:
+        widths.append(('isomap', specs['iso_components']))
+    if specs['tsne']:
+        widths.append(('tsne', specs['tsne_components']))
+    return widths
+
+
+#
+# Function create_features
+#
+
+def create_features(model, X):
+    r"""Create features for the train and test set.
+
+    Parameters
+    ----------
+    model : alphapy.Model
+        Model object with the feature specifications.
+    X : pandas.DataFrame
+        Combined train and test data.
+
+    Returns
+    -------
+    all_features : numpy array or sparse matrix
+        The new features.
+
+    Raises
+    ------
+    TypeError
+        Unrecognized data type.
+
+    Notes
+    -----
+    The source column and the transform of each new feature are
+    stored in the feature map under the key ``provenance``. Features
+    derived from all of the base features have the source ``'*'``.
+
+    If ``feature_workers`` is greater than one, then the base features
+    of each column are created in a process pool. The pool requires
+    the ``fork`` start method, so that the workers share the data with
+    the parent instead of receiving pickled copies. The results are
+    collected in column order, so the feature matrix is the same as
+    the serial one. Forking a process that has already initialized
+    TensorFlow, e.g., through the Keras estimators, can deadlock the
+    workers, so the pool is opt-in and the default is serial,
+    independently of ``number_jobs`` for the estimators.
+
+    Every transformer is fitted in training and stored in the feature
+    map under the key ``transformers``. In prediction, the stored
+    transformers are only applied, so the features of a batch do not
+    depend on the other rows in the batch.
+
+    The widths of the derived features are known from the model
+    specifications, so the feature matrix is allocated once. The base
+    features are copied into the first columns and scaled in place,
+    and each block of derived features is copied into the columns
+    after them.
+
+    If ``sparse`` is set, then the text features and one-hot factors
+    stay sparse, and the feature matrix is a sparse CSR matrix. The
+    NumPy, SciPy, cluster, PCA, Isomap, and t-SNE features require
+    dense input, so if any of them is set, then the feature matrix
+    is dense, but the base features are still scaled as sparse ones.
+
+    """
+
+    # Extract model parameters
+
+    counts_flag = model.specs['counts']
+    fdtype = np.float32 if model.specs['float32'] else np.float64
+    model_type = model.specs['model_type']
+    n_jobs = model.specs['feature_workers']
     scaling = model.specs['scaler_option']
     scaler = model.specs['scaler_type']
-    scipy_flag = model.specs['scipy']
     sentinel = model.specs['sentinel']
+    sparse_flag = model.specs['sparse']
     target_value = model.specs['target_value']
-    tsne = model.specs['tsne']
-    vectorize = model.specs['vectorize']
 
     # Log input parameters
 
@@ -1300,89 +1789,109 @@ def create_features(model, X):
     # Iterate through columns, dispatching and transforming each feature.
 
     logger.info("Creating Base Features")
-    all_features = np.zeros((X.shape[0], 1))
-
-    for i, fc in enumerate(X):
-        fnum = i + 1
-        dtype = X[fc].dtypes
-        nunique = len(X[fc].unique())
-        # standard processing of numerical, categorical, and text features
-        if fc in factors:
-            features = get_factors(model, X, fnum, fc, nunique, dtype,
-                                   encoder, rounding, sentinel)            
-        elif dtype == 'float64' or dtype == 'int64' or dtype == 'bool':
-            features = get_numerical_features(fnum, fc, X, nunique, dtype,
-                                              sentinel, logtransform, pvalue_level)
-        elif dtype == 'object':
-            features = get_text_features(fnum, fc, X, nunique, vectorize, ngrams_max)
-        else:
-            raise TypeError("Base Feature Error with unrecognized type %s" % dtype)
-        if features.shape[0] == all_features.shape[0]:
-            all_features = np.column_stack((all_features, features))
+    nrows = X.shape[0]
+    tasks = [(i + 1, fc) for i, fc in enumerate(X)]
+    if n_jobs < 0:
+        n_jobs = multiprocessing.cpu_count()
+    n_jobs = min(n_jobs, len(tasks))
+    if n_jobs > 1 and multiprocessing.get_start_method() != 'fork':
+        logger.info("Process pool requires fork, creating features serially")
+        n_jobs = 1
+    if n_jobs > 1:
+        logger.info("Creating base features with %d processes", n_jobs)
+        base_state['model'] = model
+        base_state['X'] = X
+        pool = multiprocessing.Pool(n_jobs)
+        try:
+            results = []
+            for fc, transform, features, fitted in pool.imap(base_feature_task, tasks):
+                fitted_transformers(model).update(fitted)
+                results.append((fc, transform, features))
+        finally:
+            pool.close()
+            pool.join()
+            base_state.clear()
+    else:
+        results = [(fc,) + get_base_features(model, X, fnum, fc)
+                   for fnum, fc in tasks]
+
+    # Allocate the feature matrix once, with room for the derived features
+
+    blocks = []
+    for fc, transform, features in results:
+        if features.shape[0] == nrows:
+            blocks.append((fc, transform, features))
         else:
             logger.info("Feature %s has the wrong number of rows: %d",
                         fc, features.shape[0])
-    all_features = np.delete(all_features, 0, axis=1)
+    del results
 
-    logger.info("New Feature Count : %d", all_features.shape[1])
+    widths = derived_widths(model)
+    nderived = sum([width for _, width in widths])
+    is_sparse = sparse_flag and any([sparse.issparse(b[2]) for b in blocks])
+    as_sparse = is_sparse and not nderived
+    if is_sparse and nderived:
+        logger.info("Derived features require dense input, creating dense features")
+    all_features, provenance = stack_blocks(blocks, nrows, fdtype, as_sparse, nderived)
+    nbase = len(provenance)
+    base_features = all_features[:, :nbase] if nderived else all_features
+
+    logger.info("New Feature Count : %d", nbase)
 
     # Call standard scaler for all features
 
     if scaling:
         logger.info("Scaling Base Features")
         if scaler == Scalers.standard:
-            all_features = StandardScaler().fit_transform(all_features)
+            std_scaler = StandardScaler(copy=False, with_mean=not is_sparse)
+            base_features = feature_transform(model, 'scaler', std_scaler,
+                                              base_features)
+        elif scaler == Scalers.minmax and is_sparse:
+            logger.info("Scaling sparse features by maximum absolute value")
+            base_features = feature_transform(model, 'scaler', MaxAbsScaler(copy=False),
+                                              base_features)
         elif scaler == Scalers.minmax:
-            all_features = MinMaxScaler().fit_transform(all_features)
+            base_features = feature_transform(model, 'scaler', MinMaxScaler(copy=False),
+                                              base_features)
         else:
             logger.info("Unrecognized scaler: %s", scaler)
     else:
         logger.info("Skipping Scaling")
 
-    # Perform dimensionality reduction only on base feature set
-    base_features = all_features
-
-    # Calculate the total, mean, standard deviation, and variance
-
-    if numpy_flag:
-        np_features = create_numpy_features(base_features, sentinel)
-        all_features = np.column_stack((all_features, np_features))
-        logger.info("New Feature Count : %d", all_features.shape[1])
-
-    # Generate scipy features
-
-    if scipy_flag:
-        sp_features = create_scipy_features(base_features, sentinel)
-        all_features = np.column_stack((all_features, sp_features))
-        logger.info("New Feature Count : %d", all_features.shape[1])
+    # Keep the scaled base features in the feature matrix
 
-    # Create clustering features
+    if not nderived:
+        all_features = base_features
+    elif not np.shares_memory(base_features, all_features):
+        all_features[:, :nbase] = base_features
+        base_features = all_features[:, :nbase]
 
-    if clustering:
-        cfeatures = create_clusters(base_features, model)
-        all_features = np.column_stack((all_features, cfeatures))
-        logger.info("New Feature Count : %d", all_features.shape[1])
-
-    # Create PCA features
-
-    if pca:
-        pfeatures = create_pca_features(base_features, model)
-        all_features = np.column_stack((all_features, pfeatures))
-        logger.info("New Feature Count : %d", all_features.shape[1])
-
-    # Create Isomap features
-
-    if isomap:
-        ifeatures = create_isomap_features(base_features, model)
-        all_features = np.column_stack((all_features, ifeatures))
-        logger.info("New Feature Count : %d", all_features.shape[1])
-
-    # Create T-SNE features
+    # Perform dimensionality reduction only on base feature set
 
-    if tsne:
-        tfeatures = create_tsne_features(base_features, model)
-        all_features = np.column_stack((all_features, tfeatures))
+    start = nbase
+    for transform, width in widths:
+        if transform == 'numpy':
+            features = create_numpy_features(base_features, sentinel, model)
+        elif transform == 'scipy':
+            features = create_scipy_features(base_features, sentinel, model)
+        elif transform == 'clusters':
+            features = create_clusters(base_features, model)
+        elif transform == 'pca':
+            features = create_pca_features(base_features, model)
+        elif transform == 'isomap':
+            features = create_isomap_features(base_features, model)
+        elif transform == 'tsne':
+            features = create_tsne_features(base_features, model)
+        if features.shape[1] != width:
+            raise ValueError("Expected %d %s features, created %d" %
+                             (width, transform, features.shape[1]))
+        # Copy the derived features next to the base features
+        all_features[:, start:start + width] = features
+        provenance.extend([(WILDCARD, transform)] * width)
+        start += width
+    if nderived:
         logger.info("New Feature Count : %d", all_features.shape[1])
+    model.feature_map['provenance'] = provenance
 
     # Return all transformed training and test features
     return all_features
@@ -1509,12 +2018,12 @@ def create_interactions(model, X):
     ----------
     model : alphapy.Model
         Model object with train and test data.
-    X : numpy array
+    X : numpy array or sparse matrix
         Feature Matrix.
 
     Returns
     -------
-    all_features : numpy array
+    all_features : numpy array or sparse matrix
         The new interaction features.
 
     Raises
@@ -1568,8 +2077,15 @@ def create_interactions(model, X):
             support = model.feature_map['poly_support']
         pfeatures = get_polynomials(X[:, support], poly_degree)
         logger.info("Polynomial Feature Count : %d", pfeatures.shape[1])
-        pfeatures = StandardScaler().fit_transform(pfeatures)
-        all_features = np.hstack((all_features, pfeatures))
+        if sparse.issparse(all_features):
+            pscaler = StandardScaler(with_mean=False)
+            pfeatures = feature_transform(model, ('scaler', 'interactions'),
+                                          pscaler, pfeatures)
+            all_features = sparse.hstack((all_features, pfeatures), format='csr')
+        else:
+            pfeatures = feature_transform(model, ('scaler', 'interactions'),
+                                          StandardScaler(), pfeatures)
+            all_features = np.hstack((all_features, pfeatures))
         logger.info("New Total Feature Count  : %d", all_features.shape[1])
     else:
         logger.info("Skipping Interactions")
@@ -1621,12 +2137,12 @@ def remove_lv_features(model, X):
     ----------
     model : alphapy.Model
         Model specifications for removing features.
-    X : numpy array
+    X : numpy array or sparse matrix
         The feature matrix.
 
     Returns
     -------
-    X_reduced : numpy array
+    X_reduced : numpy array or sparse matrix
         The reduced feature matrix.
 
     References
@@ -26,11 +26,17 @@
 # Imports
 #
 
-from alphapy.globals import PSEP, SSEP, USEP
+from alphapy.globals import BINARY_FORMATS, PARQUET_ROW_GROUP
+from alphapy.globals import PSEP, SPILL_INDEX, SSEP, USEP
 from alphapy.globals import TAG_ID
 
+from collections import OrderedDict
 import logging
+import numpy as np
+import os
 import pandas as pd
+from pandas.api.types import union_categoricals
+import tempfile
 
 
 #
@@ -90,18 +96,69 @@ class Frame(object):
     ----------
     frames : dict
         Class variable for storing all known frames
+    directory : str
+        Class variable for the directory of memory-mapped frames. If
+        ``None``, then the frames are kept in memory.
+    budget : int
+        Class variable for the maximum number of bytes of the frames
+        in memory. If zero, then the frames are never spilled.
+    spill_dir : str
+        Class variable for the directory of spilled frames.
+    resident : collections.OrderedDict
+        Class variable for the frames in memory and their sizes,
+        from the least to the most recently used.
+    nbytes : int
+        Class variable for the total size of the resident frames.
+    hits : int
+        Class variable for the number of accesses to resident frames.
+    misses : int
+        Class variable for the number of accesses to spilled frames.
+    spills : int
+        Class variable for the number of frames spilled to disk.
 
     Examples
     --------
     
     >>> Frame('tech', Space('stock', 'prices', '5m'), df)
 
+    Notes
+    -----
+    When ``Frame.directory`` is set, assigning ``df`` stores the
+    floating point columns of the dataframe on disk, and the frame
+    refers to a copy-on-write memory map of that file. Pages are
+    read only when they are accessed, and processes forked from
+    this one share the same pages. New columns are kept in memory
+    until the dataframe is assigned again.
+
+    When ``Frame.budget`` is set, the least recently used frames are
+    spilled to ``Frame.spill_dir`` whenever the resident frames exceed
+    the budget, and a spilled frame is reloaded on its next access.
+    The size of a frame, including the contents of its object columns,
+    is measured on every access, so columns added in place through
+    ``df`` are counted on the next access.
+    Frames are spilled as Feather files if the pyarrow package is
+    installed, and pickled otherwise.
+
     """
 
     # class variable to track all frames
 
     frames = {}
 
+    # class variable for the memory-mapped frames
+
+    directory = None
+
+    # class variables for the memory budget
+
+    budget = 0
+    spill_dir = None
+    resident = OrderedDict()
+    nbytes = 0
+    hits = 0
+    misses = 0
+    spills = 0
+
     # __init__
 
     def __init__(self,
@@ -118,7 +175,7 @@ class Frame(object):
                 # add frame to frames list
                 Frame.frames[fn] = self
             else:
-                logger.info("Frame ", fn, " already exists")
+                logger.info("Frame %s already exists", fn)
         else:
             logger.info("df must be of type Pandas DataFrame")
         
@@ -127,14 +184,356 @@ class Frame(object):
     def __str__(self):
         return frame_name(self.name, self.space)
 
+    # df
+
+    @property
+    def df(self):
+        if Frame.budget > 0:
+            if self._df is None:
+                Frame.misses += 1
+                self._df = reload_frame(frame_name(self.name, self.space),
+                                        self._spill)
+            else:
+                Frame.hits += 1
+            frame_resident(self)
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        if Frame.directory is None:
+            self._df = df
+        else:
+            fname = PSEP.join([frame_name(self.name, self.space), 'npy'])
+            self._df = map_frame(df, SSEP.join([Frame.directory, fname]))
+        if Frame.budget > 0:
+            frame_resident(self)
+
+
+#
+# Function spill_path
+#
+
+def spill_path(fname, extension):
+    r"""Get the path of a spilled frame.
+
+    Parameters
+    ----------
+    fname : str
+        Frame name.
+    extension : str
+        File name extension, ``feather`` or ``pkl``.
+
+    Returns
+    -------
+    path : str
+        Full path of the file in ``Frame.spill_dir``.
+
+    """
+    if Frame.spill_dir is None:
+        Frame.spill_dir = tempfile.mkdtemp(prefix='frames')
+    path = SSEP.join([Frame.spill_dir, PSEP.join([fname, extension])])
+    return path
+
+
+#
+# Function spill_frame
+#
+
+def spill_frame(fname, df):
+    r"""Write a frame to the spill directory.
+
+    Parameters
+    ----------
+    fname : str
+        Frame name.
+    df : pandas.DataFrame
+        The dataframe to spill.
+
+    Returns
+    -------
+    spill : tuple
+        The extension of the spilled file and an empty copy of the
+        frame with its data types, for ``reload_frame``.
+
+    Notes
+    -----
+    If the pyarrow package is installed and the column names are
+    unique strings, then the frame is written as a Feather file with
+    ``write_frame``. Otherwise, or if the write fails, e.g., for an
+    object column of mixed types, the frame is pickled. The data types
+    of the columns and the index are restored on reload, because the
+    strings of an object column are read back as a string column.
+
+    """
+    try:
+        import pyarrow
+        columnar = True
+    except ImportError:
+        columnar = False
+    columnar = columnar and df.columns.is_unique \
+               and not isinstance(df.index, pd.MultiIndex) \
+               and all([isinstance(c, str) for c in df.columns]) \
+               and SPILL_INDEX not in df.columns
+    if columnar:
+        path = spill_path(fname, 'feather')
+        if os.path.isfile(path):
+            os.remove(path)
+        write_frame(df, Frame.spill_dir, fname, 'feather', ',',
+                    index=True, index_label=SPILL_INDEX)
+        # a failed write leaves no file or one without a schema
+        columns = frame_columns(Frame.spill_dir, fname, 'feather', ',')
+        if columns == [SPILL_INDEX] + list(df.columns):
+            return 'feather', df.iloc[:0]
+        if os.path.isfile(path):
+            os.remove(path)
+    df.to_pickle(spill_path(fname, 'pkl'))
+    return 'pkl', None
+
+
+#
+# Function reload_frame
+#
+
+def reload_frame(fname, spill):
+    r"""Read a frame from the spill directory.
+
+    Parameters
+    ----------
+    fname : str
+        Frame name.
+    spill : tuple
+        The extension and the empty frame returned by ``spill_frame``.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The spilled dataframe.
+
+    """
+    extension, template = spill
+    if extension == 'pkl':
+        df = pd.read_pickle(spill_path(fname, extension))
+    else:
+        df = read_frame(Frame.spill_dir, fname, extension, ',',
+                        index_col=SPILL_INDEX)
+        dtypes = {c : t for c, t in template.dtypes.items() if df[c].dtype != t}
+        if dtypes:
+            df = df.astype(dtypes)
+        if df.index.dtype != template.index.dtype:
+            df.index = df.index.astype(template.index.dtype)
+        df.index.name = template.index.name
+    return df
+
+
+#
+# Function frame_resident
+#
+
+def frame_resident(frame):
+    r"""Mark a frame as the most recently used and enforce the budget.
+
+    Parameters
+    ----------
+    frame : alphapy.Frame
+        The frame that was assigned or accessed.
+
+    Returns
+    -------
+    None : None
+
+    Notes
+    -----
+    The least recently used frames are spilled until the resident
+    frames fit within ``Frame.budget``, but the given frame is
+    always kept in memory.
+
+    """
+    fname = frame_name(frame.name, frame.space)
+    nbytes = int(frame._df.memory_usage(index=True, deep=True).sum())
+    if fname in Frame.resident:
+        Frame.nbytes -= Frame.resident[fname][1]
+    Frame.resident[fname] = (frame, nbytes)
+    Frame.resident.move_to_end(fname)
+    Frame.nbytes += nbytes
+    # spill the least recently used frames
+    for lname in list(Frame.resident.keys()):
+        if Frame.nbytes <= Frame.budget:
+            break
+        if lname != fname:
+            lframe, lbytes = Frame.resident.pop(lname)
+            lframe._spill = spill_frame(lname, lframe._df)
+            lframe._df = None
+            Frame.nbytes -= lbytes
+            Frame.spills += 1
+            logger.debug("Spilled Frame %s (%d bytes)", lname, lbytes)
+
+
+#
+# Function frame_info
+#
+
+def frame_info():
+    r"""Report the residency of the frames.
+
+    Returns
+    -------
+    info : dict
+        The number of ``frames`` and ``resident`` frames, the ``nbytes``
+        of the resident frames, the ``budget``, and the number of
+        ``hits``, ``misses``, and ``spills``.
+
+    """
+    info = {'frames'   : len(Frame.frames),
+            'resident' : len(Frame.resident) if Frame.budget > 0 else len(Frame.frames),
+            'nbytes'   : Frame.nbytes,
+            'budget'   : Frame.budget,
+            'hits'     : Frame.hits,
+            'misses'   : Frame.misses,
+            'spills'   : Frame.spills}
+    if Frame.budget > 0:
+        accesses = Frame.hits + Frame.misses
+        hit_rate = 100.0 * Frame.hits / accesses if accesses else 100.0
+        logger.info("Frames: %d of %d resident, %d of %d bytes, %d hits, "
+                    "%d misses (%.1f%% hit rate), %d spills",
+                    info['resident'], info['frames'], info['nbytes'],
+                    info['budget'], info['hits'], info['misses'], hit_rate,
+                    info['spills'])
+    return info
+
+
+#
+# Function map_frame
+#
+
+def map_frame(df, path):
+    r"""Store a dataframe in a memory-mapped file.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The dataframe to store.
+    path : str
+        Full path of the ``.npy`` file for the floating point columns.
+
+    Returns
+    -------
+    mf : pandas.DataFrame
+        The dataframe with its floating point columns mapped from
+        the file, and all other columns in memory.
+
+    Notes
+    -----
+    The floating point columns are stored as one (column x row)
+    array, so the dataframe is backed by a single block without
+    copying. The file is replaced atomically, so existing maps of
+    the previous file remain valid.
+
+    The map is kept until pandas copies the block. A new column is
+    held in memory next to the map until ``vstore`` assigns the frame
+    again, which maps all of the floating point columns anew. The
+    lagged columns of ``sequence_frame`` are new arrays in memory,
+    while its leader and target columns remain mapped. Use
+    ``mapped_columns`` to check which columns are backed by a map.
+
+    """
+    fpos = [i for i, dt in enumerate(df.dtypes) if dt == np.float64]
+    if not fpos:
+        return df
+    # write the new file and replace the old one
+    tpath = PSEP.join([path, 'tmp'])
+    values = np.lib.format.open_memmap(tpath, mode='w+', dtype=np.float64,
+                                       shape=(len(fpos), len(df)))
+    for i, pos in enumerate(fpos):
+        values[i] = df.iloc[:, pos].values
+    values.flush()
+    del values
+    os.replace(tpath, path)
+    # map the file and insert the remaining columns in order
+    values = np.load(path, mmap_mode='c')
+    mf = pd.DataFrame(values.T, index=df.index, columns=df.columns[fpos],
+                      copy=False)
+    fpos = set(fpos)
+    for i, c in enumerate(df.columns):
+        if i not in fpos:
+            mf.insert(i, c, df.iloc[:, i])
+    if not np.shares_memory(mf.iloc[:, min(fpos)].values, values):
+        logger.warning("Frame columns were copied from the map %s", path)
+    return mf
+
+
+#
+# Function mapped_columns
+#
+
+def mapped_columns(df):
+    r"""Get the columns of a dataframe that are backed by a memory map.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The dataframe to check.
+
+    Returns
+    -------
+    columns : list
+        The names of the columns whose values are a view of a
+        ``numpy.memmap``.
+
+    """
+    columns = []
+    for i, c in enumerate(df.columns):
+        base = df.iloc[:, i].values
+        while base is not None and not isinstance(base, np.memmap):
+            base = getattr(base, 'base', None)
+        if base is not None:
+            columns.append(c)
+    return columns
+
+
+#
+# Function file_format
+#
+
+def file_format(extension, file_all=None):
+    r"""Determine the format of a data file.
+
+    Parameters
+    ----------
+    extension : str
+        File name extension, e.g., ``csv`` or ``parquet``.
+    file_all : str, optional
+        Full path of an existing file. If specified, then the format
+        is detected from the first bytes of the file instead.
+
+    Returns
+    -------
+    fmt : str
+        One of the ``BINARY_FORMATS``, or ``text`` for a
+        delimiter-separated file.
+
+    """
+    fmt = extension.lower()
+    if fmt not in BINARY_FORMATS:
+        fmt = 'text'
+    if file_all is not None and os.path.isfile(file_all):
+        with open(file_all, 'rb') as f:
+            header = f.read(8)
+        fmt = 'text'
+        for key, magic in BINARY_FORMATS.items():
+            if any([header.startswith(m) for m in magic]):
+                fmt = key
+    return fmt
+
 
 #
 # Function read_frame
 #
 
 def read_frame(directory, filename, extension, separator,
-               index_col=None, squeeze=False):
-    r"""Read a delimiter-separated file into a data frame.
+               index_col=None, squeeze=False, columns=None,
+               start=None, end=None, dtype=None, chunksize=None,
+               nrows=None):
+    r"""Read a delimiter-separated or columnar file into a data frame.
 
     Parameters
     ----------
@@ -143,13 +542,29 @@ def read_frame(directory, filename, extension, separator,
     filename : str
         Name of the file to read, excluding the ``extension``.
     extension : str
-        File name extension, e.g., ``csv``.
+        File name extension, e.g., ``csv`` or ``parquet``.
     separator : str
         The delimiter between fields in the file.
     index_col : str, optional
         Column to use as the row labels in the dataframe.
     squeeze : bool, optional
         If the data contains only one column, then return a pandas Series.
+    columns : list, optional
+        The names of the columns to read. The ``index_col`` is
+        always read. For columnar files, all of the columns are
+        read if the ``index_col`` is a position instead of a name.
+    start : str, optional
+        The first date of the ``index_col`` to read.
+    end : str, optional
+        The last date of the ``index_col`` to read.
+    dtype : dict, optional
+        The data types of the columns, e.g., ``float32`` or
+        ``category``. Columns that are not listed are inferred.
+    chunksize : int, optional
+        The number of rows to parse at a time from a delimiter-separated
+        file.
+    nrows : int, optional
+        The number of rows to read from the start of the file.
 
     Returns
     -------
@@ -157,26 +572,203 @@ def read_frame(directory, filename, extension, separator,
         The pandas dataframe loaded from the file location. If the file
         cannot be located, then ``None`` is returned.
 
+    Notes
+    -----
+    The format of the file is detected from its contents, so a file
+    written with a ``parquet`` or ``feather`` extension can be read
+    regardless of the configured extension. For Parquet files, the
+    ``start`` and ``end`` dates are pushed down to the reader to skip
+    row groups outside of the date range.
+
+    The chunks of a delimiter-separated file are parsed directly into
+    the given ``dtype`` with only the selected ``columns``, and each
+    chunk is filtered by the ``start`` and ``end`` dates before the
+    chunks are combined. Thus, only the selected rows and columns
+    are held in memory at once. Columnar files are converted after
+    they are read.
+
     """
     file_only = PSEP.join([filename, extension])
     file_all = SSEP.join([directory, file_only])
     logger.info("Loading data from %s", file_all)
+    fmt = file_format(extension, file_all)
     try:
-        df = pd.read_csv(file_all, sep=separator, index_col=index_col,
-                         squeeze=squeeze)
+        # include the index in any column projection
+        usecols = None
+        if columns is not None:
+            usecols = list(columns)
+            if index_col is not None and not isinstance(index_col, str):
+                if fmt == 'text':
+                    header = pd.read_csv(file_all, sep=separator, nrows=0)
+                    index_col = header.columns[index_col]
+                else:
+                    usecols = None
+            if isinstance(index_col, str) and index_col not in usecols:
+                usecols.insert(0, index_col)
+        if fmt == 'parquet':
+            filters = []
+            if isinstance(index_col, str):
+                if start is not None:
+                    filters.append((index_col, '>=', pd.Timestamp(start)))
+                if end is not None:
+                    filters.append((index_col, '<=', pd.Timestamp(end)))
+            if filters:
+                df = pd.read_parquet(file_all, columns=usecols, filters=filters)
+            else:
+                df = pd.read_parquet(file_all, columns=usecols)
+        elif fmt == 'feather':
+            df = pd.read_feather(file_all, columns=usecols)
+        else:
+            df = pd.read_csv(file_all, sep=separator, index_col=index_col,
+                             usecols=usecols, dtype=dtype,
+                             chunksize=chunksize, nrows=nrows)
+            if chunksize is not None:
+                chunks = []
+                for chunk in df:
+                    if index_col is not None:
+                        chunk = select_dates(chunk, start, end)
+                    chunks.append(chunk)
+                df = concat_chunks(chunks)
+    except ImportError:
+        df = None
+        logger.error("Reading %s files requires the pyarrow package", fmt)
     except:
         df = None
         logger.info("Could not find or access %s", file_all)
+    if df is not None:
+        if fmt != 'text':
+            if nrows is not None:
+                df = df.iloc[:nrows]
+            if dtype is not None:
+                df = df.astype({c : t for c, t in dtype.items() if c in df.columns})
+        if index_col is not None:
+            if fmt != 'text':
+                if not isinstance(index_col, str):
+                    index_col = df.columns[index_col]
+                df.set_index(index_col, inplace=True)
+            df = select_dates(df, start, end)
+        if squeeze and df.shape[1] == 1:
+            df = df[df.columns[0]]
     return df
 
 
+#
+# Function select_dates
+#
+
+def select_dates(df, start=None, end=None):
+    r"""Select the rows of a data frame within a range of dates.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The dataframe indexed by date.
+    start : str, optional
+        The first date to select.
+    end : str, optional
+        The last date to select.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The rows of the dataframe from ``start`` to ``end``.
+
+    """
+    if start is None and end is None:
+        return df
+    dates = pd.to_datetime(df.index)
+    selected = np.ones(len(df), dtype=bool)
+    if start is not None:
+        selected &= dates >= pd.Timestamp(start)
+    if end is not None:
+        selected &= dates <= pd.Timestamp(end)
+    return df[selected]
+
+
+#
+# Function concat_chunks
+#
+
+def concat_chunks(chunks):
+    r"""Concatenate the chunks of a file into a single data frame.
+
+    Parameters
+    ----------
+    chunks : list
+        The data frames parsed from each chunk of the file.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The combined dataframe.
+
+    Notes
+    -----
+    Each chunk of a categorical column has its own categories, so the
+    categories are unified before concatenation. Otherwise, pandas
+    would convert the column to objects.
+
+    """
+    if not chunks:
+        return pd.DataFrame()
+    for c in chunks[0].columns:
+        if chunks[0][c].dtype.name == 'category':
+            cats = union_categoricals([chunk[c] for chunk in chunks]).categories
+            for chunk in chunks:
+                chunk[c] = chunk[c].cat.set_categories(cats)
+    df = pd.concat(chunks)
+    return df
+
+
+#
+# Function frame_columns
+#
+
+def frame_columns(directory, filename, extension, separator):
+    r"""Get the column names of a file without reading its rows.
+
+    Parameters
+    ----------
+    directory : str
+        Full directory specification.
+    filename : str
+        Name of the file, excluding the ``extension``.
+    extension : str
+        File name extension, e.g., ``csv`` or ``parquet``.
+    separator : str
+        The delimiter between fields in the file.
+
+    Returns
+    -------
+    columns : list
+        The names of the columns. If the file cannot be read, then
+        ``None`` is returned.
+
+    """
+    file_all = SSEP.join([directory, PSEP.join([filename, extension])])
+    fmt = file_format(extension, file_all)
+    try:
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            columns = pq.read_schema(file_all).names
+        elif fmt == 'feather':
+            import pyarrow as pa
+            columns = pa.ipc.open_file(file_all).schema.names
+        else:
+            columns = list(pd.read_csv(file_all, sep=separator, nrows=0).columns)
+    except:
+        columns = None
+        logger.info("Could not read the columns of %s", file_all)
+    return columns
+
+
 #
 # Function write_frame
 #
 
 def write_frame(df, directory, filename, extension, separator,
-                index=False, index_label=None, columns=None):
-    r"""Write a dataframe into a delimiter-separated file.
+                index=False, index_label=None, columns=None, append=False):
+    r"""Write a dataframe into a delimiter-separated or columnar file.
 
     Parameters
     ----------
@@ -187,7 +779,7 @@ def write_frame(df, directory, filename, extension, separator,
     filename : str
         Name of the file to write, excluding the ``extension``.
     extension : str
-        File name extension, e.g., ``csv``.
+        File name extension, e.g., ``csv`` or ``parquet``.
     separator : str
         The delimiter between fields in the file.
     index : bool, optional
@@ -196,18 +788,52 @@ def write_frame(df, directory, filename, extension, separator,
         A column label for the ``index``.
     columns : str, optional
         A list of column names.
+    append : bool, optional
+        If ``True``, then append the rows without a header to an
+        existing delimiter-separated file.
 
     Returns
     -------
     None : None
 
+    Notes
+    -----
+    Columnar formats do not store row names, so the index is written
+    as the first column, just like a delimiter-separated file. Rows
+    cannot be appended to a columnar file.
+
     """
     file_only = PSEP.join([filename, extension])
     file_all = SSEP.join([directory, file_only])
-    logger.info("Writing data frame to %s", file_all)
+    fmt = file_format(extension)
+    if append:
+        logger.debug("Appending data frame to %s", file_all)
+    else:
+        logger.info("Writing data frame to %s", file_all)
     try:
-        df.to_csv(file_all, sep=separator, index=index,
-                  index_label=index_label, columns=columns)
+        if fmt == 'text':
+            mode = 'a' if append else 'w'
+            df.to_csv(file_all, sep=separator, index=index,
+                      index_label=index_label, columns=columns,
+                      mode=mode, header=not append)
+        elif append:
+            logger.error("Cannot append rows to %s file %s", fmt, file_all)
+        else:
+            if columns is not None:
+                df = df[columns]
+            if index:
+                if index_label is not None:
+                    df = df.rename_axis(index_label)
+                df = df.reset_index()
+            else:
+                df = df.reset_index(drop=True)
+            df.columns = [str(c) for c in df.columns]
+            if fmt == 'parquet':
+                df.to_parquet(file_all, row_group_size=PARQUET_ROW_GROUP)
+            else:
+                df.to_feather(file_all)
+    except ImportError:
+        logger.error("Writing %s files requires the pyarrow package", fmt)
     except:
         logger.info("Could not write data frame to %s", file_all)
 
@@ -311,6 +937,60 @@ def dump_frames(group, directory, extension, separator):
             logger.info("Data Frame for %s not found", fname)
 
 
+#
+# Function lag_frame
+#
+
+def lag_frame(df, columns, lag_period, names):
+    r"""Create the lagged values of the given columns.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The original dataframe.
+    columns : list
+        The columns to lag.
+    lag_period : int
+        The number of lagged rows.
+    names : list
+        The names of the lagged columns, from the oldest lag to the
+        most recent one.
+
+    Returns
+    -------
+    lag_df : pandas.DataFrame
+        The lagged values, padded with NaN at the start.
+
+    Notes
+    -----
+    Numeric columns are copied once into a single array with
+    ``lag_period`` rows of NaN padding on top. The lags are strided
+    views over that array, so the lagged matrix is only materialized
+    once, in the common floating-point type of the columns. Frames
+    with non-numeric columns are shifted one lag at a time.
+
+    """
+    dtypes = [df[c].dtype for c in columns]
+    numeric = all(isinstance(t, np.dtype) and t.kind in 'iuf' for t in dtypes)
+    if not numeric:
+        lag_cols = [df[columns].shift(i) for i in range(lag_period, 0, -1)]
+        lag_df = pd.concat(lag_cols, axis=1)
+        lag_df.columns = names
+        return lag_df
+    dtype = np.result_type(np.float16, *dtypes)
+    nrows, ncols = len(df), len(columns)
+    padded = np.full((nrows + lag_period, ncols), np.nan, dtype=dtype)
+    for j, c in enumerate(columns):
+        padded[lag_period:, j] = df[c].values
+    row_stride, col_stride = padded.strides
+    lag_view = np.lib.stride_tricks.as_strided(padded,
+                                               shape=(nrows, lag_period, ncols),
+                                               strides=(row_stride, row_stride, col_stride),
+                                               writeable=False)
+    lag_values = np.array(lag_view.reshape(nrows, lag_period * ncols))
+    return pd.DataFrame(lag_values, index=df.index, columns=names, copy=False)
+
+
 #
 # Function sequence_frame
 #
@@ -347,8 +1027,9 @@ def sequence_frame(df, target, forecast_period=1, leaders=[], lag_period=1):
     # Add lagged columns
     new_cols, new_names = list(), list()
     for i in range(lag_period, 0, -1):
-        new_cols.append(df[df_cols].shift(i))
         new_names += ['%s[%d]' % (df_cols[j], i) for j in range(df_len)]
+    if new_names:
+        new_cols.append(lag_frame(df, df_cols, lag_period, new_names))
 
     # Preserve leader columns
     new_cols.append(df[le_cols])
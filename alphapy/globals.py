@@ -53,6 +53,23 @@ Q1 = 0.25
 Q2 = 0.50
 Q3 = 0.75
 
+#
+# Market Calendar
+#
+
+CALENDAR_DAYS_YEAR = 365
+LOOKBACK_MARGIN = 0.02
+LOOKBACK_SESSIONS = 5
+SESSION_MINUTES = 390
+TRADING_DAYS_YEAR = 252
+
+#
+# Date and Time Formats
+#
+
+DATE_FORMATS = ['%Y-%m-%d', '%Y%m%d', '%m/%d/%Y', '%d-%b-%y', '%d-%b-%Y']
+TIME_FORMATS = ['%H:%M:%S', '%H:%M', '%H%M%S', '%I:%M:%S %p', '%I:%M %p']
+
 #
 # String Constants
 #
@@ -68,12 +85,53 @@ WILDCARD = '*'
 MULTIPLIERS = {'crypto' : 1.0,
                'stock' : 1.0}
 
+#
+# Binary File Formats
+#
+
+BINARY_FORMATS = {'feather' : [b'ARROW1', b'FEA1'],
+                  'parquet' : [b'PAR1']}
+PARQUET_ROW_GROUP = 100000
+SPILL_INDEX = '__index__'
+DTYPE_SAMPLE_ROWS = 10000
+
+#
+# Feature Cache
+#
+
+FEATURE_CACHE_EXCLUDE = ['algorithms', 'cache_features', 'cache_size',
+                         'cal_type', 'calibration', 'calibration_plot',
+                         'chunksize',
+                         'confusion_matrix', 'cv_folds', 'directory', 'esr',
+                         'feature_selection', 'feature_workers',
+                         'fs_percentage', 'fs_score_func',
+                         'fs_uni_grid', 'grid_search', 'gs_iters', 'gs_random',
+                         'gs_sample', 'gs_sample_pct', 'importances',
+                         'learning_curve', 'n_estimators', 'n_jobs',
+                         'predict_date', 'predict_mode', 'rfe', 'rfe_step',
+                         'roc_curve', 'sampling', 'sampling_method',
+                         'sampling_ratio', 'scorer', 'shuffle', 'split',
+                         'submission_file', 'submit_probas', 'train_date',
+                         'verbosity']
+
+#
+# Data Feeds
+#
+
+FEED_BACKOFF = 1.0
+
 #
 # Pandas Time Offset Aliases
 #
 
 PD_INTRADAY_OFFSETS = ['H', 'T', 'min', 'S', 'L', 'ms', 'U', 'us', 'N']
 
+#
+# Resampling Pyramid
+#
+
+PYRAMID_FRACTALS = ['1min', '5min', '15min', '30min', '1H', '2H', '4H', '1D']
+
 #
 # Pandas Web Reader Feeds
 #
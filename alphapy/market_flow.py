@@ -29,12 +29,18 @@
 from alphapy.alias import Alias
 from alphapy.analysis import Analysis
 from alphapy.analysis import run_analysis
+from alphapy.data import get_lookback_days
 from alphapy.data import get_market_data
+from alphapy.frame import Frame
+from alphapy.frame import frame_info
 from alphapy.globals import PD_INTRADAY_OFFSETS
 from alphapy.globals import PSEP, SSEP
 from alphapy.group import Group
 from alphapy.market_variables import Variable
+from alphapy.market_variables import vcache_info
+from alphapy.market_variables import vlookback
 from alphapy.market_variables import vmapply
+from alphapy.market_variables import vmupdate
 from alphapy.model import get_model_config
 from alphapy.model import Model
 from alphapy.portfolio import gen_portfolio
@@ -103,6 +109,30 @@ def get_market_config():
                     fractal)
     specs['data_fractal'] = fractal
     specs['data_history'] = cfg['market']['data_history']
+    try:
+        specs['data_store'] = cfg['market']['data_store']
+    except:
+        specs['data_store'] = False
+    try:
+        specs['feature_cache'] = cfg['market']['feature_cache']
+    except:
+        specs['feature_cache'] = 0
+    try:
+        specs['feed_rate'] = cfg['market']['feed_rate']
+    except:
+        specs['feed_rate'] = 0
+    try:
+        specs['feed_retries'] = cfg['market']['feed_retries']
+    except:
+        specs['feed_retries'] = 0
+    try:
+        specs['feed_timeout'] = cfg['market']['feed_timeout']
+    except:
+        specs['feed_timeout'] = None
+    try:
+        specs['feed_workers'] = cfg['market']['feed_workers']
+    except:
+        specs['feed_workers'] = 1
     specs['forecast_period'] = cfg['market']['forecast_period']
     fractal = cfg['market']['fractal']
     try:
@@ -111,12 +141,40 @@ def get_market_config():
         logger.info("fractal [%s] is an invalid pandas offset",
                     fractal)
     specs['fractal'] = fractal
+    try:
+        specs['frame_budget'] = cfg['market']['frame_budget']
+    except:
+        specs['frame_budget'] = 0
+    try:
+        specs['frame_store'] = cfg['market']['frame_store']
+    except:
+        specs['frame_store'] = False
+    try:
+        specs['incremental'] = cfg['market']['incremental']
+    except:
+        specs['incremental'] = False
     specs['lag_period'] = cfg['market']['lag_period']
     specs['leaders'] = cfg['market']['leaders']
+    try:
+        specs['panel'] = cfg['market']['panel']
+    except:
+        specs['panel'] = False
     specs['predict_history'] = cfg['market']['predict_history']
+    try:
+        specs['pyramid'] = cfg['market']['pyramid']
+    except:
+        specs['pyramid'] = False
     specs['schema'] = cfg['market']['schema']
+    try:
+        specs['streaming'] = cfg['market']['streaming']
+    except:
+        specs['streaming'] = False
     specs['subject'] = cfg['market']['subject']
     specs['target_group'] = cfg['market']['target_group']
+    try:
+        specs['variable_workers'] = cfg['market']['variable_workers']
+    except:
+        specs['variable_workers'] = 1
 
     # Create the subject/schema/fractal namespace
 
@@ -189,16 +247,29 @@ def get_market_config():
     logger.info('create_model    = %r', specs['create_model'])
     logger.info('data_fractal    = %s', specs['data_fractal'])
     logger.info('data_history    = %d', specs['data_history'])
+    logger.info('data_store      = %r', specs['data_store'])
+    logger.info('feature_cache   = %d', specs['feature_cache'])
     logger.info('features        = %s', specs['features'])
+    logger.info('feed_rate       = %s', specs['feed_rate'])
+    logger.info('feed_retries    = %d', specs['feed_retries'])
+    logger.info('feed_timeout    = %s', specs['feed_timeout'])
+    logger.info('feed_workers    = %d', specs['feed_workers'])
     logger.info('forecast_period = %d', specs['forecast_period'])
     logger.info('fractal         = %s', specs['fractal'])
+    logger.info('frame_budget    = %d', specs['frame_budget'])
+    logger.info('frame_store     = %r', specs['frame_store'])
+    logger.info('incremental     = %r', specs['incremental'])
     logger.info('lag_period      = %d', specs['lag_period'])
     logger.info('leaders         = %s', specs['leaders'])
+    logger.info('panel           = %r', specs['panel'])
     logger.info('predict_history = %s', specs['predict_history'])
+    logger.info('pyramid         = %r', specs['pyramid'])
     logger.info('schema          = %s', specs['schema'])
+    logger.info('streaming       = %r', specs['streaming'])
     logger.info('subject         = %s', specs['subject'])
     logger.info('system          = %s', specs['system'])
     logger.info('target_group    = %s', specs['target_group'])
+    logger.info('variable_workers = %d', specs['variable_workers'])
 
     # Market Specifications
     return specs
@@ -237,7 +308,10 @@ def market_pipeline(model, market_specs):
 
     # Get model specifications
 
+    directory = model.specs['directory']
+    extension = model.specs['extension']
     predict_mode = model.specs['predict_mode']
+    separator = model.specs['separator']
     target = model.specs['target']
 
     # Get market specifications
@@ -245,14 +319,27 @@ def market_pipeline(model, market_specs):
     create_model = market_specs['create_model']
     data_fractal = market_specs['data_fractal']
     data_history = market_specs['data_history']
+    data_store = market_specs['data_store']
+    feature_cache = market_specs['feature_cache']
     features = market_specs['features']
+    feed_rate = market_specs['feed_rate']
+    feed_retries = market_specs['feed_retries']
+    feed_timeout = market_specs['feed_timeout']
+    feed_workers = market_specs['feed_workers']
     forecast_period = market_specs['forecast_period']
     fractal = market_specs['fractal']
+    frame_budget = market_specs['frame_budget']
+    frame_store = market_specs['frame_store']
     functions = market_specs['functions']
+    incremental = market_specs['incremental']
     lag_period = market_specs['lag_period']
     leaders = market_specs['leaders']
+    panel = market_specs['panel']
     predict_history = market_specs['predict_history']
+    pyramid = market_specs['pyramid']
+    streaming = market_specs['streaming']
     target_group = market_specs['target_group']
+    variable_workers = market_specs['variable_workers']
 
     # Set the target group
 
@@ -263,11 +350,43 @@ def market_pipeline(model, market_specs):
 
     intraday = any(substring in fractal for substring in PD_INTRADAY_OFFSETS)
 
+    # In prediction mode, get only the history required for the
+    # features, if the lookback of all the features is known.
+
+    lookback = predict_history if predict_mode else data_history
+    nbars = None
+    if predict_mode and features:
+        lookbacks = [vlookback(v) for v in features]
+        if None not in lookbacks:
+            nbars = max(lookbacks)
+            ndays = get_lookback_days(nbars + lag_period + 1, fractal)
+            if ndays:
+                lookback = ndays
+                logger.info("Feature Lookback: %d bars, %d days", nbars, lookback)
+
+    # Store the frames in memory-mapped files if requested
+
+    if frame_store:
+        Frame.directory = SSEP.join([directory, 'data', 'frames'])
+        if not os.path.exists(Frame.directory):
+            os.makedirs(Frame.directory)
+        logger.info("Frame Store: %s", Frame.directory)
+
+    # Spill the least recently used frames over the memory budget
+
+    if frame_budget > 0:
+        Frame.budget = frame_budget * 1024 * 1024
+        Frame.spill_dir = SSEP.join([directory, 'data', 'spill'])
+        if not os.path.exists(Frame.spill_dir):
+            os.makedirs(Frame.spill_dir)
+        logger.info("Frame Budget: %d bytes", Frame.budget)
+
     # Get stock data. If we can't get all the data, then
     # predict_history resets to the actual history obtained.
 
-    lookback = predict_history if predict_mode else data_history
-    npoints = get_market_data(model, group, lookback, data_fractal, intraday)
+    npoints = get_market_data(model, group, lookback, data_fractal, intraday,
+                              data_store, feed_workers, feed_rate,
+                              feed_retries, feed_timeout, pyramid)
     if npoints > 0:
         logger.info("Number of Data Points: %d", npoints)
     else:
@@ -277,12 +396,25 @@ def market_pipeline(model, market_specs):
 
     if create_model:
         # apply features to all of the frames
-        vmapply(group, features, functions)
-        vmapply(group, [target], functions)
+        if incremental:
+            data_dir = SSEP.join([directory, 'data'])
+            vmupdate(group, list(features) + [target], data_dir,
+                     extension, separator, functions)
+        else:
+            cache_dir = None
+            if feature_cache > 0:
+                cache_dir = SSEP.join([directory, 'data', 'cache'])
+            vmapply(group, features, functions, panel, variable_workers,
+                    cache_dir, feature_cache)
+            vmapply(group, [target], functions, panel, variable_workers,
+                    cache_dir, feature_cache)
+        vcache_info()
+        frame_info()
         # run the analysis, including the model pipeline
         a = Analysis(model, group)
         results = run_analysis(a, lag_period, forecast_period,
-                               leaders, predict_history)
+                               leaders, predict_history, lookback=nbars,
+                               streaming=streaming)
 
     # Run a system
 
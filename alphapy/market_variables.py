@@ -45,16 +45,28 @@
 # Imports
 #
 
+from alphapy.alias import Alias
 from alphapy.alias import get_alias
 from alphapy.frame import Frame
 from alphapy.frame import frame_name
-from alphapy.globals import BSEP, LOFF, ROFF, USEP
+from alphapy.frame import read_frame
+from alphapy.frame import write_frame
+from alphapy.globals import BSEP, LOFF, PSEP, ROFF, SSEP, USEP
+from alphapy.space import Space
 from alphapy.utilities import valid_name
 
+from collections import deque
 from collections import OrderedDict
+from functools import lru_cache
+from functools import wraps
 from importlib import import_module
+import hashlib
+import inspect
 import logging
+import math
+import multiprocessing
 import numpy as np
+import os
 import pandas as pd
 import parser
 import re
@@ -68,6 +80,204 @@ import sys
 logger = logging.getLogger(__name__)
 
 
+#
+# Panel Functions
+#
+# These functions only use column operations (shift, rolling, ewm,
+# and arithmetic), so they can be evaluated on a panel of all the
+# frames in a group at once.
+#
+
+PANEL_FUNCTIONS = ['abovema', 'adx', 'belowma', 'diminus', 'diplus',
+                   'dminus', 'dmplus', 'down', 'dpc', 'ema', 'gap',
+                   'gapbadown', 'gapbaup', 'gapdown', 'gapup', 'gtval',
+                   'higher', 'highest', 'hlrange', 'lower', 'lowest',
+                   'ma', 'maratio', 'net', 'netreturn', 'pchange1',
+                   'pchange2', 'rsi', 'truehigh', 'truelow', 'truerange',
+                   'up', 'upc', 'xmadown', 'xmaup']
+
+
+#
+# Warm-up Periods
+#
+# The number of prior bars that each function needs to produce its
+# first valid value, given its arguments. The bars needed for any
+# column arguments are added separately by ``vlookback``.
+#
+
+WARMUP_PERIODS = {'abovema'   : lambda a: a['p'] - 1,
+                  'adx'       : lambda a: 2 * ewm_warmup(a['p']) + 1,
+                  'belowma'   : lambda a: a['p'] - 1,
+                  'c2max'     : lambda a: 0,
+                  'c2min'     : lambda a: 0,
+                  'diff'      : lambda a: a['n'],
+                  'diminus'   : lambda a: ewm_warmup(a['p']) + 1,
+                  'diplus'    : lambda a: ewm_warmup(a['p']) + 1,
+                  'dminus'    : lambda a: 1,
+                  'dmplus'    : lambda a: 1,
+                  'down'      : lambda a: 0,
+                  'dpc'       : lambda a: 0,
+                  'ema'       : lambda a: ewm_warmup(a['p']),
+                  'gap'       : lambda a: 1,
+                  'gapbadown' : lambda a: 1,
+                  'gapbaup'   : lambda a: 1,
+                  'gapdown'   : lambda a: 1,
+                  'gapup'     : lambda a: 1,
+                  'gtval'     : lambda a: 0,
+                  'gtval0'    : lambda a: 0,
+                  'higher'    : lambda a: a['o'],
+                  'highest'   : lambda a: a['p'] - 1,
+                  'hlrange'   : lambda a: a['p'] - 1,
+                  'lower'     : lambda a: a['o'],
+                  'lowest'    : lambda a: a['p'] - 1,
+                  'ma'        : lambda a: a['p'] - 1,
+                  'maratio'   : lambda a: max(a['p1'], a['p2']) - 1,
+                  'mval'      : lambda a: 0,
+                  'net'       : lambda a: a['o'],
+                  'netreturn' : lambda a: a['o'],
+                  'pchange1'  : lambda a: a['o'],
+                  'pchange2'  : lambda a: 0,
+                  'pval'      : lambda a: 0,
+                  'rindex'    : lambda a: a['p'] - 1,
+                  'rsi'       : lambda a: a['p'],
+                  'truehigh'  : lambda a: 1,
+                  'truelow'   : lambda a: 1,
+                  'truerange' : lambda a: 1,
+                  'up'        : lambda a: 0,
+                  'upc'       : lambda a: 0,
+                  'xmadown'   : lambda a: max(a['pfast'], a['pslow']),
+                  'xmaup'     : lambda a: max(a['pfast'], a['pslow'])}
+
+# The relative weight below which exponential averages are warm.
+
+EWM_TOLERANCE = 1e-6
+
+
+#
+# Parsing Patterns and Caches
+#
+
+LAG_PATTERN = re.compile(r'(^-?[0-9]+$)')
+NAME_PATTERN = re.compile(r'\w+')
+NUMBER_PATTERN = re.compile(r'[-+]?[0-9]*\.?[0-9]+')
+TERM_PATTERN = re.compile(r'(\w+)(?:\[([0-9]+)\])?')
+
+VCACHE_SIZE = 8192
+
+# The intermediate results of each frame being calculated, keyed by
+# the id of the frame. Each entry holds the frame, so that its id is
+# not reused while the entry exists.
+
+VMEMO = {}
+
+
+#
+# Function vcache
+#
+
+def vcache(func):
+    r"""Memoize a VDL function until the aliases or variables change.
+
+    The results are stored in a bounded LRU cache keyed on the
+    arguments. Whenever ``Alias.version`` or ``Variable.version``
+    changes, the cache is cleared before the next call.
+
+    Parameters
+    ----------
+    func : function
+        The function to memoize.
+
+    Returns
+    -------
+    wrapper : function
+        The memoized function with ``cache_info`` and ``cache_clear``.
+
+    Notes
+    -----
+    The cached results are shared between callers, so any returned
+    lists must not be modified.
+
+    """
+    cached = lru_cache(maxsize=VCACHE_SIZE)(func)
+    @wraps(func)
+    def wrapper(*args):
+        state = (Alias.version, Variable.version)
+        if state != wrapper.state:
+            cached.cache_clear()
+            wrapper.state = state
+        return cached(*args)
+    wrapper.state = None
+    wrapper.cache_info = cached.cache_info
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+
+#
+# Function vmemo
+#
+
+def vmemo(func):
+    r"""Memoize a variable function for the frame being calculated.
+
+    While ``vexec_plan`` runs on a frame, the results of the function
+    are stored in ``VMEMO`` for that frame, keyed on the function name
+    and its arguments. The same rolling window requested by different
+    variables is calculated only once. Outside of ``vexec_plan``, the
+    function is called directly.
+
+    Parameters
+    ----------
+    func : function
+        The variable function to memoize, with a dataframe as its
+        first argument.
+
+    Returns
+    -------
+    wrapper : function
+        The memoized function.
+
+    Notes
+    -----
+    The memoized results are shared between callers, so they must
+    not be modified in place.
+
+    """
+    @wraps(func)
+    def wrapper(f, *args, **kwargs):
+        memo = VMEMO.get(id(f))
+        if memo is None:
+            return func(f, *args, **kwargs)
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        results = memo[1]
+        if key not in results:
+            results[key] = func(f, *args, **kwargs)
+        return results[key]
+    return wrapper
+
+
+#
+# Function vcache_info
+#
+
+def vcache_info():
+    r"""Log the hit and miss counters of the VDL caches.
+
+    Returns
+    -------
+    info : collections.OrderedDict
+        The ``cache_info`` of each cached function.
+
+    """
+    funcs = [vparse, vsub, allvars, vtree, valid_name]
+    info = OrderedDict()
+    for func in funcs:
+        ci = func.cache_info()
+        info[func.__name__] = ci
+        logger.info("Cache %s: %d hits, %d misses, %d entries",
+                    func.__name__, ci.hits, ci.misses, ci.currsize)
+    return info
+
+
 #
 # Class Variable
 #
@@ -90,6 +300,8 @@ class Variable(object):
     ----------
     variables : dict
         Class variable for storing all known variables
+    version : int
+        Class variable counting the changes to the variables
 
     Examples
     --------
@@ -102,6 +314,7 @@ class Variable(object):
     # class variable to track all variables
 
     variables = {}
+    version = 0
 
     # function __new__
 
@@ -140,6 +353,7 @@ class Variable(object):
         self.expr = expr;
         # add key with expression
         Variable.variables[name] = self
+        Variable.version += 1
             
     # function __str__
 
@@ -151,6 +365,7 @@ class Variable(object):
 # Function vparse
 #
 
+@vcache
 def vparse(vname):
     r"""Parse a variable name into its respective components.
 
@@ -205,9 +420,7 @@ def vparse(vname):
         # lag is present
         slag = lsplit[1].replace(ROFF, '')
         if len(slag) > 0:
-            lpat = r'(^-?[0-9]+$)'
-            lre = re.compile(lpat)
-            if lre.match(slag):
+            if LAG_PATTERN.match(slag):
                 lag = int(slag)
     # return all components
     return vxlag, root, plist, lag
@@ -217,6 +430,7 @@ def vparse(vname):
 # Function allvars
 #
 
+@vcache
 def allvars(expr):
     r"""Get the list of valid names in the expression.
 
@@ -231,8 +445,7 @@ def allvars(expr):
         List of valid variable names.
 
     """
-    regex = re.compile('\w+')
-    items = regex.findall(expr)
+    items = NAME_PATTERN.findall(expr)
     vlist = []
     for item in items:
         if valid_name(item):
@@ -244,6 +457,7 @@ def allvars(expr):
 # Function vtree
 #
 
+@vcache
 def vtree(vname):
     r"""Get all of the antecedent variables. 
 
@@ -293,6 +507,7 @@ def vtree(vname):
 # Function vsub
 #
 
+@vcache
 def vsub(v, expr):
     r"""Substitute the variable parameters into the expression.
 
@@ -315,20 +530,15 @@ def vsub(v, expr):
         The expression with the new, substituted values.
 
     """
-    # numbers pattern
-    npat = '[-+]?[0-9]*\.?[0-9]+'
-    nreg = re.compile(npat)
     # find all number locations in variable name
-    vnums = nreg.findall(v)
-    viter = nreg.finditer(v)
+    viter = NUMBER_PATTERN.finditer(v)
     vlocs = []
     for match in viter:
         vlocs.append(match.span())
     # find all number locations in expression
     # find all non-number locations as well
     elen = len(expr)
-    enums = nreg.findall(expr)
-    eiter = nreg.finditer(expr)
+    eiter = NUMBER_PATTERN.finditer(expr)
     elocs = []
     enlocs = []
     index = 0
@@ -452,6 +662,512 @@ def vexec(f, v, vfuncs=None):
     return f
 
 
+#
+# Function vplan
+#
+
+def vplan(vs):
+    r"""Compile a list of variables into a single execution plan.
+
+    Each variable is expanded into its antecedents with ``vtree``,
+    and all of the antecedents are merged into one list in dependency
+    order. A variable shared by multiple features, such as ``cma_50``
+    for both ``abovema_50`` and ``madelta_50``, appears only once in
+    the plan, so it is parsed and computed once per frame.
+
+    Parameters
+    ----------
+    vs : list
+        The list of variables to compile.
+
+    Returns
+    -------
+    plan : list
+        The unique variables in the order of execution.
+    nshared : int
+        The number of variable nodes shared across the features.
+
+    Examples
+    --------
+
+    >>> plan, nshared = vplan(['abovema_50', 'madelta_50'])
+
+    """
+    plan = OrderedDict()
+    nnodes = 0
+    for v in vs:
+        allv = vtree(v)
+        nnodes += len(allv)
+        for av in allv:
+            plan[av] = True
+    plan = list(plan.keys())
+    nshared = nnodes - len(plan)
+    logger.info("Variable Plan: %d features, %d nodes, %d shared",
+                len(vs), len(plan), nshared)
+    return plan, nshared
+
+
+#
+# Function vexec_plan
+#
+
+def vexec_plan(f, plan, vfuncs=None):
+    r"""Execute a compiled variable plan on a dataframe.
+
+    Parameters
+    ----------
+    f : pandas.DataFrame
+        Dataframe to contain the new variables.
+    plan : list
+        The ordered variables from ``vplan``.
+    vfuncs : dict, optional
+        Dictionary of external modules and functions.
+
+    Returns
+    -------
+    f : pandas.DataFrame
+        Dataframe with the new variables.
+
+    Notes
+    -----
+    The functions decorated with ``vmemo`` share their results for
+    the duration of the plan, and the results are freed afterward.
+    The results are keyed on the frame passed in, so a variable that
+    returns a new frame ends the sharing for the rest of the plan.
+
+    """
+    key = id(f)
+    VMEMO[key] = (f, {})
+    try:
+        for v in plan:
+            f = vexec(f, v, vfuncs)
+    finally:
+        # vexec may return a new frame, so free the memo by its original key
+        _, results = VMEMO.pop(key, (None, {}))
+        logger.debug("Freed %d intermediate results", len(results))
+    return f
+
+
+#
+# Function ewm_warmup
+#
+
+def ewm_warmup(p, tol=EWM_TOLERANCE):
+    r"""Get the warm-up period of an exponential moving average.
+
+    Parameters
+    ----------
+    p : int
+        The span of the exponential moving average.
+    tol : float, optional
+        The relative weight of the bars before the warm-up period.
+
+    Returns
+    -------
+    nbars : int
+        The number of bars until the initial value has decayed
+        below ``tol``.
+
+    Notes
+    -----
+    With a span ``p``, the smoothing factor is ``alpha = 2 / (p + 1)``,
+    and the weight of a bar ``n`` bars back is ``(1 - alpha) ** n``.
+
+    """
+    alpha = 2.0 / (p + 1.0)
+    nbars = int(math.ceil(math.log(tol) / math.log(1.0 - alpha)))
+    return nbars
+
+
+#
+# Function vlookback
+#
+
+def vlookback(v):
+    r"""Get the number of prior bars needed to calculate a variable.
+
+    Parameters
+    ----------
+    v : str or alphapy.Variable
+        The name of the variable, a variable expression, or a
+        ``Variable`` object.
+
+    Returns
+    -------
+    nbars : int
+        The number of bars before the first valid value of ``v``,
+        or ``None`` if the lookback cannot be determined, e.g., for
+        external functions.
+
+    Other Parameters
+    ----------------
+    Variable.variables : dict
+        Global dictionary of variables
+
+    Notes
+    -----
+    The lookback of a function is its warm-up period in
+    ``WARMUP_PERIODS`` plus the lookback of its column parameters.
+    The lookback of an expression is the maximum lookback of its
+    terms, where each term adds its offset, e.g., ``close[1]``.
+
+    Examples
+    --------
+
+    >>> vlookback('ma_close_50')
+    # 49
+    >>> vlookback('rsi_14[2]')
+    # 16
+    >>> vlookback('close > cma_50[1]')
+    # 50
+
+    """
+    if isinstance(v, Variable):
+        return vlookback(v.expr)
+    if not valid_name(v.split(LOFF)[0]):
+        # the lookback of an expression is the maximum of its terms
+        nbars = 0
+        for term, offset in TERM_PATTERN.findall(v):
+            if valid_name(term):
+                vbars = vlookback(term)
+                if vbars is None:
+                    return None
+                if offset:
+                    vbars += int(offset)
+                nbars = max(nbars, vbars)
+        return nbars
+    vxlag, root, plist, lag = vparse(v)
+    if root in Variable.variables:
+        expr = vsub(vxlag, Variable.variables[root].expr)
+        nbars = vlookback(expr)
+        if nbars is None:
+            return None
+    elif root in WARMUP_PERIODS:
+        # bind the parameters to the function arguments
+        func = getattr(sys.modules[__name__], root)
+        fparams = list(inspect.signature(func).parameters.values())[1:]
+        args = {}
+        for i, fp in enumerate(fparams):
+            if i < len(plist):
+                p = plist[i]
+                try:
+                    args[fp.name] = int(p)
+                except:
+                    try:
+                        args[fp.name] = float(p)
+                    except:
+                        args[fp.name] = p
+            else:
+                args[fp.name] = fp.default
+        try:
+            nbars = int(WARMUP_PERIODS[root](args))
+        except:
+            logger.info("Invalid parameters for lookback: %s", v)
+            return None
+        # add the lookback of any column arguments
+        cbars = 0
+        for p in plist:
+            if valid_name(p):
+                vbars = vlookback(p)
+                if vbars is None:
+                    return None
+                cbars = max(cbars, vbars)
+        nbars += cbars
+    elif plist or hasattr(sys.modules[__name__], root):
+        # unknown function
+        return None
+    else:
+        # base column
+        nbars = 0
+    return nbars + lag
+
+
+#
+# Function vrelease
+#
+
+def vrelease(f, columns, vs):
+    r"""Release the intermediate columns of a dataframe.
+
+    While a plan is executed, the antecedents of each variable and
+    the helper columns of the variable functions, e.g., ``pval`` or
+    ``close[1]``, are stored in the dataframe. Afterward, only the
+    requested variables are kept.
+
+    Parameters
+    ----------
+    f : pandas.DataFrame
+        Dataframe with the new variables.
+    columns : list
+        The columns of the dataframe before executing the plan.
+    vs : list
+        The requested variables.
+
+    Returns
+    -------
+    nbytes : int
+        The number of bytes released.
+
+    """
+    keep = set(columns) | set(vs)
+    scratch = [c for c in f.columns if c not in keep]
+    nbytes = int(sum([f[c].values.nbytes for c in scratch]))
+    f.drop(scratch, axis=1, inplace=True)
+    return nbytes
+
+
+#
+# Function vupdate
+#
+
+def vupdate(f, fs, vs, plan, vfuncs=None):
+    r"""Update stored variables with the new bars of a dataframe.
+
+    Only the new bars of ``f`` after the last bar of ``fs`` are
+    calculated, along with the warm-up bars from ``vlookback`` that
+    the plan needs before the first new bar.
+
+    Parameters
+    ----------
+    f : pandas.DataFrame
+        Dataframe with the latest bars.
+    fs : pandas.DataFrame
+        Dataframe with the stored variables.
+    vs : list
+        The requested variables.
+    plan : list
+        The ordered variables from ``vplan``.
+    vfuncs : dict, optional
+        Dictionary of external modules and functions.
+
+    Returns
+    -------
+    fu : pandas.DataFrame
+        The stored dataframe with the new bars, or ``None`` if the
+        stored dataframe cannot be updated and the full history
+        must be recalculated.
+
+    Notes
+    -----
+    The exponential moving averages are warmed up to within
+    ``EWM_TOLERANCE``, so their updated values may differ from
+    a full calculation by that relative amount.
+
+    """
+    if fs is None or fs.empty:
+        return None
+    # the last stored bar must match the latest data
+    last_bar = fs.index[-1]
+    if last_bar not in f.index:
+        logger.info("Last stored bar %s not found", last_bar)
+        return None
+    fcols = [c for c in f.columns if c in fs.columns]
+    if not np.allclose(f.loc[last_bar, fcols].astype(float),
+                       fs.loc[last_bar, fcols].astype(float),
+                       equal_nan=True):
+        logger.info("Stored bars do not match the latest data")
+        return None
+    # get the number of new bars and the warm-up bars
+    nbars = len(f) - f.index.get_loc(last_bar) - 1
+    if nbars == 0:
+        return fs
+    lookbacks = [vlookback(v) for v in plan]
+    if None in lookbacks:
+        logger.info("Lookback is unknown for the plan")
+        return None
+    nwarm = max(lookbacks + [0])
+    # calculate the plan for the warm-up and new bars only
+    nstart = max(len(fs) - nwarm, 0)
+    ft = pd.concat([fs[fcols].iloc[nstart:], f[fcols].iloc[-nbars:]])
+    vexec_plan(ft, plan, vfuncs)
+    vrelease(ft, fcols, vs)
+    # all of the variables must be stored
+    if set(ft.columns) != set(fs.columns):
+        logger.info("Stored variables do not match the plan")
+        return None
+    fcols = list(fs.columns)
+    fu = pd.concat([fs, ft[fcols].iloc[-nbars:]])
+    logger.info("Updated %d bars with %d warm-up bars", nbars, nwarm)
+    return fu
+
+
+#
+# Class Panel
+#
+
+class Panel(object):
+    """Align the frames of a group into panels of time by symbol.
+
+    Each column is stored as a single dataframe with one column per
+    symbol. Frames of different lengths are aligned on their last
+    row and padded with NaN at the beginning, so that every rolling,
+    shift, or exponential calculation on the panel yields the same
+    values as the calculation on each individual frame. New columns
+    are reset to NaN in the padding when they are stored, and their
+    original types are restored when they are scattered.
+
+    Parameters
+    ----------
+    frames : collections.OrderedDict
+        The dataframes to align, keyed by symbol.
+
+    Attributes
+    ----------
+    names : list
+        The symbols in the panel.
+    lengths : list
+        The number of rows of each frame.
+    nrows : int
+        The number of rows in the panel.
+    valid : pandas.DataFrame
+        The mask of rows that belong to each frame.
+    fcolumns : list
+        The columns shared by all of the frames.
+    panels : collections.OrderedDict
+        The panel for each column, gathered on first access.
+    dtypes : dict
+        The type of each new column before masking the padding.
+
+    """
+
+    # __init__
+
+    def __init__(self,
+                 frames):
+        # code
+        self.frames = frames
+        self.names = list(frames.keys())
+        self.lengths = [len(frames[n]) for n in self.names]
+        self.nrows = max(self.lengths)
+        self.index = pd.RangeIndex(self.nrows)
+        fcolumns = None
+        for n in self.names:
+            fcols = set(frames[n].columns)
+            fcolumns = fcols if fcolumns is None else fcolumns & fcols
+        self.fcolumns = [c for c in frames[self.names[0]].columns if c in fcolumns]
+        starts = np.array([self.nrows - n for n in self.lengths])
+        valid = np.arange(self.nrows)[:, None] >= starts[None, :]
+        self.valid = pd.DataFrame(valid, index=self.index, columns=self.names)
+        self.panels = OrderedDict()
+        self.dtypes = {}
+
+    # __getitem__
+
+    def __getitem__(self, c):
+        if c not in self.panels:
+            self.panels[c] = self.gather(c)
+        return self.panels[c]
+
+    # __setitem__
+
+    def __setitem__(self, c, values):
+        # keep the padding empty so that fills do not leak into windows
+        self.dtypes[c] = values.dtypes
+        self.panels[c] = values.where(self.valid)
+
+    # columns
+
+    @property
+    def columns(self):
+        new_columns = [c for c in self.panels if c not in self.fcolumns]
+        return self.fcolumns + new_columns
+
+    # function gather
+
+    def gather(self, c):
+        r"""Gather a column from all of the frames into one panel.
+
+        Parameters
+        ----------
+        c : str
+            Name of the column in each frame.
+
+        Returns
+        -------
+        panel : pandas.DataFrame
+            The (time x symbol) panel for the column ``c``.
+
+        """
+        values = np.full((self.nrows, len(self.names)), np.nan)
+        for i, n in enumerate(self.names):
+            values[self.nrows - self.lengths[i]:, i] = self.frames[n][c].values
+        panel = pd.DataFrame(values, index=self.index, columns=self.names)
+        return panel
+
+    # function scatter
+
+    def scatter(self):
+        r"""Scatter the new panel columns back to the frames.
+
+        Returns
+        -------
+        None : None
+
+        """
+        new_columns = [c for c in self.panels if c not in self.fcolumns]
+        for i, n in enumerate(self.names):
+            f = self.frames[n]
+            start = self.nrows - self.lengths[i]
+            for c in new_columns:
+                values = self.panels[c].iloc[start:, i]
+                if c in self.dtypes:
+                    values = values.astype(self.dtypes[c].iloc[i])
+                f[c] = values.values
+
+
+#
+# Function vpanel_plan
+#
+
+def vpanel_plan(plan, columns, vfuncs=None):
+    r"""Split a variable plan into panel and frame variables.
+
+    A variable can be evaluated on a ``Panel`` if its function is
+    one of the ``PANEL_FUNCTIONS`` and all of its parameters are
+    columns that are already available in the panel.
+
+    Parameters
+    ----------
+    plan : list
+        The ordered variables from ``vplan``.
+    columns : list
+        The columns that are available in the panel.
+    vfuncs : dict, optional
+        Dictionary of external modules and functions.
+
+    Returns
+    -------
+    pplan : list
+        The ordered variables to evaluate on the panel.
+    fplan : list
+        The ordered variables to evaluate on each frame.
+
+    """
+    ext_funcs = []
+    if vfuncs:
+        for m in vfuncs:
+            ext_funcs.extend(vfuncs[m])
+    pcols = set(columns)
+    pplan = []
+    fplan = []
+    for v in plan:
+        vxlag, root, plist, lag = vparse(v)
+        if root in Variable.variables or root in ext_funcs:
+            panel_var = False
+        elif vxlag in pcols:
+            panel_var = True
+        elif root in PANEL_FUNCTIONS:
+            panel_var = all([p in pcols for p in plist if valid_name(p)])
+        else:
+            panel_var = False
+        if panel_var:
+            pplan.append(v)
+            pcols.update([v, vxlag])
+        else:
+            fplan.append(v)
+    return pplan, fplan
+
+
 #
 # Function vapply
 #
@@ -492,20 +1208,301 @@ def vapply(group, vname, vfuncs=None):
         if fname in Frame.frames:
             f = Frame.frames[fname].df
             if not f.empty:
-                for v in allv:
-                    logger.debug("Applying variable %s to %s", v, g)
-                    f = vexec(f, v, vfuncs)
+                logger.debug("Applying variable %s to %s", vname, g)
+                fcols = list(f.columns)
+                f = vexec_plan(f, allv, vfuncs)
+                vrelease(f, fcols, [vname])
             else:
                 logger.debug("Frame for %s is empty", g)
         else:
             logger.debug("Frame not found: %s", fname)
                 
 
+#
+# Function vsource
+#
+
+@lru_cache(maxsize=None)
+def vsource(module):
+    r"""Get the fingerprint of the source code of a module.
+
+    Parameters
+    ----------
+    module : str
+        The name of the module containing variable functions.
+
+    Returns
+    -------
+    digest : str
+        The SHA-1 digest of the module source.
+
+    """
+    source = inspect.getsource(import_module(module))
+    digest = hashlib.sha1(source.encode('utf-8')).hexdigest()
+    return digest
+
+
+#
+# Function vdisk_key
+#
+
+def vdisk_key(f, plan, vs, vfuncs=None):
+    r"""Get the cache key of a variable plan applied to a dataframe.
+
+    The key combines the fingerprint of the data in ``f``, the
+    requested variables, the definition of every variable in the
+    ``plan`` with its substituted expression, and the source of the
+    module for every function.
+
+    Parameters
+    ----------
+    f : pandas.DataFrame
+        Dataframe before applying the plan.
+    plan : list
+        The ordered variables from ``vplan``.
+    vs : list
+        The requested variables, which are the only new columns
+        kept by ``vrelease``.
+    vfuncs : dict, optional
+        Dictionary of external modules and functions.
+
+    Returns
+    -------
+    key : str
+        The SHA-1 digest identifying the new columns.
+
+    """
+    hasher = hashlib.sha1()
+    # fingerprint the data
+    hasher.update(repr(list(f.columns)).encode('utf-8'))
+    hasher.update(pd.util.hash_pandas_object(f, index=True).values.tobytes())
+    # add the requested variables
+    hasher.update(repr(sorted(set(vs))).encode('utf-8'))
+    # add the definition of each variable
+    for v in plan:
+        vxlag, root, plist, lag = vparse(v)
+        if root in Variable.variables:
+            vdef = vsub(vxlag, Variable.variables[root].expr)
+        else:
+            module = __name__
+            if vfuncs:
+                for m in vfuncs:
+                    if root in vfuncs[m]:
+                        module = m
+                        break
+            try:
+                vdef = vsource(module)
+            except:
+                vdef = module
+        hasher.update(BSEP.join([v, vdef]).encode('utf-8'))
+    key = hasher.hexdigest()
+    return key
+
+
+#
+# Function vdisk_load
+#
+
+def vdisk_load(f, directory, key):
+    r"""Load the cached columns of a dataframe.
+
+    Parameters
+    ----------
+    f : pandas.DataFrame
+        Dataframe before applying the plan.
+    directory : str
+        Directory of the cache.
+    key : str
+        The cache key from ``vdisk_key``.
+
+    Returns
+    -------
+    fc : pandas.DataFrame
+        Dataframe with the cached columns, or ``None`` if the
+        columns were not found in the cache.
+
+    """
+    file_all = SSEP.join([directory, PSEP.join([key, 'npz'])])
+    if not os.path.isfile(file_all):
+        return None
+    try:
+        with np.load(file_all) as data:
+            columns = OrderedDict()
+            for i, c in enumerate(data['columns']):
+                columns[str(c)] = data[str(i)]
+        fc = pd.DataFrame(columns, index=f.index)
+    except:
+        logger.info("Could not load cached columns from %s", file_all)
+        return None
+    # mark the entry as recently used
+    os.utime(file_all, None)
+    return fc
+
+
+#
+# Function vdisk_save
+#
+
+def vdisk_save(f, directory, key, columns):
+    r"""Save the new columns of a dataframe to the cache.
+
+    Parameters
+    ----------
+    f : pandas.DataFrame
+        Dataframe with the new columns.
+    directory : str
+        Directory of the cache.
+    key : str
+        The cache key from ``vdisk_key``.
+    columns : list
+        The names of the new columns.
+
+    Returns
+    -------
+    None : None
+
+    """
+    if any([f[c].dtype == object for c in columns]):
+        logger.info("Cannot cache columns of type object")
+        return
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    arrays = OrderedDict()
+    arrays['columns'] = np.array(columns, dtype=str)
+    for i, c in enumerate(columns):
+        arrays[str(i)] = f[c].values
+    file_tmp = SSEP.join([directory, PSEP.join([key, 'tmp', 'npz'])])
+    file_all = SSEP.join([directory, PSEP.join([key, 'npz'])])
+    np.savez(file_tmp, **arrays)
+    os.replace(file_tmp, file_all)
+
+
+#
+# Function vdisk_evict
+#
+
+def vdisk_evict(directory, max_size):
+    r"""Remove the least recently used entries from the cache.
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the cache.
+    max_size : float
+        The maximum size of the cache in megabytes.
+
+    Returns
+    -------
+    None : None
+
+    """
+    if not os.path.exists(directory):
+        return
+    entries = []
+    for file_only in os.listdir(directory):
+        if file_only.endswith('.npz'):
+            file_all = SSEP.join([directory, file_only])
+            fstat = os.stat(file_all)
+            entries.append((fstat.st_mtime, fstat.st_size, file_all))
+    total_size = sum([e[1] for e in entries])
+    max_bytes = max_size * 1024 * 1024
+    for mtime, size, file_all in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        logger.info("Evicting cache entry %s", file_all)
+        os.remove(file_all)
+        total_size -= size
+
+
+#
+# Function vexec_frame
+#
+
+def vexec_frame(args):
+    r"""Execute a variable plan on one frame.
+
+    This is the task for each worker of the process pool in
+    ``vmapply``. Without a memory budget, the worker reads the frame
+    that it inherited from the parent process, so only the name of
+    the frame is sent. With a memory budget, the parent sends the
+    frame itself, because the frame may be spilled in the parent, and
+    the worker must not reload or spill any frames of the registry.
+    Only the requested new columns are sent back.
+
+    Parameters
+    ----------
+    args : tuple
+        The frame name, the frame or ``None``, the variable plan, the
+        dictionary of external modules and functions, and the list of
+        requested variables.
+
+    Returns
+    -------
+    fname : str
+        The name of the frame.
+    new_columns : collections.OrderedDict
+        The array of values for each requested new column.
+    nbytes : int
+        The number of bytes of intermediate columns released.
+
+    """
+    fname, f, plan, vfuncs, vs = args
+    if f is None:
+        f = Frame.frames[fname].df
+    fcols = list(f.columns)
+    vexec_plan(f, plan, vfuncs)
+    nbytes = vrelease(f, fcols, vs)
+    fset = set(fcols)
+    new_columns = OrderedDict()
+    for c in f.columns:
+        if c not in fset:
+            new_columns[c] = f[c].values
+    return fname, new_columns, nbytes
+
+
+#
+# Function vstore
+#
+
+def vstore(fname, f, fcols, vs, cache_dir=None, key=None):
+    r"""Store a frame with its new variables in ``Frame.frames``.
+
+    Parameters
+    ----------
+    fname : str
+        The name of the frame.
+    f : pandas.DataFrame
+        Dataframe with the new variables.
+    fcols : list
+        The columns of the dataframe before applying the variables.
+    vs : list
+        The requested variables.
+    cache_dir : str, optional
+        If specified, the directory for caching the new columns.
+    key : str, optional
+        The cache key from ``vdisk_key``.
+
+    Returns
+    -------
+    nbytes : int
+        The number of bytes of intermediate columns released.
+
+    """
+    nbytes = vrelease(f, fcols, vs)
+    if cache_dir:
+        fset = set(fcols)
+        new_columns = [c for c in f.columns if c not in fset]
+        vdisk_save(f, cache_dir, key, new_columns)
+    Frame.frames[fname].df = f
+    return nbytes
+
+
 #
 # Function vmapply
 #
 
-def vmapply(group, vs, vfuncs=None):
+def vmapply(group, vs, vfuncs=None, panel=False, n_jobs=1,
+            cache_dir=None, cache_size=1024):
     r"""Apply multiple variables to multiple dataframes.
 
     Parameters
@@ -516,21 +1513,214 @@ def vmapply(group, vs, vfuncs=None):
         The list of variables to apply to the ``group``.
     vfuncs : dict, optional
         Dictionary of external modules and functions.
+    panel : bool, optional
+        If ``True``, then evaluate the ``PANEL_FUNCTIONS`` once for
+        all of the group members on a ``Panel``, and evaluate the
+        remaining variables on each frame.
+    n_jobs : int, optional
+        The number of worker processes for applying the variables to
+        the frames [-1 for all cores].
+    cache_dir : str, optional
+        If specified, the directory for caching the new columns of
+        each frame, so that they are loaded instead of calculated
+        when the same data and variables are applied again.
+    cache_size : float, optional
+        The maximum size of the cache in megabytes.
 
     Returns
     -------
     None : None
 
+    Other Parameters
+    ----------------
+    Frame.frames : dict
+        Global dictionary of dataframes
+
+    Notes
+    -----
+    The variables are compiled into one plan with ``vplan``, so the
+    dependency tree is resolved once for the whole group instead of
+    once per variable, and shared antecedents are computed only once
+    per frame.
+
+    The process pool requires the ``fork`` start method, so that the
+    workers share the frames with the parent instead of receiving
+    pickled copies. Otherwise, the frames are processed serially.
+
+    Only the requested variables are kept in the frames. Their
+    antecedents and any helper columns are released with ``vrelease``
+    after the plan is executed.
+
+    The frames are read from ``Frame.frames`` and stored again one at
+    a time, so that a memory budget is enforced while the variables
+    are applied. With a process pool, at most ``n_jobs`` frames are
+    in flight. The panel variables are the exception: all of the
+    frames are held while the ``Panel`` is evaluated, and then the
+    frames with their panel columns are stored before any frame is
+    processed.
+
     See Also
     --------
     vmunapply
 
     """
-    for v in vs:
-        logger.info("Applying variable: %s", v)
-        vapply(group, v, vfuncs)
+    logger.info("Applying variables: %s", vs)
+    # compile all the variables and their antecedents
+    plan, nshared = vplan(vs)
+    # get the names of all frames to apply variables
+    gnames = [item.lower() for item in group.members]
+    fnames = []
+    for g in gnames:
+        fname = frame_name(g, group.space)
+        if fname in Frame.frames:
+            if not Frame.frames[fname].df.empty:
+                fnames.append(fname)
+            else:
+                logger.debug("Frame for %s is empty", g)
+        else:
+            logger.debug("Frame not found: %s", fname)
+    # record the original columns and load any cached columns
+    fcols = OrderedDict()
+    fkeys = OrderedDict()
+    pending = []
+    for fname in fnames:
+        f = Frame.frames[fname].df
+        fcols[fname] = list(f.columns)
+        if cache_dir:
+            fkeys[fname] = vdisk_key(f, plan, vs, vfuncs)
+            fc = vdisk_load(f, cache_dir, fkeys[fname])
+            if fc is not None:
+                Frame.frames[fname].df = pd.concat([f, fc], axis=1)
+                continue
+        pending.append(fname)
+    f = None
+    if cache_dir:
+        logger.info("Cached Frames: %d of %d", len(fnames) - len(pending),
+                    len(fnames))
+    # evaluate the panel variables for all frames at once
+    fplan = plan
+    if panel and pending:
+        frames = OrderedDict()
+        for fname in pending:
+            frames[fname] = Frame.frames[fname].df
+        pf = Panel(frames)
+        pplan, fplan = vpanel_plan(plan, pf.columns, vfuncs)
+        logger.info("Panel Plan: %d panel variables, %d frame variables",
+                    len(pplan), len(fplan))
+        vexec_plan(pf, pplan, vfuncs)
+        pf.scatter()
+        # store the panel columns before any frame is spilled again
+        for fname in pending:
+            Frame.frames[fname].df = frames[fname]
+        frames = pf = None
+    # apply the remaining plan to each frame
+    if n_jobs < 0:
+        n_jobs = multiprocessing.cpu_count()
+    n_jobs = min(n_jobs, len(pending))
+    if n_jobs > 1 and multiprocessing.get_start_method() != 'fork':
+        logger.info("Process pool requires fork, applying plan serially")
+        n_jobs = 1
+    nbytes = 0
+    if n_jobs > 1 and fplan:
+        logger.info("Applying plan with %d processes", n_jobs)
+        pool = multiprocessing.Pool(n_jobs)
+        try:
+            results = deque()
+            for fname in pending:
+                f = Frame.frames[fname].df if Frame.budget > 0 else None
+                task = (fname, f, fplan, vfuncs, vs)
+                results.append(pool.apply_async(vexec_frame, (task,)))
+                f = task = None
+                while len(results) > n_jobs or (results and fname == pending[-1]):
+                    rname, new_columns, rbytes = results.popleft().get()
+                    f = Frame.frames[rname].df
+                    f = pd.concat([f, pd.DataFrame(new_columns, index=f.index)], axis=1)
+                    nbytes += rbytes + vstore(rname, f, fcols[rname], vs,
+                                              cache_dir, fkeys.get(rname))
+                    f = None
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for fname in pending:
+            logger.debug("Applying plan to %s", fname)
+            f = Frame.frames[fname].df
+            vexec_plan(f, fplan, vfuncs)
+            nbytes += vstore(fname, f, fcols[fname], vs,
+                             cache_dir, fkeys.get(fname))
+            f = None
+    if pending:
+        logger.info("Released %d bytes of intermediate columns per frame",
+                    nbytes // len(pending))
+    if cache_dir:
+        vdisk_evict(cache_dir, cache_size)
+
+
+#
+# Function vmupdate
+#
+
+def vmupdate(group, vs, directory, extension, separator, vfuncs=None):
+    r"""Apply multiple variables incrementally from a feature store.
+
+    Each frame of the ``group`` is matched with its stored frame in
+    the ``features`` schema. If the stored frame can be updated with
+    ``vupdate``, then only the new bars are calculated; otherwise,
+    all of the variables are applied to the frame. In either case,
+    the frame is replaced and written back to the store.
+
+    Parameters
+    ----------
+    group : alphapy.Group
+        The input group.
+    vs : list
+        The list of variables to apply to the ``group``.
+    directory : str
+        Directory of the feature store.
+    extension : str
+        File name extension, e.g., ``csv``.
+    separator : str
+        The delimiter between fields in the file.
+    vfuncs : dict, optional
+        Dictionary of external modules and functions.
+
+    Returns
+    -------
+    None : None
+
+    Other Parameters
+    ----------------
+    Frame.frames : dict
+        Global dictionary of dataframes
+
+    """
+    logger.info("Updating variables: %s", vs)
+    plan, nshared = vplan(vs)
+    gspace = group.space
+    fspace = Space(gspace.subject, 'features', gspace.fractal)
+    gnames = [item.lower() for item in group.members]
+    for g in gnames:
+        fname = frame_name(g, gspace)
+        if fname not in Frame.frames or Frame.frames[fname].df.empty:
+            logger.debug("Frame not found: %s", fname)
+            continue
+        f = Frame.frames[fname].df
+        # read the stored frame
+        sname = frame_name(g, fspace)
+        fs = read_frame(directory, sname, extension, separator, index_col=0)
+        if fs is not None:
+            fs.index = pd.to_datetime(fs.index)
+            fs.index.name = f.index.name
+        fu = vupdate(f, fs, vs, plan, vfuncs)
+        if fu is None:
+            logger.info("Applying all variables to %s", g)
+            fcols = list(f.columns)
+            fu = vexec_plan(f, plan, vfuncs)
+            vrelease(fu, fcols, vs)
+        Frame.frames[fname].df = fu
+        write_frame(fu, directory, sname, extension, separator, index=True)
+
 
-        
 #
 # Function vunapply
 #
@@ -649,11 +1839,17 @@ def c2max(f, c1, c2):
 
     Returns
     -------
-    max_val : float
+    max_val : pandas.Series (float)
         The maximum value of the two columns.
 
+    Notes
+    -----
+    The comparison is vectorized over all rows. As with the builtin
+    ``max``, the value of ``c1`` is kept unless ``c2`` is greater,
+    so a missing value in ``c1`` propagates to the result.
+
     """
-    max_val = max(f[c1], f[c2])
+    max_val = f[c2].where(f[c2] > f[c1], f[c1])
     return max_val
 
 
@@ -675,11 +1871,17 @@ def c2min(f, c1, c2):
 
     Returns
     -------
-    min_val : float
+    min_val : pandas.Series (float)
         The minimum value of the two columns.
 
+    Notes
+    -----
+    The comparison is vectorized over all rows. As with the builtin
+    ``min``, the value of ``c1`` is kept unless ``c2`` is smaller,
+    so a missing value in ``c1`` propagates to the result.
+
     """
-    min_val = min(f[c1], f[c2])
+    min_val = f[c2].where(f[c2] < f[c1], f[c1])
     return min_val
 
 
@@ -840,6 +2042,7 @@ def higher(f, c, o = 1):
 # Function highest
 #
 
+@vmemo
 def highest(f, c, p = 20):
     r"""Calculate the highest value on a rolling basis.
 
@@ -893,6 +2096,7 @@ def lower(f, c, o = 1):
 # Function lowest
 #
 
+@vmemo
 def lowest(f, c, p = 20):
     r"""Calculate the lowest value on a rolling basis.
 
@@ -918,6 +2122,7 @@ def lowest(f, c, p = 20):
 # Function ma
 #
 
+@vmemo
 def ma(f, c, p = 20):
     r"""Calculate the mean on a rolling basis.
 
@@ -952,6 +2157,7 @@ def ma(f, c, p = 20):
 # Function ema
 #
 
+@vmemo
 def ema(f, c, p = 20):
     r"""Calculate the mean on a rolling basis.
 
@@ -1014,6 +2220,7 @@ def maratio(f, c, p1 = 1, p2 = 10):
 # Function net
 #
 
+@vmemo
 def net(f, c='close', o = 1):
     r"""Calculate the net change of a given column.
 
@@ -1194,6 +2401,7 @@ def gapbaup(f):
 # Function truehigh
 #
 
+@vmemo
 def truehigh(f):
     r"""Calculate the *True High* value.
 
@@ -1217,7 +2425,7 @@ def truehigh(f):
     c1 = 'low[1]'
     vexec(f, c1)
     c2 = 'high'
-    new_column = f.apply(c2max, axis=1, args=[c1, c2])
+    new_column = c2max(f, c1, c2)
     return new_column
 
 
@@ -1225,6 +2433,7 @@ def truehigh(f):
 # Function truelow
 #
 
+@vmemo
 def truelow(f):
     r"""Calculate the *True Low* value.
 
@@ -1246,7 +2455,7 @@ def truelow(f):
     c1 = 'high[1]'
     vexec(f, c1)
     c2 = 'low'
-    new_column = f.apply(c2min, axis=1, args=[c1, c2])
+    new_column = c2min(f, c1, c2)
     return new_column
 
 
@@ -1254,6 +2463,7 @@ def truelow(f):
 # Function truerange
 #
 
+@vmemo
 def truerange(f):
     r"""Calculate the *True Range* value.
 
@@ -1394,11 +2604,11 @@ def mval(f, c):
 
     Returns
     -------
-    new_val : float
-        Negative value or zero.
+    new_val : pandas.Series (float)
+        Negative values or zero.
 
     """
-    new_val = -f[c] if f[c] < 0 else 0
+    new_val = (-f[c]).where(f[c] < 0, 0.0)
     return new_val
 
 
@@ -1418,11 +2628,11 @@ def pval(f, c):
 
     Returns
     -------
-    new_val : float
-        Positive value or zero.
+    new_val : pandas.Series (float)
+        Positive values or zero.
 
     """
-    new_val = f[c] if f[c] > 0 else 0
+    new_val = f[c].where(f[c] > 0, 0.0)
     return new_val
 
 
@@ -1446,7 +2656,7 @@ def dpc(f, c):
         The array containing the new feature.
 
     """
-    new_column = f.apply(mval, axis=1, args=[c])
+    new_column = mval(f, c)
     return new_column
 
 
@@ -1470,7 +2680,7 @@ def upc(f, c):
         The array containing the new feature.
 
     """
-    new_column = f.apply(pval, axis=1, args=[c])
+    new_column = pval(f, c)
     return new_column
 
 
@@ -1560,14 +2770,11 @@ def gtval0(f, c1, c2):
 
     Returns
     -------
-    new_val : float
-        A positive value or zero.
+    new_val : pandas.Series (float)
+        Positive values or zero.
 
     """
-    if f[c1] > f[c2] and f[c1] > 0:
-        new_val = f[c1]
-    else:
-        new_val = 0
+    new_val = f[c1].where((f[c1] > f[c2]) & (f[c1] > 0), 0.0)
     return new_val
 
 
@@ -1575,6 +2782,7 @@ def gtval0(f, c1, c2):
 # Function dmplus
 #
 
+@vmemo
 def dmplus(f):
     r"""Calculate the Plus Directional Movement (+DM).
 
@@ -1603,7 +2811,7 @@ def dmplus(f):
     f[c1] = net(f, 'high')
     c2 = 'downmove'
     f[c2] = -net(f, 'low')
-    new_column = f.apply(gtval0, axis=1, args=[c1, c2])
+    new_column = gtval0(f, c1, c2)
     return new_column
 
 
@@ -1611,6 +2819,7 @@ def dmplus(f):
 # Function dminus
 #
 
+@vmemo
 def dminus(f):
     r"""Calculate the Minus Directional Movement (-DM).
 
@@ -1637,7 +2846,7 @@ def dminus(f):
     f[c1] = -net(f, 'low')
     c2 = 'upmove'
     f[c2] = net(f, 'high')
-    new_column = f.apply(gtval0, axis=1, args=[c1, c2])
+    new_column = gtval0(f, c1, c2)
     return new_column
 
 
@@ -1713,7 +2922,7 @@ def diminus(f, p = 14):
     vexec(f, atr)
     dmm = 'dmminus'
     f[dmm] = dminus(f)
-    new_column = 100 * dminus(f).ewm(span=p).mean() / f[atr]
+    new_column = 100 * f[dmm].ewm(span=p).mean() / f[atr]
     return new_column
 
 
@@ -26,12 +26,14 @@
 # Imports
 #
 
+from alphapy.estimators import dense_input
 from alphapy.estimators import scorers
 from alphapy.estimators import xgb_score_map
 from alphapy.features import feature_scorers
 from alphapy.frame import read_frame
 from alphapy.frame import write_frame
 from alphapy.globals import Encoders
+from alphapy.globals import FEATURE_CACHE_EXCLUDE
 from alphapy.globals import ModelType
 from alphapy.globals import Objective
 from alphapy.globals import Partition, datasets
@@ -43,10 +45,15 @@ from alphapy.utilities import most_recent_file
 
 from copy import copy
 from datetime import datetime
+import hashlib
+import json
 from keras.models import load_model
 import logging
 import numpy as np
+import os
 import pandas as pd
+from scipy import sparse
+import shutil
 from sklearn.calibration import CalibratedClassifierCV
 from sklearn.externals import joblib
 from sklearn.linear_model import LogisticRegression
@@ -226,8 +233,20 @@ def get_model_config():
 
     # Section: data
 
+    try:
+        specs['chunksize'] = cfg['data']['chunksize']
+    except:
+        specs['chunksize'] = None
     specs['drop'] = cfg['data']['drop']
+    try:
+        specs['dtypes'] = cfg['data']['dtypes'] or {}
+    except:
+        specs['dtypes'] = {}
     specs['features'] = cfg['data']['features']
+    try:
+        specs['float32'] = cfg['data']['float32']
+    except:
+        specs['float32'] = False
     specs['sentinel'] = cfg['data']['sentinel']
     specs['separator'] = cfg['data']['separator']
     specs['shuffle'] = cfg['data']['shuffle']
@@ -299,6 +318,11 @@ def get_model_config():
         raise ValueError("model.yml features:scaling:type %s unrecognized" % scaler_type)
     # SciPy
     specs['scipy'] = cfg['features']['scipy']['option']
+    # sparse
+    try:
+        specs['sparse'] = cfg['features']['sparse']
+    except:
+        specs['sparse'] = False
     # text
     specs['ngrams_max'] = cfg['features']['text']['ngrams']
     specs['vectorize'] = cfg['features']['text']['vectorize']
@@ -348,6 +372,18 @@ def get_model_config():
 
     # Section: pipeline
 
+    try:
+        specs['cache_features'] = cfg['pipeline']['cache_features']
+    except:
+        specs['cache_features'] = False
+    try:
+        specs['cache_size'] = cfg['pipeline']['cache_size']
+    except:
+        specs['cache_size'] = 1024
+    try:
+        specs['feature_workers'] = cfg['pipeline']['feature_workers']
+    except:
+        specs['feature_workers'] = 1
     specs['n_jobs'] = cfg['pipeline']['number_jobs']
     specs['seed'] = cfg['pipeline']['seed']
     specs['verbosity'] = cfg['pipeline']['verbosity']
@@ -376,9 +412,12 @@ def get_model_config():
 
     logger.info('MODEL PARAMETERS:')
     logger.info('algorithms        = %s', specs['algorithms'])
+    logger.info('cache_features    = %r', specs['cache_features'])
+    logger.info('cache_size        = %d', specs['cache_size'])
     logger.info('calibration       = %r', specs['calibration'])
     logger.info('cal_type          = %s', specs['cal_type'])
     logger.info('calibration_plot  = %r', specs['calibration'])
+    logger.info('chunksize         = %s', specs['chunksize'])
     logger.info('clustering        = %r', specs['clustering'])
     logger.info('cluster_inc       = %d', specs['cluster_inc'])
     logger.info('cluster_max       = %d', specs['cluster_max'])
@@ -389,11 +428,14 @@ def get_model_config():
     logger.info('directory         = %s', specs['directory'])
     logger.info('extension         = %s', specs['extension'])
     logger.info('drop              = %s', specs['drop'])
+    logger.info('dtypes            = %s', specs['dtypes'])
     logger.info('encoder           = %r', specs['encoder'])
     logger.info('esr               = %d', specs['esr'])
     logger.info('factors           = %s', specs['factors'])
     logger.info('features [X]      = %s', specs['features'])
     logger.info('feature_selection = %r', specs['feature_selection'])
+    logger.info('feature_workers   = %d', specs['feature_workers'])
+    logger.info('float32           = %r', specs['float32'])
     logger.info('fs_percentage     = %d', specs['fs_percentage'])
     logger.info('fs_score_func     = %s', specs['fs_score_func'])
     logger.info('fs_uni_grid       = %s', specs['fs_uni_grid'])
@@ -439,6 +481,7 @@ def get_model_config():
     logger.info('sentinel          = %d', specs['sentinel'])
     logger.info('separator         = %s', specs['separator'])
     logger.info('shuffle           = %r', specs['shuffle'])
+    logger.info('sparse            = %r', specs['sparse'])
     logger.info('split             = %f', specs['split'])
     logger.info('submission_file   = %s', specs['submission_file'])
     logger.info('submit_probas     = %r', specs['submit_probas'])
@@ -614,6 +657,258 @@ def save_feature_map(model, timestamp):
     joblib.dump(model.feature_map, full_path)
 
 
+#
+# Function feature_cache_key
+#
+
+def feature_cache_key(model):
+    r"""Calculate the key of the feature cache.
+
+    Parameters
+    ----------
+    model : alphapy.Model
+        The model object with the feature specifications.
+
+    Returns
+    -------
+    key : str
+        The hexadecimal digest of the input files and of the
+        specifications that determine the features.
+
+    Notes
+    -----
+    The key covers the contents of the training and testing files
+    and all of the model specifications except those listed in
+    ``FEATURE_CACHE_EXCLUDE``, which only affect model fitting and
+    evaluation. Any change to the files or to any other specification,
+    including a new one, creates a new key, so the features are rebuilt.
+
+    """
+
+    # Extract model parameters.
+
+    directory = model.specs['directory']
+    extension = model.specs['extension']
+
+    # Hash the input files
+
+    digest = hashlib.sha256()
+    input_dir = SSEP.join([directory, 'input'])
+    for partition in [Partition.train, Partition.test]:
+        file_name = PSEP.join([datasets[partition], extension])
+        full_path = SSEP.join([input_dir, file_name])
+        digest.update(file_name.encode())
+        if os.path.isfile(full_path):
+            with open(full_path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+
+    # Hash the feature specifications
+
+    specs = {k : v for k, v in model.specs.items()
+             if k not in FEATURE_CACHE_EXCLUDE}
+    digest.update(json.dumps(specs, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+#
+# Function load_feature_cache
+#
+
+def load_feature_cache(model, key):
+    r"""Load the training and testing features from the cache.
+
+    Parameters
+    ----------
+    model : alphapy.Model
+        The model object to contain the features.
+    key : str
+        The key of the feature cache.
+
+    Returns
+    -------
+    model : alphapy.Model
+        The model object containing the features and the feature map.
+    found : bool
+        ``True`` if the features were found in the cache.
+
+    Notes
+    -----
+    The feature matrices are memory-mapped copy-on-write, so they are
+    paged in from disk on demand, and any changes stay in memory.
+
+    """
+
+    # Extract model parameters.
+
+    directory = model.specs['directory']
+
+    # Locate the cache entry
+
+    cache_dir = SSEP.join([directory, 'model', 'cache', key])
+    if not os.path.isdir(cache_dir):
+        logger.info("Feature cache %s not found", key)
+        return model, False
+    os.utime(cache_dir, None)
+
+    # Load the features, labels, and feature map
+
+    logger.info("Loading features from cache %s", cache_dir)
+
+    def load_array(name):
+        file_name = SSEP.join([cache_dir, PSEP.join([name, 'npy'])])
+        return np.load(file_name, mmap_mode='c', allow_pickle=False)
+
+    for name in ['X_train', 'X_test']:
+        if os.path.isfile(SSEP.join([cache_dir, PSEP.join([name, 'npy'])])):
+            features = load_array(name)
+        else:
+            shape = tuple(load_array(USEP.join([name, 'shape'])))
+            arrays = [load_array(USEP.join([name, a])) for a in ['data', 'indices', 'indptr']]
+            features = sparse.csr_matrix(tuple(arrays), shape=shape, copy=False)
+        setattr(model, name, features)
+    model.y_train = load_array('y_train')
+    model.y_test = load_array('y_test')
+    if model.y_test.any():
+        logger.info("Test Labels Found")
+        model.test_labels = True
+    model.feature_map = joblib.load(SSEP.join([cache_dir, 'feature_map.pkl']))
+
+    logger.info("Number of Training Rows    : %d", model.X_train.shape[0])
+    logger.info("Number of Testing Rows     : %d", model.X_test.shape[0])
+    logger.info("Number of Feature Columns  : %d", model.X_train.shape[1])
+    return model, True
+
+
+#
+# Function save_feature_cache
+#
+
+def save_feature_cache(model, key):
+    r"""Save the training and testing features to the cache.
+
+    Parameters
+    ----------
+    model : alphapy.Model
+        The model object containing the features.
+    key : str
+        The key of the feature cache.
+
+    Returns
+    -------
+    None : None
+
+    Notes
+    -----
+    Each matrix is stored as a NumPy ``.npy`` file, or as the three
+    arrays of a CSR matrix if it is sparse. The entry is written to a
+    temporary directory and then renamed, so an interrupted run never
+    leaves a partial entry behind.
+
+    """
+
+    # Extract model parameters.
+
+    directory = model.specs['directory']
+
+    # Create the temporary directory for the cache entry
+
+    cache_base = SSEP.join([directory, 'model', 'cache'])
+    cache_dir = SSEP.join([cache_base, key])
+    temp_dir = PSEP.join([cache_dir, str(os.getpid())])
+    os.makedirs(temp_dir, exist_ok=True)
+    logger.info("Writing features to cache %s", cache_dir)
+
+    # Save the features, labels, and feature map
+
+    def save_array(name, values):
+        file_name = SSEP.join([temp_dir, PSEP.join([name, 'npy'])])
+        np.save(file_name, np.asarray(values), allow_pickle=False)
+
+    for name in ['X_train', 'X_test']:
+        features = getattr(model, name)
+        if sparse.issparse(features):
+            features = features.tocsr()
+            save_array(USEP.join([name, 'data']), features.data)
+            save_array(USEP.join([name, 'indices']), features.indices)
+            save_array(USEP.join([name, 'indptr']), features.indptr)
+            save_array(USEP.join([name, 'shape']), features.shape)
+        else:
+            save_array(name, features)
+    save_array('y_train', model.y_train)
+    save_array('y_test', model.y_test)
+    joblib.dump(model.feature_map, SSEP.join([temp_dir, 'feature_map.pkl']))
+
+    # Publish the cache entry
+
+    try:
+        os.rename(temp_dir, cache_dir)
+    except OSError:
+        logger.info("Feature cache %s already exists", key)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    os.utime(cache_dir, None)
+
+
+#
+# Function evict_feature_cache
+#
+
+def evict_feature_cache(model, key):
+    r"""Remove the least recently used entries from the feature cache.
+
+    Parameters
+    ----------
+    model : alphapy.Model
+        The model object with the cache specifications.
+    key : str
+        The key of the entry in use, which is never removed.
+
+    Returns
+    -------
+    None : None
+
+    Notes
+    -----
+    An entry is used when it is saved or loaded, and the oldest
+    entries are removed until the whole cache, including the entry
+    in use, fits into ``cache_size`` megabytes.
+
+    """
+
+    # Extract model parameters.
+
+    cache_size = model.specs['cache_size']
+    directory = model.specs['directory']
+
+    # Measure each cache entry
+
+    cache_base = SSEP.join([directory, 'model', 'cache'])
+    if not os.path.isdir(cache_base):
+        return
+    entries = []
+    total_size = 0
+    for entry in os.listdir(cache_base):
+        entry_dir = SSEP.join([cache_base, entry])
+        # skip the temporary directories of entries being written
+        if PSEP in entry or not os.path.isdir(entry_dir):
+            continue
+        size = sum([os.path.getsize(SSEP.join([entry_dir, f]))
+                    for f in os.listdir(entry_dir)])
+        total_size += size
+        if entry != key:
+            entries.append((os.stat(entry_dir).st_mtime, size, entry_dir))
+
+    # Remove the least recently used entries
+
+    max_bytes = cache_size * 1024 * 1024
+    for mtime, size, entry_dir in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        logger.info("Evicting feature cache %s", entry_dir)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        total_size -= size
+
+
 #
 # Function first_fit
 #
@@ -657,7 +952,7 @@ def first_fit(model, algo, est):
 
     # Extract model data.
 
-    X_train = model.X_train
+    X_train = dense_input(est, model.X_train)
     y_train = model.y_train
 
     # Fit the initial model.
@@ -741,6 +1036,8 @@ def make_predictions(model, algo, calibrate):
     except:
         X_train = model.X_train
         X_test = model.X_test
+    X_train = dense_input(est, X_train)
+    X_test = dense_input(est, X_test)
     y_train = model.y_train
 
     # Calibration
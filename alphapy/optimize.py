@@ -26,6 +26,7 @@
 # Imports
 #
 
+from alphapy.estimators import dense_input
 from alphapy.globals import ModelType
 
 from datetime import datetime
@@ -100,6 +101,7 @@ def rfecv_search(model, algo):
     scorer = model.specs['scorer']
     verbosity = model.specs['verbosity']
     estimator = model.estimators[algo]
+    X_train = dense_input(estimator, X_train)
 
     # Perform Recursive Feature Elimination
 
@@ -230,7 +232,7 @@ def hyper_grid_search(model, estimator):
     # Subsample if necessary to reduce grid search duration.
 
     if gs_sample:
-        length = len(X_train)
+        length = X_train.shape[0]
         subset = int(length * gs_sample_pct)
         indices = np.random.choice(length, subset, replace=False)
         X_train = X_train[indices]
@@ -272,6 +274,7 @@ def hyper_grid_search(model, estimator):
     # Fit the randomized search and time it.
 
     start = time()
+    X_train = dense_input(est, X_train)
     gscv.fit(X_train, y_train)
     if gs_iters > 0:
         logger.info("Grid Search took %.2f seconds for %d candidate"
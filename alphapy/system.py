@@ -32,7 +32,8 @@ from alphapy.frame import read_frame
 from alphapy.frame import write_frame
 from alphapy.globals import Orders
 from alphapy.globals import BSEP, SSEP
-from alphapy.market_variables import vexec
+from alphapy.market_variables import vexec_plan
+from alphapy.market_variables import vtree
 from alphapy.space import Space
 from alphapy.portfolio import Trade
 from alphapy.utilities import most_recent_file
@@ -213,7 +214,7 @@ def trade_system(model, system, space, intraday, name, quantity):
     # Evaluate the long and short events in the price frame
 
     for signal in active_signals:
-        vexec(pf, signal)
+        vexec_plan(pf, vtree(signal))
 
     # Initialize trading state variables
 
@@ -30,6 +30,7 @@ from alphapy.globals import PSEP, SSEP, USEP
 
 import argparse
 from datetime import datetime, timedelta
+from functools import lru_cache
 import glob
 import inspect
 from itertools import groupby
@@ -48,6 +49,13 @@ import re
 logger = logging.getLogger(__name__)
 
 
+#
+# Regular Expressions
+#
+
+IDENTIFIER = re.compile(r"^[^\d\W]\w*\Z", re.UNICODE)
+
+
 #
 # Function get_datestamp
 #
@@ -231,6 +239,7 @@ def valid_date(date_string):
 # Function valid_name
 #
 
+@lru_cache(maxsize=8192)
 def valid_name(name):
     r"""Determine whether or not the given string is a valid
     alphanumeric string.
@@ -252,6 +261,5 @@ def valid_name(name):
     >>> valid_name('!alpha')  # False
 
     """
-    identifier = re.compile(r"^[^\d\W]\w*\Z", re.UNICODE)
-    result = re.match(identifier, name)
+    result = IDENTIFIER.match(name)
     return result is not None